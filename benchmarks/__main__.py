@@ -0,0 +1,63 @@
+"""Run the microbenchmarks and compare them with the stored baselines.
+
+    python -m benchmarks                  # fail on a regression over the threshold
+    python -m benchmarks --save           # store the timings as the new baselines
+    python -m benchmarks img. --repeat 9  # only the img.py benchmarks
+
+The threshold defaults to SURFRECIPES_BENCH_THRESHOLD, or 0.25 (25% slower).
+"""
+
+import argparse
+import os
+import sys
+
+from .suite import BENCHMARKS, DEFAULT_BASELINES, DEFAULT_THRESHOLD, compare, load_baselines, run, save_baselines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, or prefixes of their names")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs of each benchmark (default: 5)")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("SURFRECIPES_BENCH_THRESHOLD", str(DEFAULT_THRESHOLD))),
+        help="Relative slowdown that fails the run (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--baselines",
+        default=os.getenv("SURFRECIPES_BENCH_BASELINES", DEFAULT_BASELINES),
+        help="Baselines file (default: benchmarks/baselines.json)",
+    )
+    parser.add_argument("--save", action="store_true", help="Store the timings as the new baselines")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    results = run(args.names, repeat=args.repeat)
+    report = compare(results, load_baselines(args.baselines), args.threshold)
+
+    print(f"{'benchmark':40} {'median ms':>10} {'baseline ms':>12} {'change':>8}")
+    for name, row in report.items():
+        baseline = f"{row['baseline'] * 1000:.2f}" if row["baseline"] else "-"
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "new"
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"{name:40} {row['median'] * 1000:10.2f} {baseline:>12} {change:>8}{flag}")
+
+    if args.save:
+        save_baselines(results, args.baselines)
+        print(f"baselines saved to {args.baselines}")
+        return 0
+
+    regressed = [name for name, row in report.items() if row["regressed"]]
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Final, List, Optional
+
+from PIL import Image, ImageDraw
+
+# Size of a full screen desktop screenshot
+SCREEN_SIZE: Final = (2880, 1712)
+
+# Relative slowdown over the baseline that fails a run
+DEFAULT_THRESHOLD: Final = 0.25
+
+DEFAULT_BASELINES: Final = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Benchmarks by name; each one is set up once and returns the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    """Register a benchmark setup function under a name"""
+
+    def register(setup: Callable[[], Callable[[], object]]) -> Callable:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def screenshot(size=SCREEN_SIZE) -> Image.Image:
+    """A deterministic stand-in for a screenshot: flat panels, edges and a gradient"""
+    width, height = size
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for i, x in enumerate(range(0, width, 240)):
+        for j, y in enumerate(range(0, height, 160)):
+            if (i + j) % 3 == 0:
+                draw.rectangle([x + 8, y + 8, x + 200, y + 120], fill=(40 * i % 255, 90, 30 * j % 255))
+            draw.text((x + 16, y + 130), f"item {i}.{j}", fill="black")
+    return img
+
+
+@benchmark("img.create_grid_image_by_num_cells")
+def bench_grid_by_num_cells():
+    from surfrecipes.img import create_grid_image_by_num_cells
+
+    return lambda: create_grid_image_by_num_cells(*SCREEN_SIZE)
+
+
+@benchmark("img.create_grid_image_by_size")
+def bench_grid_by_size():
+    from surfrecipes.img import create_grid_image_by_size
+
+    return lambda: create_grid_image_by_size(*SCREEN_SIZE, cell_size=50)
+
+
+@benchmark("overlay.render")
+def bench_overlay_render():
+    from surfrecipes.overlay import cell_grid, clear_cache, intersection_grid
+
+    def run():
+        # Without the overlay cache, so this times the drawing itself
+        clear_cache()
+        intersection_grid(*SCREEN_SIZE, 6, "red", "yellow")
+        cell_grid(*SCREEN_SIZE, 10, "red", "yellow")
+
+    return run
+
+
+@benchmark("grid.create_grid_image")
+def bench_grid_file():
+    from surfrecipes.grid import create_grid_image
+
+    path = os.path.join(tempfile.mkdtemp(prefix="surfrecipes-bench-"), "grid.png")
+    return lambda: create_grid_image(*SCREEN_SIZE, "yellow", "green", 6, path)
+
+
+@benchmark("img.divide_image_into_cells")
+def bench_divide():
+    from surfrecipes.img import divide_image_into_cells
+
+    img = screenshot()
+    # Every cell and the composite, as the agent's zoom step uses them
+    return lambda: divide_image_into_cells(img, 3)
+
+
+@benchmark("img.divide_image_into_cells.one_cell")
+def bench_divide_one_cell():
+    from surfrecipes.img import divide_image_into_grid
+
+    img = screenshot()
+    return lambda: divide_image_into_grid(img, 3)[4]
+
+
+@benchmark("img.combine_images_vertically")
+def bench_combine():
+    from surfrecipes.img import combine_images_vertically, divide_image_into_grid
+
+    cells = list(divide_image_into_grid(screenshot(), 3))
+    return lambda: combine_images_vertically(cells)
+
+
+@benchmark("compositor.write_png")
+def bench_write_png():
+    from surfrecipes.img import divide_image_into_grid
+
+    compositor = divide_image_into_grid(screenshot(), 3).compositor()
+    # Streamed in bands, so the composite is never held whole
+    return lambda: compositor.write_png(io.BytesIO())
+
+
+@benchmark("img.superimpose_images")
+def bench_superimpose():
+    from surfrecipes.img import create_grid_image_by_num_cells, superimpose_images
+
+    base = screenshot()
+    layer = create_grid_image_by_num_cells(*SCREEN_SIZE)
+    return lambda: superimpose_images(base, layer, 0.8)
+
+
+@benchmark("img.superimpose_many")
+def bench_superimpose_many():
+    from surfrecipes.img import create_grid_image_by_num_cells, superimpose_many
+
+    bases = [screenshot()] * 4
+    layer = create_grid_image_by_num_cells(*SCREEN_SIZE)
+    return lambda: superimpose_many(bases, layer, 0.8)
+
+
+@benchmark("img.image_to_b64")
+def bench_to_b64():
+    from surfrecipes.encoder import ImageEncoder
+    from surfrecipes.img import image_to_b64
+
+    img = screenshot()
+    # Without a cache, so every call encodes
+    encoder = ImageEncoder(cache_bytes=0)
+    return lambda: image_to_b64(img, encoder=encoder)
+
+
+@benchmark("img.image_to_b64.cached")
+def bench_to_b64_cached():
+    from surfrecipes.encoder import ImageEncoder
+    from surfrecipes.img import image_to_b64
+
+    img = screenshot()
+    encoder = ImageEncoder()
+    return lambda: image_to_b64(img, encoder=encoder)
+
+
+@benchmark("img.image_to_b64.downscaled")
+def bench_to_b64_downscaled():
+    from surfrecipes.encoder import ImageEncoder
+    from surfrecipes.img import image_to_b64
+
+    img = screenshot()
+    encoder = ImageEncoder("JPEG", quality=80, max_dimension=1568, cache_bytes=0)
+    return lambda: image_to_b64(img, encoder=encoder)
+
+
+@benchmark("img.load_image_base64")
+def bench_load_b64():
+    from surfrecipes.encoder import ImageEncoder
+    from surfrecipes.img import load_image_base64
+
+    path = os.path.join(tempfile.mkdtemp(prefix="surfrecipes-bench-"), "screenshot.png")
+    screenshot().save(path)
+    encoder = ImageEncoder(cache_bytes=0)
+    return lambda: load_image_base64(path, encoder=encoder)
+
+
+@benchmark("img.b64_to_image")
+def bench_from_b64():
+    from surfrecipes.img import b64_to_image, image_to_b64
+
+    data = image_to_b64(screenshot())
+    # Image.open is lazy, so load the pixels to time the decode as well
+    return lambda: b64_to_image(data).load()
+
+
+# Requirements the rule based parsers answer, and ones left to the LLM
+PARSED_REQUIREMENTS: Final = [
+    ("recipe", "Find me a nut-free vegetarian salad recipe with tomato and cucumber and without any dairy."),
+    ("recipe", "Can you find me an easy keto chicken recipe with broccoli, cheese and garlic?"),
+    ("conversion", "Convert 2.5 cups of flour into grams"),
+    ("conversion", "How many grams are in 1 1/2 tbsp brown sugar?"),
+    ("substitute", "What can I use instead of butter?"),
+]
+LLM_REQUIREMENTS: Final = [
+    ("recipe", "I want a dinner for 4 under 30 minutes"),
+    ("conversion", "convert this recipe to metric"),
+    ("substitute", "I have no eggs, what now?"),
+]
+LLM_REPLIES: Final = {
+    "recipe": {
+        "food": "dinner",
+        "diet": "",
+        "intolerances": "",
+        "include_ingredients": "",
+        "exclude_ingredients": "",
+    },
+    "conversion": {"ingredient_name": "flour", "source_amount": "1", "source_unit": "cups", "target_unit": "grams"},
+    "substitute": {"ingredient_name": "eggs"},
+}
+
+
+class StubRouter:
+    """Answers analyzer prompts with a canned JSON reply, without calling a model"""
+
+    def __init__(self) -> None:
+        self.analyzer = "recipe"
+
+    def chat(self, thread, **kwargs):
+        return SimpleNamespace(msg=SimpleNamespace(text=json.dumps(LLM_REPLIES[self.analyzer])))
+
+
+class StubSpoonacular:
+    """Answers every request with a canned complexSearch response"""
+
+    def __init__(self, number: int = 10) -> None:
+        self.text = json.dumps(
+            {
+                "results": [
+                    {
+                        "id": 600000 + i,
+                        "title": f"Recipe {i}",
+                        "image": f"https://img.spoonacular.com/recipes/{600000 + i}-312x231.jpg",
+                        "readyInMinutes": 20 + i,
+                        "servings": 2 + i % 4,
+                        "sourceUrl": f"https://example.com/recipes/{i}",
+                        "summary": "A recipe. " * 40,
+                        "extendedIngredients": [{"name": f"ingredient {k}", "amount": k} for k in range(12)],
+                    }
+                    for i in range(number)
+                ],
+                "offset": 0,
+                "number": number,
+                "totalResults": 1000,
+            }
+        )
+
+    def get(self, endpoint, path, params=None, **kwargs):
+        return SimpleNamespace(status_code=200, text=self.text)
+
+
+class NullCache:
+    """A response cache that never hits, so every call goes to the stubbed API"""
+
+    def get(self, endpoint, path, params=None):
+        return None
+
+    def set(self, endpoint, path, params, value):
+        pass
+
+
+def tool_module():
+    """Import the tool module; the keys it asks for are never used, as nothing leaves the process"""
+    os.environ.setdefault("SPOONACULAR_API_KEY", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    from surfrecipes import tool as tool_mod
+
+    return tool_mod
+
+
+def stubbed_tool():
+    """A SurfRecipesTool whose analyzer router and Spoonacular client are stubs.
+
+    The stubs replace the tool module's globals for the rest of the process, which
+    only ever runs benchmarks.
+    """
+    from surfrecipes.cache import AnalyzerCache
+
+    tool_mod = tool_module()
+    router = StubRouter()
+    tool_mod.analyzer_router = lambda: router
+    tool_mod.spoonacular = StubSpoonacular()
+
+    recipetool = tool_mod.SurfRecipesTool(
+        SimpleNamespace(id="bench"), data_path=tempfile.mkdtemp(prefix="surfrecipes-bench-")
+    )
+    recipetool.cache = NullCache()
+    # Nothing is kept, so every LLM reply is decoded again
+    recipetool.analyzer_cache = AnalyzerCache(max_entries=0)
+    recipetool.stub_router = router
+    return recipetool
+
+
+@benchmark("tool.parse_requirements")
+def bench_parse_requirements():
+    ANALYZERS = tool_module().ANALYZERS
+
+    def run():
+        for analyzer, text in PARSED_REQUIREMENTS:
+            ANALYZERS[analyzer][0](text)
+
+    return run
+
+
+@benchmark("tool.analyzer_json")
+def bench_analyzer_json():
+    recipetool = stubbed_tool()
+
+    def run():
+        for analyzer, text in LLM_REQUIREMENTS * 5:
+            recipetool.stub_router.analyzer = analyzer
+            recipetool._requirements(analyzer, text)
+
+    return run
+
+
+@benchmark("tool.search_results_json")
+def bench_search_results_json():
+    recipetool = stubbed_tool()
+
+    def run():
+        for _ in range(20):
+            recipes = recipetool._get_json("search", "/recipes/complexSearch", {"query": "salad"}, "failed")
+            recipetool._search_results(recipes)
+
+    return run
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Time a callable.
+
+    Args:
+        fn (Callable): The callable to time.
+        repeat (int, optional): Timed runs. Defaults to 5.
+        warmup (int, optional): Untimed runs first, to fill caches and import lazily. Defaults to 1.
+
+    Returns:
+        Dict[str, float]: Median, fastest and slowest run in seconds.
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "repeat": repeat,
+    }
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Run benchmarks.
+
+    Args:
+        names (List[str], optional): Benchmarks to run; a name matches itself and any
+            benchmark it prefixes, e.g. "img.". Defaults to all of them.
+        repeat (int, optional): Timed runs of each benchmark. Defaults to 5.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Timings by benchmark name.
+    """
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and not any(name.startswith(n) for n in names):
+            continue
+        results[name] = measure(setup(), repeat=repeat)
+    return results
+
+
+def load_baselines(path: str = DEFAULT_BASELINES) -> Dict[str, Dict[str, float]]:
+    """Stored timings by benchmark name, or nothing when no baseline was saved"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(results: Dict[str, Dict[str, float]], path: str = DEFAULT_BASELINES) -> None:
+    """Store timings as the new baselines, keeping those of benchmarks that were not run"""
+    baselines = load_baselines(path)
+    baselines.update(
+        {name: {"median": round(r["median"], 6), "min": round(r["min"], 6)} for name, r in results.items()}
+    )
+    with open(path, "w") as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write("\n")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baselines: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """Compare timings with their baselines.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): Timings by benchmark name.
+        baselines (Dict[str, Dict[str, float]]): Stored timings by benchmark name.
+        threshold (float, optional): Relative slowdown of the median that counts as a
+            regression, e.g. 0.25 for 25%. Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        Dict[str, Dict[str, Optional[float]]]: Per benchmark, the median, the baseline median,
+            the relative change and whether it regressed. Benchmarks without a baseline never regress.
+    """
+    report = {}
+    for name, result in results.items():
+        baseline = baselines.get(name, {}).get("median")
+        change = (result["median"] - baseline) / baseline if baseline else None
+        report[name] = {
+            "median": result["median"],
+            "baseline": baseline,
+            "change": change,
+            "regressed": change is not None and change > threshold,
+        }
+    return report
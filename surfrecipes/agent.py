@@ -1,22 +1,38 @@
+import asyncio
+import json
 import logging
 import os
-import time
 import traceback
-from typing import Final, List, Optional, Tuple, Type
+from typing import Any, Coroutine, Dict, Final, List, Optional, Tuple, Type, TypeVar
 
 from agentdesk.device_v1 import Desktop
 from devicebay import Device
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from rich.console import Console
 from rich.json import JSON
 from skillpacks.server.models import V1ActionSelection
 from skillpacks import EnvState
 from surfkit.agent import TaskAgent
 from taskara import Task, TaskStatus
-from tenacity import before_sleep_log, retry, stop_after_attempt
+from tenacity import (
+    AsyncRetrying,
+    before_sleep_log,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 from threadmem import RoleMessage, RoleThread
-
-from .tool import SurfRecipesTool, router
+from toolfuse import Action
+
+from .aio import run_sync
+from .cache import primer_store
+from .cancel import CancellationWatcher
+from .pacing import Pushback, StepPacer, record_pushback, tracking_pushback
+from .prompts import agent_system_prompt
+from .sink import TaskSink
+from .spoonacular import TRANSIENT_ERRORS
+from .threads import ThreadCompactor
+from .tool import SurfRecipesTool, router, spoonacular
 
 logging.basicConfig(level=logging.INFO)
 logger: Final = logging.getLogger(__name__)
@@ -24,14 +40,112 @@ logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
 
 console = Console(force_terminal=True)
 
+T = TypeVar("T")
+
+# System prompts per tool type, so the schemas are serialized once per process
+_system_prompts: Dict[type, str] = {}
+
+
+def system_prompt(recipetool: SurfRecipesTool) -> str:
+    """The agent system prompt for a tool, with the tool and action selection schemas embedded"""
+    prompt = _system_prompts.get(type(recipetool))
+    if prompt is None:
+        prompt = agent_system_prompt.format(
+            tools=json.dumps(recipetool.json_schema()),
+            schema=json.dumps(V1ActionSelection.model_json_schema()),
+        )
+        _system_prompts[type(recipetool)] = prompt
+    return prompt
+
+
+def new_thread(*messages: Tuple[str, str]) -> RoleThread:
+    """A role thread holding (role, text) messages. Creating and posting both save the
+    thread, so async callers run this in a worker thread."""
+    thread = RoleThread()
+    for role, msg in messages:
+        thread.post(role=role, msg=msg)
+    return thread
+
+
+def next_thread(thread: RoleThread, current_state: Any) -> RoleThread:
+    """A copy of a role thread without old images, asking the model for the next action.
+    Adding the message saves the copy, so async callers run this in a worker thread."""
+    _thread = thread.copy()
+    _thread.remove_images()
+    _thread.add_msg(
+        RoleMessage(
+            role="user",
+            text=(f"Your current task is {current_state}. Please select an action from the provided schema."),
+        )
+    )
+    return _thread
+
+
+async def closing_clients(coro: Coroutine[Any, Any, T]) -> T:
+    """Await a coroutine, then close the Spoonacular connections of its event loop.
+
+    The sync entry points run each call on a new loop, whose pooled async client
+    would otherwise be left open.
+    """
+    try:
+        return await coro
+    finally:
+        await spoonacular.aclose()
+
+
+async def primed_reply(recipetool: SurfRecipesTool) -> str:
+    """The model's reply to the system prompt of a tool.
+
+    The reply carries no task information, so it is asked for once and reused across
+    tasks and restarts. It is keyed by the prompt, so a schema change asks again.
+
+    Args:
+        recipetool (SurfRecipesTool): Surf recipes tool
+
+    Returns:
+        str: The reply text
+    """
+    prompt = system_prompt(recipetool)
+    store = primer_store(recipetool.data_path)
+    reply = store.cached(prompt)
+    if reply is None:
+        reply = await asyncio.to_thread(store.get, prompt)
+    if reply is None:
+        thread = await asyncio.to_thread(new_thread, ("user", prompt))
+        response = await router.chat_async(thread, namespace="system")
+        console.print(f"system prompt response: {response}", style="blue")
+        reply = response.msg.text
+        await asyncio.to_thread(store.set, prompt, reply)
+    return reply
+
+
+class InvalidSelection(ValueError):
+    """Raised when the model's action selection does not parse or does not fit the tool"""
+
 
 class SurfRecipesConfig(BaseModel):
-    pass
+    step_delay: float = 0.0
+    backoff_initial: float = 1.0
+    backoff_factor: float = 2.0
+    backoff_max: float = 30.0
+    context_budget: int = 6000
+    keep_exchanges: int = 3
+    cancel_poll_interval: float = 2.0
+    select_attempts: int = 3
+    execute_attempts: int = 3
 
 
 class SurfRecipes(TaskAgent):
     """An AI agent that finds recipes"""
 
+    def __init__(self, config: Optional[SurfRecipesConfig] = None) -> None:
+        """Create the agent
+
+        Args:
+            config (SurfRecipesConfig, optional): Agent config. Defaults to the default config.
+        """
+        self.config = config or SurfRecipesConfig()
+
     def solve_task(
         self,
         task: Task,
@@ -40,6 +154,23 @@ class SurfRecipes(TaskAgent):
     ) -> Task:
         """Solve a task
 
+        Args:
+            task (Task): Task to solve.
+            max_steps (int, optional): Max steps to try and solve. Defaults to 30.
+
+        Returns:
+            Task: The task
+        """
+        return run_sync(closing_clients(self.asolve_task(task, device=device, max_steps=max_steps)))
+
+    async def asolve_task(
+        self,
+        task: Task,
+        device: Optional[Device] = None,
+        max_steps: int = 30,
+    ) -> Task:
+        """Solve a task without blocking the event loop, so one process can run many tasks
+
         Args:
             task (Task): Task to solve.
             max_steps (int, optional): Max steps to try and solve. Defaults to 30.
@@ -48,77 +179,110 @@ class SurfRecipes(TaskAgent):
             Task: The task
         """
 
+        # Task updates are buffered and written to the tracker once per step
+        sink = TaskSink(task)
+
         # Post a message to the default thread to let the user know the task is in progress
-        task.post_message("assistant", f"Starting task '{task.description}'")
+        sink.post_message("assistant", f"Starting task '{task.description}'")
 
-        # Create threads in the task to update the user
+        # Create threads in the task to update the user; the tracker and the stores the
+        # tool opens are blocking, so they are set up in worker threads
         console.print("creating threads...")
-        task.ensure_thread("debug")
-        task.post_message("assistant", f"I'll post debug messages here", thread="debug")
-
-        recipetool = SurfRecipesTool(task=task)
+        await asyncio.to_thread(task.ensure_thread, "debug")
+        sink.post_message("assistant", f"I'll post debug messages here", thread="debug")
 
-        tools = recipetool.json_schema()
+        recipetool = await asyncio.to_thread(SurfRecipesTool, task=task)
 
-        # Create our thread and start with a system prompt
-        thread = RoleThread()
-        thread.post(
-            role="user",
-            msg=(
-                "You are a helpful AI assistant that analyzes user requirements and suggests actions that must be executed to meet those requirements."
-                "You will receive details of a task and your job is to suggest what action should be taken next."
-                f"The actions available to you are {tools}."
-                "When you respond, always give a raw JSON adhering to the following schema and with the correct action called."
-                f"Schema: {V1ActionSelection.model_json_schema()}"
-                "If no further action is needed, return 'result' as the action_name."
-                "Let me know when you are ready and I'll send you the user requirement."
-            ),
+        # Create our thread and start with a system prompt, whose reply is primed once
+        thread = await asyncio.to_thread(
+            new_thread,
+            ("user", system_prompt(recipetool)),
+            ("assistant", await primed_reply(recipetool)),
         )
-        console.print(f"thread messages: {thread.messages()}", style="blue")
-        response = router.chat(thread, namespace="system")
-        console.print(f"system prompt response: {response}", style="blue")
-        thread.add_msg(response.msg)
 
         # The initial state is the task description itself.
         current_state = task.description
 
-        # Loop to run actions
-        for i in range(max_steps):
-            console.print(f"-------step {i + 1}", style="green")
+        # Keep the prompt sent each step within a token budget
+        compactor = ThreadCompactor(
+            budget=self.config.context_budget,
+            keep_exchanges=self.config.keep_exchanges,
+        )
+
+        # Pause between steps only when Spoonacular or the LLM push back
+        pacer = StepPacer(
+            delay=self.config.step_delay,
+            backoff_initial=self.config.backoff_initial,
+            backoff_factor=self.config.backoff_factor,
+            backoff_max=self.config.backoff_max,
+        )
+
+        # Watch for cancellation off the critical path
+        watcher = CancellationWatcher(task, interval=self.config.cancel_poll_interval)
+        watcher.start()
 
+        # Rate limits and errors this task runs into pace only this task
+        with tracking_pushback(Pushback()) as pushback:
+            failed = False
             try:
-                thread, current_state, done = self.take_action(recipetool, task, thread, current_state)
-            except Exception as e:
-                console.print(f"Error: {e}", style="red")
+                # Loop to run actions
+                for i in range(max_steps):
+                    console.print(f"-------step {i + 1}", style="green")
+
+                    try:
+                        with pacer.working():
+                            thread, current_state, done = await self.atake_action(
+                                recipetool, task, thread, current_state, compactor, sink, watcher
+                            )
+                    except Exception as e:
+                        console.print(f"Error: {e}", style="red")
+                        task.status = TaskStatus.FAILED
+                        task.error = str(e)
+                        sink.save()
+                        sink.post_message("assistant", f"❗ Error taking action: {e}")
+                        return task
+                    finally:
+                        sink.flush()
+
+                    if done:
+                        console.print("task is done", style="green")
+                        return task
+
+                    # Only this task's push back during this step counts
+                    pushed_back, retry_after = pushback.take()
+                    pacer.step_done(pushed_back=pushed_back > 0, retry_after=retry_after)
+                    await pacer.wait_async()
+
                 task.status = TaskStatus.FAILED
-                task.error = str(e)
-                task.save()
-                task.post_message("assistant", f"❗ Error taking action: {e}")
-                return task
+                sink.save()
+                sink.post_message("assistant", "❗ Max steps reached without solving task")
+                console.print("Reached max steps without solving task", style="red")
 
-            if done:
-                console.print("task is done", style="green")
                 return task
 
-            time.sleep(2)
-
-        task.status = TaskStatus.FAILED
-        task.save()
-        task.post_message("assistant", "❗ Max steps reached without solving task")
-        console.print("Reached max steps without solving task", style="red")
+            except Exception:
+                failed = True
+                raise
 
-        return task
+            finally:
+                await asyncio.to_thread(watcher.stop)
+                console.print(f"pacing: {pacer.stats()}", style="blue")
+                sink.post_message("assistant", f"Step pacing: {pacer.stats()}", thread="debug")
+                await asyncio.to_thread(recipetool.close)
+                sink.post_message("assistant", f"Prefetch: {recipetool.prefetcher.stats()}", thread="debug")
+                # Whatever happened, everything buffered reaches the tracker before returning
+                await asyncio.to_thread(sink.close, raise_errors=not failed)
+                console.print(f"task updates: {sink.stats()}", style="blue")
 
-    @retry(
-        stop=stop_after_attempt(5),
-        before_sleep=before_sleep_log(logger, logging.INFO),
-    )
     def take_action(
         self,
         recipetool: SurfRecipesTool,
         task: Task,
         thread: RoleThread,
         current_state: dict,
+        compactor: Optional[ThreadCompactor] = None,
+        sink: Optional[TaskSink] = None,
+        watcher: Optional[CancellationWatcher] = None,
     ) -> Tuple[RoleThread, dict, bool]:
         """Take an action
 
@@ -126,110 +290,114 @@ class SurfRecipes(TaskAgent):
             recipetool (SurfRecipesTool): Surf recipes tool
             task (str): Task to accomplish
             thread (RoleThread): Role thread for the task
+            compactor (ThreadCompactor, optional): Windows the thread sent to the model
+            sink (TaskSink, optional): Buffers the task updates. Defaults to a sink written out when the call returns.
+            watcher (CancellationWatcher, optional): Watches for cancellation. Defaults to refreshing remote tasks.
 
         Returns:
             bool: Whether the task is complete
         """
-        try:
-            # Check to see if the task has been cancelled
-            if task.remote:
-                task.refresh()
-                console.print("task status: ", task.status.value)
-            if (
-                task.status == TaskStatus.CANCELING
-                or task.status == TaskStatus.CANCELED
-            ):
-                console.print(f"task is {task.status}", style="red")
-                if task.status == TaskStatus.CANCELING:
-                    task.status = TaskStatus.CANCELED
-                    task.save()
-                return thread, current_state, True
+        return run_sync(
+            closing_clients(self.atake_action(recipetool, task, thread, current_state, compactor, sink, watcher))
+        )
 
-            console.print("taking action...", style="white")
+    async def atake_action(
+        self,
+        recipetool: SurfRecipesTool,
+        task: Task,
+        thread: RoleThread,
+        current_state: dict,
+        compactor: Optional[ThreadCompactor] = None,
+        sink: Optional[TaskSink] = None,
+        watcher: Optional[CancellationWatcher] = None,
+    ) -> Tuple[RoleThread, dict, bool]:
+        """Take an action without blocking the event loop.
 
-            # Create a copy of the thread, and remove old images
-            _thread = thread.copy()
-            _thread.remove_images()
+        The step runs in stages, each with its own retries: select asks the model for an
+        action, execute runs it and record stores it. A parsed selection is kept, so a
+        transient error retries only its execution; the model is asked again only when its
+        selection does not parse or does not fit the tool.
 
-            # Craft the message asking the MLLM for an action
-            msg = RoleMessage(
-                role="user",
-                text=(f"Your current task is {current_state}. Please select an action from the provided schema."),
-            )
-            _thread.add_msg(msg)
+        Args:
+            recipetool (SurfRecipesTool): Surf recipes tool
+            task (str): Task to accomplish
+            thread (RoleThread): Role thread for the task
+            compactor (ThreadCompactor, optional): Windows the thread sent to the model
+            sink (TaskSink, optional): Buffers the task updates. Defaults to a sink written out when the call returns.
+            watcher (CancellationWatcher, optional): Watches for cancellation. Defaults to refreshing remote tasks.
 
-            # Make the action selection
-            response = router.chat(
-                _thread,
-                namespace="action",
-                expect=V1ActionSelection,
-                agent_id=self.name(),
-            )
-            task.add_prompt(response.prompt)
+        Returns:
+            bool: Whether the task is complete
+        """
+        # A TaskSink has the same update methods as the task it buffers; without one,
+        # updates go through a sink of this call, so they are written off the event loop
+        tracker = sink or TaskSink(task)
+        failed = False
 
-            try:
-                # Post to the user letting them know what the model selected
-                selection = response.parsed
-                if not selection:
-                    raise ValueError("No action selection parsed")
-
-                task.post_message("assistant", f"👁️ {selection.observation}")
-                task.post_message("assistant", f"💡 {selection.reason}")
-                console.print(f"action selection: ", style="white")
-                console.print(JSON.from_data(selection.model_dump()))
-
-                task.post_message(
-                    "assistant",
-                    f"▶️ Taking action '{selection.action.name}' with parameters: {selection.action.parameters}",
-                )
+        try:
+            # Check to see if the task has been cancelled; the watcher polls in the background,
+            # woken now so a cancellation lands while the model is selecting
+            if watcher is not None:
+                watcher.poll_soon()
+            elif task.remote:
+                await asyncio.to_thread(task.refresh)
+                console.print("task status: ", task.status.value)
+            if await self._cancel_if_requested(task, tracker, watcher):
+                return thread, current_state, True
 
-            except Exception as e:
-                console.print(f"Response failed to parse: {e}", style="red")
-                raise
+            console.print("taking action...", style="white")
 
-            # The agent will return 'result' if it believes it's finished
-            if selection.action.name == "result":
-                console.print("final result: ", style="green")
-                console.print(JSON.from_data(selection.action.parameters))
-                task.post_message(
-                    "assistant",
-                    f"✅ I think the task is done, please review the result.",
+            # Copy the thread without old images, asking the MLLM for an action
+            _thread = await asyncio.to_thread(next_thread, thread, current_state)
+
+            # Only a window of the thread is sent, keeping the prompt size flat
+            if compactor is None:
+                compactor = ThreadCompactor(
+                    budget=self.config.context_budget,
+                    keep_exchanges=self.config.keep_exchanges,
                 )
-                task.status = TaskStatus.FINISHED
-                task.save()
-                return _thread, current_state, True
-
-            # Find the selected action in the tool
-            action = recipetool.find_action(selection.action.name)
-            console.print(f"found action: {action}", style="blue")
-            if not action:
-                console.print(f"action returned not found: {selection.action.name}")
-                raise SystemError("action not found")
-
-            # Take the selected action
-            try:
-                action_response = recipetool.use(action, **selection.action.parameters)
-            except Exception as e:
-                raise ValueError(f"Trouble using action: {e}")
+            window = compactor.compact(_thread)
+
+            for attempt in range(1, self.config.select_attempts + 1):
+                try:
+                    # Select stage
+                    response, selection = await self._select(window, tracker)
+
+                    # The agent will return 'result' if it believes it's finished
+                    if selection.action.name == "result":
+                        console.print("final result: ", style="green")
+                        console.print(JSON.from_data(selection.action.parameters))
+                        tracker.post_message(
+                            "assistant",
+                            f"✅ I think the task is done, please review the result.",
+                        )
+                        task.status = TaskStatus.FINISHED
+                        tracker.save()
+                        return _thread, current_state, True
+
+                    # Execute stage, retried on the same selection; a cancellation seen while
+                    # selecting stops the step before the action runs
+                    action = self._find_action(recipetool, selection)
+                    if await self._cancel_if_requested(task, tracker, watcher):
+                        return _thread, current_state, True
+                    action_response = await self._execute(recipetool, action, selection)
+                    break
+                except InvalidSelection as e:
+                    if attempt >= self.config.select_attempts:
+                        raise
+                    console.print(f"selection rejected: {e}", style="yellow")
+                    tracker.post_message("assistant", f"⚠️ {e} -- selecting again...")
 
             console.print(f"action output: {action_response}", style="blue")
             if action_response:
-                task.post_message(
+                tracker.post_message(
                     "assistant", f"👁️ Result from taking action: {action_response}"
                 )
 
-            # Record the action for feedback and tuning
-            task.record_action(
-                state=EnvState(),
-                prompt=response.prompt,
-                action=selection.action,
-                tool=recipetool.ref(),
-                result=action_response,
-                agent_id=self.name(),
-                model=response.model,
-            )
+            # Record stage; the sink retries the write, so a tracker failure does not re-run the step
+            self._record(recipetool, tracker, response, selection, action_response)
 
-            _thread.add_msg(response.msg)
+            await asyncio.to_thread(_thread.add_msg, response.msg)
 
             new_state = action_response
             return _thread, new_state, False
@@ -237,9 +405,168 @@ class SurfRecipes(TaskAgent):
         except Exception as e:
             console.print("Exception taking action: ", e)
             traceback.print_exc()
-            task.post_message("assistant", f"⚠️ Error taking action: {e} -- retrying...")
+            # Only rate limits and outages are push back; an invalid selection or a bug
+            # should not slow the next steps down
+            if isinstance(e, TRANSIENT_ERRORS):
+                record_pushback()
+            tracker.post_message("assistant", f"⚠️ Error taking action: {e}")
+            failed = True
             raise e
 
+        finally:
+            # A failed final save must not hide the error that ended the step
+            if sink is None:
+                await asyncio.to_thread(tracker.close, raise_errors=not failed)
+
+    async def _cancel_if_requested(
+        self, task: Task, tracker: TaskSink, watcher: Optional[CancellationWatcher]
+    ) -> bool:
+        """Check for cancellation at a stage boundary, marking a cancelling task CANCELED
+
+        Args:
+            task (Task): The task being solved
+            tracker (TaskSink): Where task updates go
+            watcher (CancellationWatcher, optional): Watches for cancellation. Without one, only the task's own status is read.
+
+        Returns:
+            bool: Whether the task is cancelled
+        """
+        if watcher is not None and watcher.cancelled():
+            task.status = watcher.status
+        if task.status not in (TaskStatus.CANCELING, TaskStatus.CANCELED):
+            return False
+
+        console.print(f"task is {task.status}", style="red")
+        if task.status == TaskStatus.CANCELING:
+            # The watcher only read the status, so pick up the rest of the tracker's
+            # copy before saving over it
+            if watcher is not None and task.remote:
+                await asyncio.to_thread(task.refresh)
+            task.status = TaskStatus.CANCELED
+            tracker.save()
+        return True
+
+    def _stage_retry_log(self, stage: str):
+        """before_sleep hook of a stage retry, counting the retry as push back"""
+        log = before_sleep_log(logger, logging.INFO)
+
+        def before_sleep(retry_state) -> None:
+            record_pushback()
+            console.print(f"retrying {stage} stage: {retry_state.outcome.exception()}", style="yellow")
+            log(retry_state)
+
+        return before_sleep
+
+    async def _select(self, window: RoleThread, tracker: TaskSink) -> Tuple[Any, V1ActionSelection]:
+        """Select stage: ask the model for an action and parse its reply
+
+        Args:
+            window (RoleThread): The thread window sent to the model
+            tracker (TaskSink): Where task updates go
+
+        Raises:
+            InvalidSelection: If the reply does not parse into an action selection.
+
+        Returns:
+            Tuple[ChatResponse, V1ActionSelection]: The response and the parsed selection
+        """
+        try:
+            response = await router.chat_async(
+                window,
+                namespace="action",
+                expect=V1ActionSelection,
+                agent_id=self.name(),
+            )
+        except ValueError as e:
+            raise InvalidSelection(f"Response failed to parse: {e}")
+        tracker.add_prompt(response.prompt)
+
+        selection = response.parsed
+        if not selection:
+            raise InvalidSelection("No action selection parsed")
+
+        # Post to the user letting them know what the model selected
+        tracker.post_message("assistant", f"👁️ {selection.observation}")
+        tracker.post_message("assistant", f"💡 {selection.reason}")
+        console.print(f"action selection: ", style="white")
+        console.print(JSON.from_data(selection.model_dump()))
+        tracker.post_message(
+            "assistant",
+            f"▶️ Taking action '{selection.action.name}' with parameters: {selection.action.parameters}",
+        )
+        return response, selection
+
+    def _find_action(self, recipetool: SurfRecipesTool, selection: V1ActionSelection) -> Action:
+        """The tool action a selection names
+
+        Raises:
+            InvalidSelection: If the tool has no such action.
+        """
+        action = recipetool.find_action(selection.action.name)
+        console.print(f"found action: {action}", style="blue")
+        if not action:
+            raise InvalidSelection(f"Action not found: {selection.action.name}")
+        return action
+
+    async def _execute(
+        self, recipetool: SurfRecipesTool, action: Action, selection: V1ActionSelection
+    ) -> Any:
+        """Execute stage: run the selected action, retrying transient Spoonacular errors on the
+        same selection with bounded backoff, so they never cost another model call
+
+        Args:
+            recipetool (SurfRecipesTool): Surf recipes tool
+            action (Action): The selected action
+            selection (V1ActionSelection): The parsed action selection
+
+        Raises:
+            InvalidSelection: If the selected parameters do not fit the action.
+
+        Returns:
+            Any: The action output
+        """
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.config.execute_attempts),
+                retry=retry_if_exception_type(TRANSIENT_ERRORS),
+                wait=wait_exponential(multiplier=self.config.backoff_initial, max=self.config.backoff_max),
+                before_sleep=self._stage_retry_log("execute"),
+                reraise=True,
+            ):
+                with attempt:
+                    return await recipetool.ause(action, **selection.action.parameters)
+        except (TypeError, ValidationError) as e:
+            raise InvalidSelection(f"Parameters do not fit action '{selection.action.name}': {e}")
+
+    def _record(
+        self,
+        recipetool: SurfRecipesTool,
+        tracker: TaskSink,
+        response,
+        selection: V1ActionSelection,
+        action_response: Any,
+    ) -> None:
+        """Record stage: store the action for feedback and tuning.
+
+        The update is buffered in the sink, whose writer retries transient tracker failures.
+
+        Args:
+            recipetool (SurfRecipesTool): Surf recipes tool
+            tracker (TaskSink): Where task updates go
+            response (ChatResponse): The action selection response
+            selection (V1ActionSelection): The parsed action selection
+            action_response (Any): The action output
+        """
+        tracker.record_action(
+            state=EnvState(),
+            prompt=response.prompt,
+            action=selection.action,
+            tool=recipetool.ref(),
+            result=action_response,
+            agent_id=self.name(),
+            model=response.model,
+        )
+
     @classmethod
     def supported_devices(cls) -> List[Type[Device]]:
         """Devices this agent supports
@@ -268,7 +595,7 @@ class SurfRecipes(TaskAgent):
         Returns:
             SurfRecipes: The agent
         """
-        return SurfRecipes()
+        return SurfRecipes(config)
 
     @classmethod
     def default(cls) -> "SurfRecipes":
@@ -0,0 +1,27 @@
+import asyncio
+import concurrent.futures
+import contextvars
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion from synchronous code.
+
+    Uses asyncio.run() when no event loop is running in this thread, otherwise runs
+    the coroutine on a fresh loop in a worker thread so the running loop is not re-entered.
+
+    Args:
+        coro (Coroutine): The coroutine to run.
+
+    Returns:
+        T: The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coro).result()
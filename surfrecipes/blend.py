@@ -0,0 +1,57 @@
+from typing import Iterable, List, Optional
+
+from PIL import Image
+
+
+class PreparedLayer:
+    """A layer converted and scaled by its opacity once, to be superimposed onto any number of images"""
+
+    def __init__(self, layer: Image.Image, opacity: float = 1) -> None:
+        """
+        Initialize the layer.
+
+        Args:
+            layer (Image.Image): The layer to superimpose.
+            opacity (float, optional): How much opacity the layer should have. Defaults to 1.
+        """
+        if layer.mode != "RGBA":
+            layer = layer.convert("RGBA")
+        if opacity != 1:
+            layer = Image.blend(Image.new("RGBA", layer.size, (0, 0, 0, 0)), layer, opacity)
+        self.layer = layer
+        self.size = layer.size
+        self.opacity = opacity
+
+    def apply(self, base: Image.Image, out: Optional[Image.Image] = None) -> Image.Image:
+        """Superimpose the layer onto the grayscale of an image.
+
+        Args:
+            base (Image.Image): Base image.
+            out (Image.Image, optional): An RGBA image of the same size to write the result
+                into, instead of allocating a new one. Defaults to None.
+
+        Returns:
+            Image.Image: The superimposed RGBA image, out when given.
+        """
+        if base.size != self.size:
+            raise ValueError("Images must have the same dimensions.")
+        gray = base if base.mode == "L" else base.convert("L")
+
+        if out is None:
+            return Image.alpha_composite(gray.convert("RGBA"), self.layer)
+        if out.mode != "RGBA" or out.size != self.size:
+            raise ValueError("out must be an RGBA image of the same dimensions.")
+        out.paste(gray, (0, 0))
+        out.alpha_composite(self.layer)
+        return out
+
+    def apply_many(self, bases: Iterable[Image.Image]) -> List[Image.Image]:
+        """Superimpose the layer onto many images.
+
+        Args:
+            bases (Iterable[Image.Image]): Base images, all of the layer's size.
+
+        Returns:
+            List[Image.Image]: The superimposed images, in order.
+        """
+        return [self.apply(base) for base in bases]
@@ -0,0 +1,397 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Final, Optional
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+# Time to live in seconds, keyed by endpoint name
+DEFAULT_TTLS: Final[Dict[str, float]] = {
+    "search": 24 * 3600,
+    "card": 24 * 3600,
+    "card_image": 30 * 24 * 3600,
+    "convert": 30 * 24 * 3600,
+    "substitutes": 30 * 24 * 3600,
+    "analyzer": 30 * 24 * 3600,
+}
+
+# Parameters that never take part in a cache key
+IGNORED_PARAMS: Final = frozenset({"apiKey"})
+
+
+def normalize_params(params: Optional[dict]) -> Dict[str, str]:
+    """Normalize request parameters so equivalent requests share a key.
+
+    Drops the API key, lowercases and strips values, and sorts the items of
+    comma separated lists.
+
+    Args:
+        params (dict, optional): Request parameters.
+
+    Returns:
+        Dict[str, str]: Normalized parameters.
+    """
+    out = {}
+    for name, value in (params or {}).items():
+        if name in IGNORED_PARAMS or value is None or value == "":
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        value = str(value).strip().lower()
+        if "," in value:
+            value = ",".join(sorted(v.strip() for v in value.split(",") if v.strip()))
+        out[name] = value
+    return dict(sorted(out.items()))
+
+
+class ResponseCache:
+    """A persistent, size bounded TTL/LRU cache of JSON responses"""
+
+    def __init__(
+        self,
+        path: str,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 24 * 3600,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): Path to the sqlite file backing the cache.
+            ttls (Dict[str, float], optional): Time to live per endpoint. Defaults to DEFAULT_TTLS.
+            default_ttl (float, optional): Time to live for other endpoints. Defaults to one day.
+            max_bytes (int, optional): Total size of cached values. Defaults to 64MiB.
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+
+    @staticmethod
+    def key(endpoint: str, path: str, params: Optional[dict] = None) -> str:
+        """Cache key for a request"""
+        raw = json.dumps([endpoint, path, normalize_params(params)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, endpoint: str, path: str, params: Optional[dict] = None) -> Optional[Any]:
+        """Look up a cached response.
+
+        Args:
+            endpoint (str): Endpoint name.
+            path (str): Request path.
+            params (dict, optional): Request parameters.
+
+        Returns:
+            Optional[Any]: The decoded JSON response, or None on a miss.
+        """
+        key = self.key(endpoint, path, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses[endpoint] += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self.hits[endpoint] += 1
+        return json.loads(row[0])
+
+    def set(self, endpoint: str, path: str, params: Optional[dict], value: Any) -> None:
+        """Store a response and evict least recently used entries beyond max_bytes.
+
+        Args:
+            endpoint (str): Endpoint name.
+            path (str): Request path.
+            params (dict, optional): Request parameters.
+            value (Any): JSON serializable response.
+        """
+        key = self.key(endpoint, path, params)
+        data = json.dumps(value)
+        now = time.time()
+        expires = now + self.ttls.get(endpoint, self.default_ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, data, len(data), expires, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used ones over budget"""
+        self._conn.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"evicted {evicted} cached responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters, per endpoint and in total, plus the cache size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "endpoints": {
+                endpoint: {"hits": self.hits[endpoint], "misses": self.misses[endpoint]}
+                for endpoint in sorted(set(self.hits) | set(self.misses))
+            },
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the backing database"""
+        with self._lock:
+            self._conn.close()
+
+    @classmethod
+    def from_env(cls, path: str) -> "ResponseCache":
+        """Create a cache configured from environment variables.
+
+        SPOONACULAR_CACHE_TTL_<ENDPOINT> (e.g. SPOONACULAR_CACHE_TTL_SEARCH),
+        SPOONACULAR_CACHE_TTL (other endpoints) and SPOONACULAR_CACHE_MAX_BYTES.
+
+        Args:
+            path (str): Path to the sqlite file backing the cache.
+
+        Returns:
+            ResponseCache: The cache
+        """
+        ttls = {
+            name: float(os.getenv(f"SPOONACULAR_CACHE_TTL_{name.upper()}", str(default)))
+            for name, default in DEFAULT_TTLS.items()
+        }
+        return cls(
+            path,
+            ttls=ttls,
+            default_ttl=float(os.getenv("SPOONACULAR_CACHE_TTL", str(24 * 3600))),
+            max_bytes=int(os.getenv("SPOONACULAR_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+
+
+def normalize_text(text: str) -> str:
+    """Normalize free text so trivially different requests share a key.
+
+    Lowercases, drops punctuation other than what amounts use and collapses whitespace.
+    """
+    text = re.sub(r"[^\w./'-]+", " ", text.lower())
+    return " ".join(text.split()).strip(" .")
+
+
+class AnalyzerCache:
+    """A bounded in-memory LRU of requirement analyzer outputs, optionally persisted"""
+
+    def __init__(self, max_entries: int = 1024, persist: Optional[ResponseCache] = None) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int, optional): Entries kept in memory. Defaults to 1024.
+            persist (ResponseCache, optional): Response cache to persist outputs in, so they
+                survive restarts. Defaults to None.
+        """
+        self.max_entries = max_entries
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, analyzer: str, text: str) -> Optional[Any]:
+        """Look up the output of an analyzer for a requirement text.
+
+        Args:
+            analyzer (str): Analyzer name.
+            text (str): Requirement text, as given by the user.
+
+        Returns:
+            Optional[Any]: The cached output, or None on a miss.
+        """
+        key = (analyzer, normalize_text(text))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = None
+        if self.persist is not None:
+            value = self.persist.get("analyzer", analyzer, {"text": key[1]})
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put(key, value)
+        return value
+
+    def set(self, analyzer: str, text: str, value: Any) -> None:
+        """Store the output of an analyzer for a requirement text.
+
+        Args:
+            analyzer (str): Analyzer name.
+            text (str): Requirement text, as given by the user.
+            value (Any): JSON serializable analyzer output.
+        """
+        key = (analyzer, normalize_text(text))
+        with self._lock:
+            self._put(key, value)
+        if self.persist is not None:
+            self.persist.set("analyzer", analyzer, {"text": key[1]}, value)
+
+    def _put(self, key: tuple, value: Any) -> None:
+        """Insert an entry, evicting the least recently used ones"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters and the number of entries in memory"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class PrimerStore:
+    """Model replies to system prompts, kept in process and on disk until the prompt changes.
+
+    Unlike the response cache there is no TTL or size budget: each reply is one small
+    file named by the hash of its prompt, so a new prompt simply asks again.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            directory (str): Directory the replies are written to.
+        """
+        self.directory = directory
+        self._replies: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        """Key of a system prompt"""
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def cached(self, prompt: str) -> Optional[str]:
+        """The reply to a prompt if it is already in process, without touching the disk"""
+        with self._lock:
+            return self._replies.get(self.key(prompt))
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Look up the reply to a system prompt.
+
+        Args:
+            prompt (str): System prompt.
+
+        Returns:
+            Optional[str]: The reply, or None if the prompt was never answered.
+        """
+        key = self.key(prompt)
+        with self._lock:
+            if key in self._replies:
+                return self._replies[key]
+        try:
+            with open(os.path.join(self.directory, f"{key}.txt"), encoding="utf-8") as f:
+                reply = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._replies[key] = reply
+        return reply
+
+    def set(self, prompt: str, reply: str) -> None:
+        """Store the reply to a system prompt.
+
+        Args:
+            prompt (str): System prompt.
+            reply (str): The model's reply.
+        """
+        key = self.key(prompt)
+        path = os.path.join(self.directory, f"{key}.txt")
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(reply)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._replies[key] = reply
+
+
+@lru_cache(maxsize=None)
+def response_cache(data_path: str) -> ResponseCache:
+    """The process wide response cache living under a data path"""
+    return ResponseCache.from_env(os.path.join(data_path, "cache", "spoonacular.sqlite"))
+
+
+@lru_cache(maxsize=None)
+def analyzer_cache(data_path: str) -> AnalyzerCache:
+    """The process wide analyzer cache, persisted under a data path when
+    SURFRECIPES_ANALYZER_CACHE_PERSIST is true"""
+    persist = None
+    if os.getenv("SURFRECIPES_ANALYZER_CACHE_PERSIST", "false").lower() == "true":
+        persist = response_cache(data_path)
+    return AnalyzerCache(
+        max_entries=int(os.getenv("SURFRECIPES_ANALYZER_CACHE_SIZE", "1024")),
+        persist=persist,
+    )
+
+
+@lru_cache(maxsize=None)
+def primer_store(data_path: str) -> PrimerStore:
+    """The process wide store of system prompt replies under a data path"""
+    return PrimerStore(os.path.join(data_path, "cache", "primers"))
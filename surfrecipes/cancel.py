@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+from typing import Final, Optional
+
+from taskara import Task, TaskStatus
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+CANCEL_STATUSES: Final = frozenset({TaskStatus.CANCELING, TaskStatus.CANCELED})
+
+
+class CancellationWatcher:
+    """Polls a task's status in the background, so the agent loop can check for cancellation for free"""
+
+    def __init__(self, task: Task, interval: float = 2.0) -> None:
+        """
+        Initialize the watcher.
+
+        Args:
+            task (Task): The task to watch. It is never modified by the watcher.
+            interval (float, optional): Seconds between status polls. Defaults to 2.
+        """
+        self.task = task
+        self.interval = interval
+        self.status: Optional[TaskStatus] = None
+        self.polls = 0
+
+        self._cancelled = threading.Event()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start polling on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._watch, name=f"surfrecipes-cancel-{self.task.id}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def cancelled(self) -> bool:
+        """Whether the task was asked to cancel, from the last poll or the in-process status"""
+        if self.task.status in CANCEL_STATUSES:
+            self.status = self.task.status
+            self._cancelled.set()
+        return self._cancelled.is_set()
+
+    def poll_soon(self) -> None:
+        """Poll now on the background thread instead of waiting out the interval"""
+        self._wake.set()
+
+    def _watch(self) -> None:
+        """Poll every interval, or when woken, until cancelled or stopped"""
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.poll()
+            if self._cancelled.is_set():
+                return
+
+    def poll(self) -> None:
+        """Read the task's status once, from a separate copy of the task"""
+        try:
+            kwargs = {"id": self.task.id}
+            if self.task.remote:
+                kwargs.update(
+                    remote=self.task.remote, auth_token=self.task.auth_token, owner_id=self.task.owner_id
+                )
+            tasks = Task.find(**kwargs)
+        except Exception as e:
+            logger.debug(f"failed to poll task status: {e}")
+            return
+        self.polls += 1
+        if tasks and tasks[0].status in CANCEL_STATUSES:
+            logger.info(f"task {self.task.id} is {tasks[0].status.value}")
+            self.status = tasks[0].status
+            self._cancelled.set()
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Final, Optional, Tuple
+
+from PIL import Image
+
+from .cache import ResponseCache
+from .spoonacular import SpoonacularClient, status_error
+from .store import ImageStore
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+CHUNK_SIZE: Final = 64 * 1024
+THUMBNAIL_SIZE: Final = (512, 512)
+
+
+def card_filename(url: str) -> str:
+    """Local file name of a recipe card url"""
+    ext = os.path.splitext(url.split("?", 1)[0])[1].lower() or ".png"
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:24] + ext
+
+
+def thumbnail_name(name: str) -> str:
+    """File name of the thumbnail of an image"""
+    return os.path.splitext(name)[0] + ".thumb.jpg"
+
+
+def thumbnail_path(path: str) -> str:
+    """Path of the thumbnail of an image, next to it"""
+    return os.path.join(os.path.dirname(path), thumbnail_name(os.path.basename(path)))
+
+
+def discard(path: str) -> None:
+    """Remove a partial file, if it is still there"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def make_thumbnail(path: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> str:
+    """Write a downscaled JPEG copy of an image next to it.
+
+    Uses the decoder's draft mode, so JPEG cards are decoded at a reduced scale
+    instead of in full.
+
+    Args:
+        path (str): Path to the image.
+        size (Tuple[int, int], optional): Bounding box of the thumbnail. Defaults to THUMBNAIL_SIZE.
+
+    Returns:
+        str: Path to the thumbnail
+    """
+    thumb_path = thumbnail_path(path)
+    with Image.open(path) as img:
+        img.draft("RGB", size)
+        img.thumbnail(size)
+        img.convert("RGB").save(thumb_path, "JPEG", quality=85)
+    return thumb_path
+
+
+class CardDownloader:
+    """Downloads recipe card images into the image store, revalidating cards fetched before"""
+
+    def __init__(
+        self,
+        client: SpoonacularClient,
+        cache: ResponseCache,
+        store: ImageStore,
+        chunk_size: int = CHUNK_SIZE,
+        thumbnail_size: Tuple[int, int] = THUMBNAIL_SIZE,
+    ) -> None:
+        """
+        Initialize the downloader.
+
+        Args:
+            client (SpoonacularClient): Client the cards are fetched with.
+            cache (ResponseCache): Cache keeping the validators and stored copy of each card.
+            store (ImageStore): Store the cards and their thumbnails are kept in.
+            chunk_size (int, optional): Bytes written at a time. Defaults to CHUNK_SIZE.
+            thumbnail_size (Tuple[int, int], optional): Bounding box of thumbnails. Defaults to THUMBNAIL_SIZE.
+        """
+        self.client = client
+        self.cache = cache
+        self.store = store
+        self.chunk_size = chunk_size
+        self.thumbnail_size = thumbnail_size
+
+    def download(self, url: str, directory: str) -> str:
+        """Stream a card into a task directory, or link the stored copy when the server says it is unchanged.
+
+        The card's thumbnail is put next to it, see thumbnail_path().
+
+        Args:
+            url (str): Recipe card url.
+            directory (str): Task directory to put the card in.
+
+        Returns:
+            str: Path to the card in the task directory
+        """
+        record, headers = self._validators(url)
+        response = self.client.fetch(url, endpoint="image", stream=True, headers=headers)
+        tmp_path = os.path.join(directory, f"{card_filename(url)}.part")
+        try:
+            try:
+                if response.status_code == 304 and record is not None:
+                    logger.debug("recipe card not modified, reusing the stored copy")
+                    try:
+                        return self._reuse(url, record, directory)
+                    except FileNotFoundError:
+                        logger.debug("stored recipe card was evicted meanwhile, downloading it again")
+                        return self.download(url, directory)
+                if response.status_code != 200:
+                    raise status_error(response.status_code, "Error loading recipe card image")
+
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+            finally:
+                response.close()
+            return self._store(url, tmp_path, directory, response.headers)
+        finally:
+            discard(tmp_path)
+
+    async def adownload(self, url: str, directory: str) -> str:
+        """Async variant of download(). The body is streamed to disk chunk by chunk from a worker thread."""
+        record, headers = await asyncio.to_thread(self._validators, url)
+        response = await self.client.afetch(url, endpoint="image", headers=headers, stream=True)
+        tmp_path = os.path.join(directory, f"{card_filename(url)}.part")
+        try:
+            try:
+                if response.status_code == 304 and record is not None:
+                    logger.debug("recipe card not modified, reusing the stored copy")
+                    try:
+                        return await asyncio.to_thread(self._reuse, url, record, directory)
+                    except FileNotFoundError:
+                        logger.debug("stored recipe card was evicted meanwhile, downloading it again")
+                        return await self.adownload(url, directory)
+                if response.status_code != 200:
+                    raise status_error(response.status_code, "Error loading recipe card image")
+
+                f = await asyncio.to_thread(open, tmp_path, "wb")
+                try:
+                    async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+            finally:
+                await response.aclose()
+            return await asyncio.to_thread(self._store, url, tmp_path, directory, response.headers)
+        finally:
+            await asyncio.to_thread(discard, tmp_path)
+
+    def _validators(self, url: str) -> Tuple[Optional[dict], dict]:
+        """The cached record of a card and the conditional request headers it allows"""
+        record = self.cache.get("card_image", url)
+        if record is None or not self.store.contains(record.get("path")):
+            return None, {}
+        headers = {}
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+        return record, headers
+
+    def _reuse(self, url: str, record: dict, directory: str) -> str:
+        """Link a still valid stored card, and its thumbnail, into a task directory.
+
+        Raises FileNotFoundError when the card was evicted after it was revalidated,
+        so the caller downloads it again. A missing thumbnail is made again.
+        """
+        name = card_filename(url)
+        path = self.store.link(record["path"], directory, name)
+        if record.get("thumb"):
+            try:
+                self.store.link(record["thumb"], directory, thumbnail_name(name))
+                return path
+            except FileNotFoundError:
+                pass
+        self.cache.set("card_image", url, {}, dict(record, thumb=self._thumbnail(path, directory)))
+        return path
+
+    def _store(self, url: str, tmp_path: str, directory: str, headers) -> str:
+        """Move a new card into the store, make its thumbnail and remember its validators"""
+        name = card_filename(url)
+        stored = self.store.add(tmp_path, directory, name)
+        path = os.path.join(directory, name)
+        self.cache.set(
+            "card_image",
+            url,
+            {},
+            {
+                "path": stored,
+                "thumb": self._thumbnail(path, directory),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            },
+        )
+        return path
+
+    def _thumbnail(self, path: str, directory: str) -> str:
+        """Make the thumbnail of a card in a task directory and store it"""
+        thumb_path = make_thumbnail(path, self.thumbnail_size)
+        tmp_path = f"{thumb_path}.part"
+        try:
+            os.replace(thumb_path, tmp_path)
+            return self.store.add(tmp_path, directory, os.path.basename(thumb_path))
+        finally:
+            discard(tmp_path)
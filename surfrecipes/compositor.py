@@ -0,0 +1,217 @@
+import logging
+import os
+import struct
+import zlib
+from typing import BinaryIO, Final, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .overlay import load_font
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+# Rows rendered at a time when streaming
+DEFAULT_BAND_HEIGHT: Final = 256
+
+# Bisection steps when searching for the scale that fits a budget once rounded to whole pixels
+FIT_ITERATIONS: Final = 40
+
+PNG_SIGNATURE: Final = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    """A PNG chunk: length, type, data and CRC"""
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+class VerticalCompositor:
+    """Stacks images vertically with a numbered gutter, rendered whole or in horizontal bands"""
+
+    def __init__(
+        self,
+        images: List[Image.Image],
+        padding: int = 10,
+        line_height: int = 2,
+        gutter: int = 100,
+        max_height: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the compositor and lay the images out. Nothing is drawn yet.
+
+        Args:
+            images (List[Image.Image]): Images to stack, top to bottom.
+            padding (int, optional): Space above and below each image. Defaults to 10.
+            line_height (int, optional): Width of the divider between images. Defaults to 2.
+            gutter (int, optional): Width of the label column left of the images. Defaults to 100.
+            max_height (int, optional): Downscale the images so the composite is at most this
+                tall. Defaults to None.
+            max_bytes (int, optional): Downscale the images so the composite's RGB pixels take
+                at most this many bytes. Defaults to None.
+        """
+        if not images:
+            raise ValueError("No images to combine.")
+        self.images = images
+        self.padding = padding
+        self.line_height = line_height
+        self.gutter = gutter
+        self.font = load_font("arial.ttf", 36)
+
+        self.scale = 1.0
+        sizes = np.array([image.size for image in images], dtype=float)
+        scale = self._fit_scale(sizes, max_height, max_bytes)
+        if scale < 1:
+            # Rounding each image to whole pixels can overshoot, so bisect for the largest scale that fits
+            if not self._fits(self._scaled(sizes, scale), max_height, max_bytes):
+                low, high = 0.0, scale
+                for _ in range(FIT_ITERATIONS):
+                    middle = (low + high) / 2
+                    if self._fits(self._scaled(sizes, middle), max_height, max_bytes):
+                        low = middle
+                    else:
+                        high = middle
+                scale = low
+            logger.debug(f"downscaling {len(images)} images by {scale:.3f} to fit the budget")
+            self.scale = scale
+            sizes = self._scaled(sizes, scale)
+        sizes = sizes.astype(int)
+        self.widths, self.heights = sizes[:, 0], sizes[:, 1]
+
+        # Each image sits below its padding, and each slot but the last ends with a divider
+        slots = self.heights + 2 * padding + line_height
+        starts = np.concatenate([[0], np.cumsum(slots)[:-1]])
+        self.tops = starts + padding
+        self.dividers = self.tops[:-1] + self.heights[:-1] + padding
+        self.width = int(self.widths.max()) + gutter
+        self.height = int(slots.sum()) - line_height
+
+        # Labels are drawn 18px above the middle of their image
+        self.label_ys = self.tops + self.heights // 2 - 18
+        self._label_height = self.font.getbbox("0123456789")[3]
+
+    @staticmethod
+    def _scaled(sizes: np.ndarray, scale: float) -> np.ndarray:
+        """Image sizes at a scale, in whole pixels"""
+        return np.maximum(np.rint(sizes * scale), 1)
+
+    def _size(self, sizes: np.ndarray) -> Tuple[int, int]:
+        """Width and height of the composite of images of these sizes"""
+        count = len(sizes)
+        fixed = 2 * self.padding * count + self.line_height * (count - 1)
+        return int(sizes[:, 0].max()) + self.gutter, int(sizes[:, 1].sum()) + fixed
+
+    def _fits(self, sizes: np.ndarray, max_height: Optional[int], max_bytes: Optional[int]) -> bool:
+        """Whether the composite of images of these sizes is within the budgets"""
+        width, height = self._size(sizes)
+        return (max_height is None or height <= max_height) and (max_bytes is None or 3 * width * height <= max_bytes)
+
+    def _fit_scale(self, sizes: np.ndarray, max_height: Optional[int], max_bytes: Optional[int]) -> float:
+        """The largest scale, at most 1, that keeps the composite within the budgets"""
+        if self._fits(sizes, max_height, max_bytes):
+            return 1.0
+        # Images never shrink below 1px, so a budget the smallest composite misses cannot be met
+        if not self._fits(np.ones_like(sizes), max_height, max_bytes):
+            raise ValueError("The budget does not leave room for the padding, dividers and 1px images.")
+        width, height = self._size(sizes)
+        fixed_width = width - sizes[:, 0].max()
+        fixed_height = height - sizes[:, 1].sum()
+
+        scale = 1.0
+        if max_height is not None:
+            scale = (max_height - fixed_height) / sizes[:, 1].sum()
+        if max_bytes is not None:
+            # Solve 3 * (fixed_width + s * width) * (fixed_height + s * height) = max_bytes for s
+            a = sizes[:, 0].max() * sizes[:, 1].sum()
+            b = sizes[:, 0].max() * fixed_height + fixed_width * sizes[:, 1].sum()
+            c = fixed_width * fixed_height - max_bytes / 3
+            scale = min(scale, (-b + (b * b - 4 * a * c) ** 0.5) / (2 * a))
+        if scale <= 0:
+            raise ValueError("The budget does not leave room for the padding and dividers.")
+        return min(scale, 1.0)
+
+    def _image_rows(self, index: int, top: int, bottom: int) -> Image.Image:
+        """Rows [top, bottom) of an image, at the composite's scale"""
+        image = self.images[index]
+        if self.scale == 1:
+            return image.crop((0, top, image.width, bottom))
+        # Resizing only the rows a band needs; Pillow samples across the box edges
+        ratio = image.height / self.heights[index]
+        return image.resize(
+            (int(self.widths[index]), bottom - top),
+            Image.BICUBIC,
+            box=(0, top * ratio, image.width, bottom * ratio),
+        )
+
+    def render_band(self, top: int, bottom: int) -> Image.Image:
+        """Render rows [top, bottom) of the composite.
+
+        Args:
+            top (int): First row.
+            bottom (int): Row after the last one.
+
+        Returns:
+            Image.Image: The RGB band.
+        """
+        bottom = min(bottom, self.height)
+        band = Image.new("RGB", (self.width, bottom - top), "white")
+        draw = ImageDraw.Draw(band)
+
+        # Only the images, labels and dividers that reach into the band
+        first = int(np.searchsorted(self.tops + self.heights, top, side="right"))
+        last = int(np.searchsorted(self.tops, bottom, side="left"))
+        for index in range(first, last):
+            image_top = int(self.tops[index])
+            rows_top = max(top - image_top, 0)
+            rows_bottom = min(bottom - image_top, int(self.heights[index]))
+            if rows_bottom > rows_top:
+                band.paste(self._image_rows(index, rows_top, rows_bottom), (self.gutter, image_top + rows_top - top))
+
+        labels = np.nonzero((self.label_ys < bottom) & (self.label_ys + self._label_height > top))[0]
+        for index in labels:
+            draw.text((20, int(self.label_ys[index]) - top), str(index), fill="black", font=self.font)
+
+        for y in self.dividers[(self.dividers >= top - self.line_height) & (self.dividers < bottom + self.line_height)]:
+            draw.line([(0, int(y) - top), (self.width, int(y) - top)], fill="black", width=self.line_height)
+
+        return band
+
+    def render(self) -> Image.Image:
+        """Render the whole composite into one preallocated image"""
+        return self.render_band(0, self.height)
+
+    def bands(self, band_height: int = DEFAULT_BAND_HEIGHT) -> Iterator[Tuple[int, Image.Image]]:
+        """Render the composite a band at a time, so it is never held whole.
+
+        Args:
+            band_height (int, optional): Rows per band. Defaults to DEFAULT_BAND_HEIGHT.
+
+        Yields:
+            Tuple[int, Image.Image]: The first row of each band, and the band.
+        """
+        for top in range(0, self.height, band_height):
+            yield top, self.render_band(top, top + band_height)
+
+    def write_png(self, fp: BinaryIO, band_height: int = DEFAULT_BAND_HEIGHT, compress_level: int = 6) -> None:
+        """Encode the composite as a PNG band by band.
+
+        Args:
+            fp (BinaryIO): File to write to.
+            band_height (int, optional): Rows rendered and compressed at a time. Defaults to DEFAULT_BAND_HEIGHT.
+            compress_level (int, optional): zlib compression level. Defaults to 6.
+        """
+        fp.write(PNG_SIGNATURE)
+        fp.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)))
+        compressor = zlib.compressobj(compress_level)
+        for _, band in self.bands(band_height):
+            rows = np.asarray(band).reshape(band.height, -1)
+            # The Sub filter: each byte minus the same channel of the pixel on its left
+            filtered = rows.copy()
+            filtered[:, 3:] -= rows[:, :-3]
+            data = np.concatenate([np.ones((band.height, 1), dtype=np.uint8), filtered], axis=1)
+            chunk = compressor.compress(data.tobytes())
+            if chunk:
+                fp.write(_png_chunk(b"IDAT", chunk))
+        fp.write(_png_chunk(b"IDAT", compressor.flush()))
+        fp.write(_png_chunk(b"IEND", b""))
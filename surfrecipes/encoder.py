@@ -0,0 +1,273 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Callable, Dict, Final, Optional, Tuple, Union
+
+from PIL import Image
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+
+def _png_options(encoder: "ImageEncoder") -> Dict[str, Any]:
+    return {} if encoder.compress_level is None else {"compress_level": encoder.compress_level}
+
+
+def _lossy_options(encoder: "ImageEncoder") -> Dict[str, Any]:
+    return {} if encoder.quality is None else {"quality": encoder.quality}
+
+
+# Output formats: save options taken from the encoder, and the modes the format can hold
+FORMATS: Dict[str, Tuple[Callable[["ImageEncoder"], Dict[str, Any]], Optional[frozenset]]] = {
+    "PNG": (_png_options, None),
+    "JPEG": (_lossy_options, frozenset({"L", "RGB", "CMYK"})),
+    "WEBP": (_lossy_options, frozenset({"RGB", "RGBA"})),
+}
+
+
+def pixel_digest(img: Image.Image) -> str:
+    """sha256 of everything that decides how an image encodes: its pixels, palette and transparency.
+
+    The pixels are streamed from Pillow's raw encoder in chunks, the way Image.tobytes()
+    reads them, without joining them into one copy of the whole buffer.
+    """
+    digest = hashlib.sha256()
+    img.load()
+    if img.width and img.height:
+        encoder = Image._getencoder(img.mode, "raw", img.mode)
+        encoder.setimage(img.im)
+        bufsize = max(65536, img.width * 4)
+        while True:
+            _, errcode, data = encoder.encode(bufsize)
+            digest.update(data)
+            if errcode:
+                break
+        if errcode < 0:
+            raise RuntimeError(f"encoder error {errcode} reading the pixels")
+    if img.palette is not None:
+        digest.update(img.palette.mode.encode("ascii"))
+        digest.update(bytes(img.getpalette(img.palette.mode) or ()))
+    digest.update(repr(img.info.get("transparency")).encode("ascii"))
+    return digest.hexdigest()
+
+
+def register_format(
+    name: str, options: Callable[["ImageEncoder"], Dict[str, Any]], modes: Optional[frozenset] = None
+) -> None:
+    """Let encoders write another format Pillow can save.
+
+    Args:
+        name (str): Pillow format name, e.g. "AVIF".
+        options (Callable): Returns the save options for an encoder.
+        modes (frozenset, optional): Modes the format can hold; others are converted to RGB. Defaults to any.
+    """
+    FORMATS[name.upper()] = (options, modes)
+
+
+class ImageEncoder:
+    """Encodes images as base64 data URIs, downscaling and compressing as configured"""
+
+    def __init__(
+        self,
+        image_format: Optional[str] = None,
+        compress_level: Optional[int] = None,
+        quality: Optional[int] = None,
+        max_dimension: Optional[int] = None,
+        cache_bytes: int = 32 * 1024 * 1024,
+    ) -> None:
+        """
+        Initialize the encoder.
+
+        Args:
+            image_format (str, optional): Output format, a key of FORMATS. Defaults to None,
+                which keeps the format of files and writes images as PNG.
+            compress_level (int, optional): PNG compression level, 0 to 9. Defaults to Pillow's default.
+            quality (int, optional): JPEG and WebP quality, 1 to 100. Defaults to Pillow's default.
+            max_dimension (int, optional): Downscale images whose width or height is larger.
+                Defaults to None.
+            cache_bytes (int, optional): Total size of the data URIs kept, 0 to disable the cache.
+                Defaults to 32MiB.
+        """
+        if image_format is not None and image_format.upper() not in FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.image_format = image_format.upper() if image_format else None
+        self.compress_level = compress_level
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.cache_bytes = cache_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.passthroughs = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _settings(self, image_format: str) -> tuple:
+        """What, besides the pixels, decides the output"""
+        return (image_format, self.compress_level, self.quality, self.max_dimension)
+
+    def _reencodes(self, image_format: str) -> bool:
+        """Whether a setting of this encoder changes how a format is written"""
+        options, _ = FORMATS.get(image_format, (None, None))
+        return options is not None and bool(options(self))
+
+    def _target_size(self, size: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """The downscaled size of an image, or None when it fits"""
+        if self.max_dimension is None or max(size) <= self.max_dimension:
+            return None
+        scale = self.max_dimension / max(size)
+        return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+    def _get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            uri = self._cache.get(key)
+            if uri is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return uri
+
+    def _put(self, key: tuple, uri: str) -> None:
+        """Keep a data URI, evicting the least recently used ones over budget"""
+        if len(uri) > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = uri
+            self._size += len(uri)
+            while self._size > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._size -= len(evicted)
+
+    def encode(self, img: Image.Image, image_format: Optional[str] = None) -> bytes:
+        """Encode an image, downscaled to max_dimension.
+
+        Args:
+            img (Image.Image): The image.
+            image_format (str, optional): Output format. Defaults to the encoder's, or PNG.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        with self._encoded(img, image_format) as buffer:
+            return buffer.getvalue()
+
+    def _encoded(self, img: Image.Image, image_format: Optional[str] = None) -> BytesIO:
+        """Encode an image into a buffer"""
+        image_format = (image_format or self.image_format or "PNG").upper()
+        options, modes = FORMATS[image_format]
+        size = self._target_size(img.size)
+        if size is not None:
+            img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        if modes is not None and img.mode not in modes:
+            img = img.convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, format=image_format, **options(self))
+        return buffer
+
+    def data_uri(self, img: Image.Image, image_format: Optional[str] = None) -> str:
+        """Encode an image as a base64 data URI, served from the cache when the same pixels
+        were encoded with the same settings before.
+
+        Args:
+            img (Image.Image): The image.
+            image_format (str, optional): Output format. Defaults to the encoder's, or PNG.
+
+        Returns:
+            str: The data URI.
+        """
+        image_format = (image_format or self.image_format or "PNG").upper()
+        key = None
+        uri = None
+        if self.cache_bytes > 0:
+            key = (pixel_digest(img), img.mode, img.size) + self._settings(image_format)
+            uri = self._get(key)
+        if uri is None:
+            # Base64 straight from the buffer, without copying the encoded bytes out first
+            with self._encoded(img, image_format) as buffer, buffer.getbuffer() as data:
+                uri = _data_uri(data, image_format)
+            if key is not None:
+                self._put(key, uri)
+        return uri
+
+    def file_data_uri(self, filepath: str) -> str:
+        """Encode an image file as a base64 data URI, passing its bytes through unchanged
+        when it is already in the output format, small enough, and no quality or compression
+        level is set for that format.
+
+        Args:
+            filepath (str): Path to the image.
+
+        Returns:
+            str: The data URI.
+        """
+        with Image.open(filepath) as img:
+            source_format = img.format or "PNG"
+            image_format = self.image_format or source_format
+            if (
+                image_format == source_format
+                and self._target_size(img.size) is None
+                and not self._reencodes(image_format)
+            ):
+                self.passthroughs += 1
+                with open(filepath, "rb") as f:
+                    return _data_uri(f.read(), image_format)
+            if image_format not in FORMATS:
+                image_format = "PNG"
+            return self.data_uri(img, image_format)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hits, misses and files passed through, and the size of the cache"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "passthroughs": self.passthroughs,
+                "entries": len(self._cache),
+                "bytes": self._size,
+            }
+
+    @classmethod
+    def from_env(cls) -> "ImageEncoder":
+        """Create an encoder configured from environment variables.
+
+        SURFRECIPES_IMAGE_FORMAT, SURFRECIPES_IMAGE_COMPRESS_LEVEL, SURFRECIPES_IMAGE_QUALITY,
+        SURFRECIPES_IMAGE_MAX_DIMENSION and SURFRECIPES_IMAGE_CACHE_BYTES.
+
+        Returns:
+            ImageEncoder: The encoder
+        """
+        compress_level = os.getenv("SURFRECIPES_IMAGE_COMPRESS_LEVEL")
+        quality = os.getenv("SURFRECIPES_IMAGE_QUALITY")
+        max_dimension = os.getenv("SURFRECIPES_IMAGE_MAX_DIMENSION")
+        return cls(
+            image_format=os.getenv("SURFRECIPES_IMAGE_FORMAT") or None,
+            compress_level=int(compress_level) if compress_level else None,
+            quality=int(quality) if quality else None,
+            max_dimension=int(max_dimension) if max_dimension else None,
+            cache_bytes=int(os.getenv("SURFRECIPES_IMAGE_CACHE_BYTES", str(32 * 1024 * 1024))),
+        )
+
+
+def _data_uri(data: Union[bytes, memoryview], image_format: str) -> str:
+    """A base64 data URI of encoded image bytes"""
+    return f"data:image/{image_format.lower()};base64," + base64.b64encode(data).decode("ascii")
+
+
+@lru_cache(maxsize=None)
+def default_encoder() -> ImageEncoder:
+    """The process wide image encoder.
+
+    Configured from the environment once, on first use; later changes to the variables are
+    not seen until default_encoder.cache_clear() is called. Since img.image_to_b64() uses this
+    encoder, SURFRECIPES_IMAGE_FORMAT changes the format it writes for the whole process.
+    """
+    return ImageEncoder.from_env()
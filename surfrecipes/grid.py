@@ -1,38 +1,13 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+
+from .overlay import intersection_grid
 
 # We need a simple grid: numbers from 1 to 9 in points on an intersection of nxn grid.
 # The font size may be 1/5 of the size of the height of the cell.
 # Therefore, we need the size of the image and colors, and the file_name. 
 
 def create_grid_image(image_width, image_height, color_circle, color_number, n, file_name):
-    cell_width = image_width // n
-    cell_height = image_height // n
-    font_size = max(cell_height // 5, 20)
-    circle_radius = font_size * 7 // 10
-
-    # Create a blank image with transparent background
-    img = Image.new('RGBA', (image_width, image_height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-
-    # Load a font
-    font = ImageFont.truetype("font/arialbd.ttf", font_size)
-
-    # Set the number of cells in each dimension
-    num_cells_x = n - 1 
-    num_cells_y = n - 1
-
-    # Draw the numbers in the center of each cell
-    for i in range(num_cells_x):
-        for j in range(num_cells_y):
-            number = i * num_cells_y + j + 1
-            text = str(number)
-            x = (i + 1) * cell_width
-            y = (j + 1) * cell_height
-            draw.ellipse([x - circle_radius, y - circle_radius, 
-                          x + circle_radius, y + circle_radius], 
-                          fill=color_circle)
-            offset_x = font_size / 4 if number < 10 else font_size / 2
-            draw.text((x - offset_x, y - font_size / 2), text, font=font, fill=color_number)
+    img = intersection_grid(image_width, image_height, n, color_circle, color_number, min_font_size=20)
 
     # Save the image
     img.save(file_name)
@@ -60,7 +35,8 @@ def zoom_in(image_path, n, index, upscale):
 
 
 
-# Example usage
+# Example usage, run as a module since the package uses relative imports:
+#   python -m surfrecipes.grid
 if __name__ == "__main__":
     create_grid_image(2880, 1712, 'yellow', 'green', 6, 'test.png')
 
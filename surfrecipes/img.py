@@ -1,8 +1,16 @@
-from typing import Tuple, List
-from PIL import Image, ImageDraw, ImageFont
+from collections.abc import Sequence
+from functools import cached_property
+from typing import Dict, Iterable, Optional, Tuple, List, Union
+from PIL import Image
 import base64
 from io import BytesIO
-from PIL import Image, ImageDraw
+
+import numpy as np
+
+from .blend import PreparedLayer
+from .compositor import VerticalCompositor
+from .encoder import ImageEncoder, default_encoder
+from .overlay import cell_grid, intersection_grid
 
 
 class Box:
@@ -63,43 +71,128 @@ class Box:
         )
 
 
+class CellGrid(Sequence):
+    """A num_cells x num_cells grid of cells over an image, copied out only when asked for"""
+
+    def __init__(self, image: Image.Image, num_cells: int) -> None:
+        """
+        Initialize the grid. Nothing is copied until a cell or the composite is asked for.
+
+        Args:
+            image (Image.Image): The image to divide.
+            num_cells (int): The number of cells per row and column.
+        """
+        self.image = image
+        self.num_cells = num_cells
+
+        img_width, img_height = image.size
+        cell_width = img_width // num_cells
+        cell_height = img_height // num_cells
+
+        # Cells run down the columns
+        self.boxes: List[Box] = [
+            Box(
+                i * cell_width,
+                j * cell_height,
+                min((i + 1) * cell_width, img_width),
+                min((j + 1) * cell_height, img_height),
+            )
+            for i in range(num_cells)
+            for j in range(num_cells)
+        ]
+        self._cells: Dict[int, Image.Image] = {}
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.cell(i) for i in range(*index.indices(len(self)))]
+        return self.cell(index)
+
+    @cached_property
+    def pixels(self) -> np.ndarray:
+        """The pixels of the whole image, read once and shared by all cell views"""
+        return np.asarray(self.image)
+
+    def view(self, index: int) -> np.ndarray:
+        """The pixels of a cell, as a view into the image's pixels.
+
+        Args:
+            index (int): Index of the cell.
+
+        Returns:
+            np.ndarray: A read only view, no pixels are copied.
+        """
+        box = self.boxes[index]
+        return self.pixels[box.top : box.bottom, box.left : box.right]
+
+    def cell(self, index: int) -> Image.Image:
+        """The image of a cell, copied out of the image on first use.
+
+        Args:
+            index (int): Index of the cell.
+
+        Returns:
+            Image.Image: The cropped cell.
+        """
+        index = range(len(self))[index]
+        img = self._cells.get(index)
+        if img is None:
+            # Pillow copies a crop natively, much faster than going through the NumPy view
+            img = self._cells[index] = self.boxes[index].crop_image(self.image)
+        return img
+
+    @cached_property
+    def composite(self) -> Image.Image:
+        """All cells stacked vertically and numbered, built on first use"""
+        return combine_images_vertically(list(self))
+
+    def compositor(self, max_height: Optional[int] = None, max_bytes: Optional[int] = None) -> VerticalCompositor:
+        """A compositor of all cells, to render the composite downscaled or in bands.
+
+        Args:
+            max_height (int, optional): Largest height of the composite. Defaults to None.
+            max_bytes (int, optional): Largest size of the composite's pixels. Defaults to None.
+
+        Returns:
+            VerticalCompositor: The compositor
+        """
+        return VerticalCompositor(list(self), max_height=max_height, max_bytes=max_bytes)
+
+
+def divide_image_into_grid(image: Image.Image, num_cells: int) -> CellGrid:
+    """Divides an image into a grid of cells, with their corresponding Box objects.
+
+    Cells are cropped, and the composite of all of them built, only when they are used.
+
+    Args:
+        image (Image.Image): The input image to be divided.
+        num_cells (int): The number of cells per row and column.
+
+    Returns:
+        CellGrid: The cells, in order, with their boxes and a composite image.
+    """
+    return CellGrid(image, num_cells)
+
+
 def divide_image_into_cells(
     image: Image.Image, num_cells: int
 ) -> Tuple[Image.Image, List[Image.Image], List[Box]]:
     """Divides an image into a grid of cells, returning both the cropped images and their corresponding Box objects.
 
+    Every cell and the composite are built up front; divide_image_into_grid() builds only
+    what is used.
+
     Args:
         image (Image.Image): The input image to be divided.
         num_cells (int): The number of cells per row and column.
 
     Returns:
-        Tuple[Image.Image, List[Box]]: A composite image, and a list of boxes corresponding to each cell.
+        Tuple[Image.Image, List[Image.Image], List[Box]]: A composite image, the cells and a list of boxes corresponding to each cell.
     """
-    img_width, img_height = image.size
-    cell_width = img_width // num_cells
-    cell_height = img_height // num_cells
-
-    cropped_images: List[Image.Image] = []
-    boxes: List[Box] = []
-    for i in range(num_cells):
-        for j in range(num_cells):
-            box = Box(
-                i * cell_width,
-                j * cell_height,
-                (i + 1) * cell_width if (i + 1) * cell_width < img_width else img_width,
-                (
-                    (j + 1) * cell_height
-                    if (j + 1) * cell_height < img_height
-                    else img_height
-                ),
-            )
-            cropped_image = box.crop_image(image)
-            cropped_images.append(cropped_image)
-            boxes.append(box)
-
-    composite = combine_images_vertically(cropped_images)
-
-    return composite, cropped_images, boxes
+    grid = divide_image_into_grid(image, num_cells)
+    return grid.composite, list(grid), grid.boxes
 
 
 def create_grid_image_by_num_cells(
@@ -121,44 +214,7 @@ def create_grid_image_by_num_cells(
     Returns:
         Image.Image: The image grid
     """
-    cell_width = image_width // num_cells
-    cell_height = image_height // num_cells
-    font_size = max(cell_height // 5, 30)
-    circle_radius = font_size * 7 // 10
-
-    # Create a blank image with transparent background
-    img = Image.new("RGBA", (image_width, image_height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-
-    # Load a font
-    font = ImageFont.truetype("fonts/arialbd.ttf", font_size)
-
-    # Set the number of cells in each dimension
-    num_cells_x = num_cells - 1
-    num_cells_y = num_cells - 1
-
-    # Draw the numbers in the center of each cell
-    for i in range(num_cells_x):
-        for j in range(num_cells_y):
-            number = i * num_cells_y + j + 1
-            text = str(number)
-            x = (i + 1) * cell_width
-            y = (j + 1) * cell_height
-            draw.ellipse(
-                [
-                    x - circle_radius,
-                    y - circle_radius,
-                    x + circle_radius,
-                    y + circle_radius,
-                ],
-                fill=color_circle,
-            )
-            offset_x = font_size / 4 if number < 10 else font_size / 2
-            draw.text(
-                (x - offset_x, y - font_size / 2), text, font=font, fill=color_text
-            )
-
-    return img
+    return intersection_grid(image_width, image_height, num_cells, color_circle, color_text)
 
 
 def create_grid_image_by_size(
@@ -180,107 +236,24 @@ def create_grid_image_by_size(
     Returns:
         Image.Image: The image with a grid.
     """
-    num_cells_x = image_width // cell_size
-    num_cells_y = image_height // cell_size
-    font_size = max(cell_size // 5, 10)
-    circle_radius = (
-        cell_size // 2 - 2
-    )  # Slightly smaller than half the cell for visual appeal
-
-    # Create a blank image
-    img = Image.new("RGBA", (image_width, image_height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-
-    # Load a font
-    try:
-        font = ImageFont.truetype("arialbd.ttf", font_size)
-    except IOError:
-        font = ImageFont.load_default()
-        print("Custom font not found. Using default font.")
-
-    # Draw the grid
-    for i in range(num_cells_x):
-        for j in range(num_cells_y):
-            number = i * num_cells_y + j + 1
-            text = str(number)
-            x_center = (i + 0.5) * cell_size
-            y_center = (j + 0.5) * cell_size
-
-            # Draw circle
-            draw.ellipse(
-                [
-                    x_center - circle_radius,
-                    y_center - circle_radius,
-                    x_center + circle_radius,
-                    y_center + circle_radius,
-                ],
-                fill=color_circle,
-            )
+    return cell_grid(image_width, image_height, cell_size, color_circle, color_text)
 
-            # Calculate text offset for centering using getbbox()
-            bbox = font.getbbox(text)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            draw.text(
-                (x_center - text_width / 2, y_center - text_height / 2),
-                text,
-                font=font,
-                fill=color_text,
-            )
 
-    return img
-
-
-def combine_images_vertically(images: List[Image.Image]) -> Image.Image:
-    """Combine images vertically and draw a small red circle in the center of each image."""
-    padding = 10
-    line_height = 2
-    total_height = sum(image.height + padding * 2 for image in images) + line_height * (
-        len(images) - 1
-    )
-    max_width = max(image.width for image in images) + 100
-
-    combined_image = Image.new("RGB", (max_width, total_height), "white")
-    draw = ImageDraw.Draw(combined_image)
-
-    # Attempt to use a larger font; adjust the path as necessary
-    try:
-        font = ImageFont.truetype("./font/arial.ttf", 36)
-    except IOError:
-        font = ImageFont.load_default()
-        print("Fallback to default font.")
-
-    y_offset = 0
-    for index, image in enumerate(images):
-        new_y_offset = y_offset + padding
-        combined_image.paste(image, (100, new_y_offset))
-
-        # Draw a small red circle in the center of the image
-        circle_radius = 5  # Radius of the circle
-        center_x = 100 + image.width // 2
-        center_y = new_y_offset + image.height // 2
-        # draw.ellipse(
-        #     [
-        #         (center_x - circle_radius, center_y - circle_radius),
-        #         (center_x + circle_radius, center_y + circle_radius),
-        #     ],
-        #     fill="red",
-        # )
-
-        draw.text(
-            (20, center_y - 18),
-            str(index),
-            fill="black",
-            font=font,
-        )
-        y_offset = new_y_offset + image.height + padding
-        if index < len(images) - 1:
-            draw.line(
-                [(0, y_offset), (max_width, y_offset)], fill="black", width=line_height
-            )
-            y_offset += line_height
+def combine_images_vertically(
+    images: List[Image.Image], max_height: Optional[int] = None, max_bytes: Optional[int] = None
+) -> Image.Image:
+    """Combine images vertically, numbering each one in a gutter on the left.
+
+    Args:
+        images (List[Image.Image]): Images to stack, top to bottom.
+        max_height (int, optional): Downscale the images so the result is at most this tall. Defaults to None.
+        max_bytes (int, optional): Downscale the images so the result's pixels take at most this
+            many bytes. Defaults to None.
 
-    return combined_image
+    Returns:
+        Image.Image: The combined image. Use VerticalCompositor to stream it in bands instead.
+    """
+    return VerticalCompositor(images, max_height=max_height, max_bytes=max_bytes).render()
 
 
 def zoom_in(
@@ -304,64 +277,62 @@ def zoom_in(
 
 
 def superimpose_images(
-    base: Image.Image, layer: Image.Image, opacity: float = 1
+    base: Image.Image,
+    layer: Union[Image.Image, PreparedLayer],
+    opacity: float = 1,
+    out: Optional[Image.Image] = None,
 ) -> Image.Image:
-    """
+    """Superimpose a layer onto the grayscale of a base image.
 
     Args:
         base (Image.Image): Base image
-        layer (Image.Image): Layered image
-        opacity (float): How much opacity the layer should have. Defaults to 1.
+        layer (Union[Image.Image, PreparedLayer]): Layered image, or one prepared to be reused
+        opacity (float): How much opacity the layer should have; ignored for a prepared layer. Defaults to 1.
+        out (Image.Image, optional): RGBA image to write the result into. Defaults to None.
 
     Returns:
         Image.Image: The superimposed image
     """
-    # Ensure both images have the same size
     if base.size != layer.size:
         raise ValueError("Images must have the same dimensions.")
+    if not isinstance(layer, PreparedLayer):
+        layer = PreparedLayer(layer, opacity)
+    return layer.apply(base, out)
 
-    # Convert the images to RGBA mode if they are not already
-    base = base.convert("RGBA")
-    layer = layer.convert("RGBA")
 
-    # Create a new image with the same size as the input images
-    merged_image = Image.new("RGBA", base.size)
+def superimpose_many(
+    bases: Iterable[Image.Image], layer: Union[Image.Image, PreparedLayer], opacity: float = 1
+) -> List[Image.Image]:
+    """Superimpose one layer, such as a grid, onto many base images, converting it only once.
 
-    # Convert image1 to grayscale
-    base = base.convert("L")
-
-    # Paste image1 onto the merged image
-    merged_image.paste(base, (0, 0))
-
-    # Create a new image for image2 with adjusted opacity
-    image2_with_opacity = Image.blend(
-        Image.new("RGBA", layer.size, (0, 0, 0, 0)), layer, opacity
-    )
-
-    # Paste image2 with opacity onto the merged image
-    merged_image = Image.alpha_composite(merged_image, image2_with_opacity)
+    Args:
+        bases (Iterable[Image.Image]): Base images, all of the layer's size
+        layer (Union[Image.Image, PreparedLayer]): Layered image, or one already prepared
+        opacity (float): How much opacity the layer should have; ignored for a prepared layer. Defaults to 1.
 
-    return merged_image
+    Returns:
+        List[Image.Image]: The superimposed images, in order
+    """
+    if not isinstance(layer, PreparedLayer):
+        layer = PreparedLayer(layer, opacity)
+    return layer.apply_many(bases)
 
 
-def image_to_b64(img: Image.Image, image_format="PNG") -> str:
+def image_to_b64(img: Image.Image, image_format: Optional[str] = None, encoder: Optional[ImageEncoder] = None) -> str:
     """Converts a PIL Image to a base64-encoded string with MIME type included.
 
     Args:
         img (Image.Image): The PIL Image object to convert.
-        image_format (str): The format to use when saving the image (e.g., 'PNG', 'JPEG').
+        image_format (str, optional): The format to use when saving the image (e.g., 'PNG', 'JPEG').
+            Defaults to the encoder's format, or PNG. For the process wide encoder that is
+            SURFRECIPES_IMAGE_FORMAT when set, so pass a format when the caller depends on one.
+        encoder (ImageEncoder, optional): Encoder to use. Defaults to the process wide one,
+            configured from the environment on first use.
 
     Returns:
         str: A base64-encoded string of the image with MIME type.
     """
-    buffer = BytesIO()
-    img.save(buffer, format=image_format)
-    image_data = buffer.getvalue()
-    buffer.close()
-
-    mime_type = f"image/{image_format.lower()}"
-    base64_encoded_data = base64.b64encode(image_data).decode("utf-8")
-    return f"data:{mime_type};base64,{base64_encoded_data}"
+    return (encoder or default_encoder()).data_uri(img, image_format)
 
 
 def b64_to_image(base64_str: str) -> Image.Image:
@@ -382,20 +353,17 @@ def b64_to_image(base64_str: str) -> Image.Image:
     return image
 
 
-def load_image_base64(filepath: str) -> str:
-    # Load the image from the file path
-    image = Image.open(filepath)
-    buffered = BytesIO()
-
-    # Save image to the buffer
-    image_format = image.format if image.format else "PNG"
-    image.save(buffered, format=image_format)
+def load_image_base64(filepath: str, encoder: Optional[ImageEncoder] = None) -> str:
+    """Loads an image file as a base64-encoded string with MIME type included.
 
-    # Encode the image to base64
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    The file's bytes are used as they are unless the encoder has to convert or downscale it.
 
-    # Prepare the mime type
-    mime_type = f"image/{image_format.lower()}"
+    Args:
+        filepath (str): Path to the image.
+        encoder (ImageEncoder, optional): Encoder to use. Defaults to the process wide one,
+            configured from the environment.
 
-    # Return base64 string with mime type
-    return f"data:{mime_type};base64,{img_str}"
+    Returns:
+        str: A base64-encoded string of the image with MIME type.
+    """
+    return (encoder or default_encoder()).file_data_uri(filepath)
@@ -0,0 +1,338 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Final, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+# Fonts shipped as package data, so they are found from an installed package and any working directory
+FONT_DIR: Final = os.path.join(os.path.dirname(__file__), "data", "fonts")
+
+# Finished overlays kept, keyed by their size, layout and colors
+OVERLAY_CACHE_SIZE: Final = int(os.getenv("SURFRECIPES_OVERLAY_CACHE_SIZE", "8"))
+
+
+@lru_cache(maxsize=None)
+def load_font(name: str, size: int) -> ImageFont.ImageFont:
+    """Load a font shipped in FONT_DIR once per size, falling back to Pillow's default font.
+
+    Args:
+        name (str): File name of the font, e.g. "arialbd.ttf".
+        size (int): Font size in pixels.
+
+    Returns:
+        ImageFont.ImageFont: The font
+    """
+    try:
+        return ImageFont.truetype(os.path.join(FONT_DIR, name), size)
+    except IOError:
+        logger.warning(f"font {name} not found in {FONT_DIR}, using the default font")
+        return ImageFont.load_default()
+
+
+def _crop_to_ink(img: Image.Image, pad: int) -> Tuple[np.ndarray, int, int]:
+    """Crop a stamp drawn at (pad, pad) to its visible pixels.
+
+    Returns:
+        Tuple[np.ndarray, int, int]: The RGBA pixels and their offset from the drawing origin.
+    """
+    bbox = img.getchannel("A").getbbox() or (0, 0, 1, 1)
+    return np.asarray(img.crop(bbox)), bbox[0] - pad, bbox[1] - pad
+
+
+class StampAtlas:
+    """Markers and digit glyphs pre-rendered once, to be stamped onto many cells"""
+
+    def __init__(self, font: ImageFont.ImageFont, radius: int, color_circle: str, color_text: str) -> None:
+        """
+        Initialize the atlas.
+
+        Args:
+            font (ImageFont.ImageFont): Font of the numbers.
+            radius (int): Radius of the circle marker.
+            color_circle (str): Color of the circles.
+            color_text (str): Color of the numbers.
+        """
+        size = 2 * radius + 1
+        circle = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        ImageDraw.Draw(circle).ellipse([0, 0, 2 * radius, 2 * radius], fill=color_circle)
+        self.circle = np.asarray(circle)
+        self.radius = radius
+
+        self.digits: List[Tuple[np.ndarray, int, int]] = []
+        advances, lefts, tops, rights, bottoms = [], [], [], [], []
+        for digit in "0123456789":
+            left, top, right, bottom = font.getbbox(digit)
+            pad = max(right - left, bottom - top, 1)
+            glyph = Image.new("RGBA", (right + 2 * pad, bottom + 2 * pad), (0, 0, 0, 0))
+            ImageDraw.Draw(glyph).text((pad, pad), digit, font=font, fill=color_text)
+            self.digits.append(_crop_to_ink(glyph, pad))
+            advances.append(font.getlength(digit))
+            lefts.append(left)
+            tops.append(top)
+            rights.append(right)
+            bottoms.append(bottom)
+
+        # Per digit metrics, indexed by the digit
+        self.advances = np.array(advances)
+        self.lefts = np.array(lefts)
+        self.tops = np.array(tops)
+        self.rights = np.array(rights)
+        self.bottoms = np.array(bottoms)
+
+    def layout(self, numbers: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Split numbers into digits and find where each digit starts.
+
+        Args:
+            numbers (np.ndarray): Non negative integers.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Digits, left to right and -1 past the
+                end of a number; the x offset of each digit from the text origin; and the
+                text bounding boxes as (left, top, right, bottom) rows.
+        """
+        lengths = np.floor(np.log10(np.maximum(numbers, 1))).astype(int) + 1
+        width = int(lengths.max()) if len(numbers) else 1
+        places = width - 1 - np.arange(width)
+        digits = (numbers[:, None] // 10 ** places[None, :]) % 10
+        # Shift each number left so its first digit is in the first column
+        shift = (np.arange(width)[None, :] + (width - lengths)[:, None]).clip(max=width - 1)
+        digits = np.take_along_axis(digits, shift, axis=1)
+        present = np.arange(width)[None, :] < lengths[:, None]
+        digits = np.where(present, digits, -1)
+
+        safe = digits.clip(min=0)
+        advances = np.where(present, self.advances[safe], 0.0)
+        offsets = np.cumsum(advances, axis=1) - advances
+
+        last = np.take_along_axis(safe, (lengths - 1)[:, None], axis=1)[:, 0]
+        last_offset = np.take_along_axis(offsets, (lengths - 1)[:, None], axis=1)[:, 0]
+        bbox = np.stack(
+            [
+                self.lefts[safe[:, 0]],
+                np.where(present, self.tops[safe], np.inf).min(axis=1),
+                last_offset + self.rights[last],
+                np.where(present, self.bottoms[safe], -np.inf).max(axis=1),
+            ],
+            axis=1,
+        )
+        return digits, offsets, bbox
+
+
+def _lattice(xs: np.ndarray, ys: np.ndarray) -> Optional[Tuple[int, int, int, int, int, int]]:
+    """Origin, steps and counts of positions forming a full, evenly spaced lattice, if they do"""
+    ux, uy = np.unique(xs), np.unique(ys)
+    if len(ux) * len(uy) != len(xs):
+        return None
+    dx, dy = np.diff(ux), np.diff(uy)
+    if (len(dx) and (dx != dx[0]).any()) or (len(dy) and (dy != dy[0]).any()):
+        return None
+    step_x = int(dx[0]) if len(dx) else 0
+    step_y = int(dy[0]) if len(dy) else 0
+    return int(ux[0]), int(uy[0]), step_x, step_y, len(ux), len(uy)
+
+
+def place(canvas: np.ndarray, stamp: np.ndarray, xs: np.ndarray, ys: np.ndarray, blend: bool = True) -> None:
+    """Alpha composite a stamp onto a canvas at many positions at once.
+
+    Stamps placed in one call must not overlap each other.
+
+    Args:
+        canvas (np.ndarray): RGBA pixels, changed in place; padded so that no stamp
+            falls outside it.
+        stamp (np.ndarray): RGBA pixels of the stamp.
+        xs (np.ndarray): Left edges of the stamps.
+        ys (np.ndarray): Top edges of the stamps.
+        blend (bool, optional): Composite over the canvas; when False the stamp is copied,
+            which is only right where the canvas is still transparent. Defaults to True.
+    """
+    if not len(xs):
+        return
+    height, width = stamp.shape[:2]
+    xs = xs.astype(np.intp)
+    ys = ys.astype(np.intp)
+
+    if not blend:
+        lattice = _lattice(xs, ys)
+        if lattice is not None:
+            x0, y0, step_x, step_y, nx, ny = lattice
+            if (nx == 1 or step_x >= width) and (ny == 1 or step_y >= height):
+                # A strided view of every cell of the lattice, written in one copy
+                s0, s1, s2 = canvas.strides
+                view = np.lib.stride_tricks.as_strided(
+                    canvas[y0:, x0:],
+                    shape=(ny, height, nx, width, 4),
+                    strides=(step_y * s0, s0, step_x * s1, s1, s2),
+                )
+                view[...] = stamp[None, :, None, :, :]
+                return
+
+    # Only the visible pixels of the stamp, addressed in the flattened canvas
+    ink_rows, ink_cols = np.nonzero(stamp[..., 3])
+    pixels = canvas.reshape(-1, 4)
+    index = (ys[:, None] + ink_rows[None, :]) * canvas.shape[1] + xs[:, None] + ink_cols[None, :]
+    src = stamp[ink_rows, ink_cols]
+    if not blend:
+        pixels[index] = src
+        return
+
+    src = src.astype(np.float32) / 255
+    dst = pixels[index].astype(np.float32) / 255
+    src_a = src[:, 3:]
+    dst_a = dst[..., 3:] * (1 - src_a)
+    out_a = src_a + dst_a
+    out_rgb = (src[:, :3] * src_a + dst[..., :3] * dst_a) / np.where(out_a > 0, out_a, 1)
+    out = np.concatenate([out_rgb, out_a], axis=-1)
+    pixels[index] = np.rint(out * 255).astype(np.uint8)
+
+
+def _round(values: np.ndarray) -> np.ndarray:
+    """Round halves up, like pixel coordinates, rather than to even"""
+    return np.floor(values + 0.5)
+
+
+def render_markers(
+    width: int,
+    height: int,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    numbers: np.ndarray,
+    atlas: StampAtlas,
+    text_xs: np.ndarray,
+    text_ys: np.ndarray,
+) -> Image.Image:
+    """Draw numbered circle markers onto a transparent image.
+
+    Args:
+        width (int): Width of the image.
+        height (int): Height of the image.
+        xs (np.ndarray): Circle centers, x.
+        ys (np.ndarray): Circle centers, y.
+        numbers (np.ndarray): Number written on each marker.
+        atlas (StampAtlas): Pre-rendered circle and digits.
+        text_xs (np.ndarray): Text origins, x, as given to ImageDraw.text.
+        text_ys (np.ndarray): Text origins, y, as given to ImageDraw.text.
+
+    Returns:
+        Image.Image: The RGBA overlay
+    """
+    # Pad the canvas so stamps near the edges need no clipping
+    pad = max(atlas.circle.shape[0], *(max(d.shape[:2]) + abs(dx) + abs(dy) for d, dx, dy in atlas.digits))
+    pad += int(np.ceil(np.abs(text_xs - xs).max(initial=0) + np.abs(text_ys - ys).max(initial=0)))
+    canvas = np.zeros((height + 2 * pad, width + 2 * pad, 4), dtype=np.uint8)
+
+    # Markers never overlap, so the circles go onto the empty canvas as they are
+    place(canvas, atlas.circle, _round(xs) - atlas.radius + pad, _round(ys) - atlas.radius + pad, blend=False)
+
+    digits, offsets, _ = atlas.layout(numbers)
+    for column in range(digits.shape[1]):
+        for digit in np.unique(digits[:, column]):
+            if digit < 0:
+                continue
+            stamp, dx, dy = atlas.digits[digit]
+            selected = digits[:, column] == digit
+            place(
+                canvas,
+                stamp,
+                _round(text_xs[selected] + offsets[selected, column]) + dx + pad,
+                _round(text_ys[selected]) + dy + pad,
+            )
+
+    return Image.fromarray(np.ascontiguousarray(canvas[pad : pad + height, pad : pad + width]), "RGBA")
+
+
+@lru_cache(maxsize=None)
+def stamp_atlas(font_name: str, font_size: int, radius: int, color_circle: str, color_text: str) -> StampAtlas:
+    """The stamp atlas of a font size, marker radius and colors"""
+    return StampAtlas(load_font(font_name, font_size), radius, color_circle, color_text)
+
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def _intersection_grid(
+    width: int, height: int, num_cells: int, color_circle: str, color_text: str, min_font_size: int
+) -> Image.Image:
+    cell_width = width // num_cells
+    cell_height = height // num_cells
+    font_size = max(cell_height // 5, min_font_size)
+    atlas = stamp_atlas("arialbd.ttf", font_size, font_size * 7 // 10, color_circle, color_text)
+
+    # Numbers run down the columns, starting at 1
+    i, j = np.meshgrid(np.arange(num_cells - 1), np.arange(num_cells - 1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    numbers = i * (num_cells - 1) + j + 1
+    xs = ((i + 1) * cell_width).astype(float)
+    ys = ((j + 1) * cell_height).astype(float)
+    text_xs = xs - np.where(numbers < 10, font_size / 4, font_size / 2)
+    text_ys = ys - font_size / 2
+    return render_markers(width, height, xs, ys, numbers, atlas, text_xs, text_ys)
+
+
+def intersection_grid(
+    width: int,
+    height: int,
+    num_cells: int,
+    color_circle: str,
+    color_text: str,
+    min_font_size: int = 30,
+) -> Image.Image:
+    """Numbered circles on the inner intersections of a num_cells x num_cells grid.
+
+    Args:
+        width (int): Width of the image.
+        height (int): Height of the image.
+        num_cells (int): The number of cells in each dimension.
+        color_circle (str): Color of the circles.
+        color_text (str): Color of the numbers.
+        min_font_size (int, optional): Smallest font size of the numbers. Defaults to 30.
+
+    Returns:
+        Image.Image: The transparent overlay, a copy the caller may change
+    """
+    return _intersection_grid(width, height, num_cells, color_circle, color_text, min_font_size).copy()
+
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def _cell_grid(width: int, height: int, cell_size: int, color_circle: str, color_text: str) -> Image.Image:
+    num_cells_x = width // cell_size
+    num_cells_y = height // cell_size
+    font_size = max(cell_size // 5, 10)
+    # Slightly smaller than half the cell for visual appeal
+    atlas = stamp_atlas("arialbd.ttf", font_size, max(cell_size // 2 - 2, 0), color_circle, color_text)
+
+    i, j = np.meshgrid(np.arange(num_cells_x), np.arange(num_cells_y), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    numbers = i * num_cells_y + j + 1
+    xs = (i + 0.5) * cell_size
+    ys = (j + 0.5) * cell_size
+
+    # Center each number on its cell by its bounding box
+    _, _, bbox = atlas.layout(numbers)
+    text_xs = xs - (bbox[:, 2] - bbox[:, 0]) / 2
+    text_ys = ys - (bbox[:, 3] - bbox[:, 1]) / 2
+    return render_markers(width, height, xs, ys, numbers, atlas, text_xs, text_ys)
+
+
+def cell_grid(width: int, height: int, cell_size: int, color_circle: str, color_text: str) -> Image.Image:
+    """A numbered circle in the middle of every cell_size x cell_size cell.
+
+    Args:
+        width (int): Width of the image.
+        height (int): Height of the image.
+        cell_size (int): Width and height of each cell.
+        color_circle (str): Color of the circles.
+        color_text (str): Color of the numbers.
+
+    Returns:
+        Image.Image: The transparent overlay, a copy the caller may change
+    """
+    return _cell_grid(width, height, cell_size, color_circle, color_text).copy()
+
+
+def clear_cache() -> None:
+    """Drop the finished overlays kept in memory"""
+    _intersection_grid.cache_clear()
+    _cell_grid.cache_clear()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Final, Iterator, Optional, Tuple
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+
+class Pushback:
+    """Rate limits and upstream errors seen by one task, taken step by step"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.retry_after: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, retry_after: Optional[float] = None) -> None:
+        """Count a rate limit or upstream error, keeping the longest Retry-After hint"""
+        with self._lock:
+            self.count += 1
+            self.total += 1
+            if retry_after is not None:
+                self.retry_after = max(retry_after, self.retry_after or 0.0)
+
+    def take(self) -> Tuple[int, Optional[float]]:
+        """The push back seen since the last call, and the Retry-After hint that came with it"""
+        with self._lock:
+            taken = (self.count, self.retry_after)
+            self.count = 0
+            self.retry_after = None
+            return taken
+
+
+# Push back of the task running in the current context, so concurrent tasks pace independently
+_current_pushback: ContextVar[Optional[Pushback]] = ContextVar("surfrecipes_pushback", default=None)
+
+
+@contextmanager
+def tracking_pushback(pushback: Pushback) -> Iterator[Pushback]:
+    """Send the push back recorded in this context, and in tasks and threads started from it, to a counter"""
+    token = _current_pushback.set(pushback)
+    try:
+        yield pushback
+    finally:
+        _current_pushback.reset(token)
+
+
+def record_pushback(retry_after: Optional[float] = None) -> None:
+    """Count a rate limit or upstream error against the task of the current context, if any"""
+    pushback = _current_pushback.get()
+    if pushback is not None:
+        pushback.record(retry_after)
+
+
+class StepPacer:
+    """Paces agent steps, backing off only when upstream services push back"""
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        backoff_initial: float = 1.0,
+        backoff_factor: float = 2.0,
+        backoff_max: float = 30.0,
+    ) -> None:
+        """
+        Initialize the pacer.
+
+        Args:
+            delay (float, optional): Pause between steps when nothing pushes back. Defaults to 0.
+            backoff_initial (float, optional): First pause after a rate limit or upstream error. Defaults to 1.
+            backoff_factor (float, optional): Growth of the pause on repeated signals, and its
+                decay on clean steps. Defaults to 2.
+            backoff_max (float, optional): Longest pause. Defaults to 30.
+        """
+        self.base_delay = delay
+        self.backoff_initial = backoff_initial
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+
+        self.delay = delay
+        self.steps = 0
+        self.backoffs = 0
+        self.working_seconds = 0.0
+        self.waiting_seconds = 0.0
+
+    @contextmanager
+    def working(self) -> Iterator[None]:
+        """Account the wrapped block as time spent working"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.working_seconds += time.monotonic() - start
+            self.steps += 1
+
+    def step_done(self, pushed_back: bool = False, retry_after: Optional[float] = None) -> None:
+        """Adjust the pause after a step.
+
+        Args:
+            pushed_back (bool, optional): Whether the step hit a rate limit or upstream error.
+                Defaults to False.
+            retry_after (float, optional): Pause requested by the upstream service. Defaults to None.
+        """
+        if pushed_back:
+            self.backoffs += 1
+            delay = max(self.delay * self.backoff_factor, self.backoff_initial)
+            self.delay = min(max(delay, retry_after or 0.0), self.backoff_max)
+            logger.info(f"backing off {self.delay:.2f}s between steps")
+        elif self.delay > self.base_delay:
+            self.delay = max(self.delay / self.backoff_factor, self.base_delay)
+            if self.delay < self.backoff_initial:
+                self.delay = self.base_delay
+
+    def wait(self) -> None:
+        """Pause before the next step, if needed"""
+        if self.delay <= 0:
+            return
+        start = time.monotonic()
+        time.sleep(self.delay)
+        self.waiting_seconds += time.monotonic() - start
+
+    async def wait_async(self) -> None:
+        """Async variant of wait()"""
+        if self.delay <= 0:
+            return
+        start = time.monotonic()
+        await asyncio.sleep(self.delay)
+        self.waiting_seconds += time.monotonic() - start
+
+    def stats(self) -> Dict[str, float]:
+        """Time spent waiting compared with working"""
+        total = self.working_seconds + self.waiting_seconds
+        return {
+            "steps": self.steps,
+            "backoffs": self.backoffs,
+            "working_seconds": round(self.working_seconds, 3),
+            "waiting_seconds": round(self.waiting_seconds, 3),
+            "waiting_ratio": round(self.waiting_seconds / total, 3) if total else 0.0,
+        }
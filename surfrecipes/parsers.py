@@ -0,0 +1,364 @@
+import re
+from typing import Dict, Final, List, Optional, Tuple
+
+from .units import UNIT_ALIASES, UNITS, normalize_unit, parse_amount
+
+# Diets understood by the Spoonacular search, keyed by how users write them
+DIETS: Final[Dict[str, str]] = {
+    "vegetarian": "vegetarian",
+    "veggie": "vegetarian",
+    "lacto-vegetarian": "lacto-vegetarian",
+    "lacto vegetarian": "lacto-vegetarian",
+    "ovo-vegetarian": "ovo-vegetarian",
+    "ovo vegetarian": "ovo-vegetarian",
+    "vegan": "vegan",
+    "pescetarian": "pescetarian",
+    "pescatarian": "pescetarian",
+    "ketogenic": "ketogenic",
+    "keto": "ketogenic",
+    "paleo": "paleo",
+    "paleolithic": "paleo",
+    "primal": "primal",
+    "low fodmap": "low fodmap",
+    "low-fodmap": "low fodmap",
+    "whole30": "whole30",
+    "whole 30": "whole30",
+}
+
+# Intolerances, written as "<name>-free" or "<name> free"
+INTOLERANCES: Final[Dict[str, str]] = {
+    "dairy": "dairy",
+    "lactose": "dairy",
+    "egg": "egg",
+    "gluten": "gluten",
+    "grain": "grain",
+    "peanut": "peanut",
+    "nut": "nut",
+    "tree nut": "tree nut",
+    "seafood": "seafood",
+    "sesame": "sesame",
+    "shellfish": "shellfish",
+    "soy": "soy",
+    "sulfite": "sulfite",
+    "wheat": "wheat",
+}
+
+# Words that mean the request says more than the structured format can hold
+UNPARSEABLE_WORDS: Final = frozenset(
+    {
+        "for",
+        "under",
+        "less",
+        "than",
+        "more",
+        "minutes",
+        "hours",
+        "calories",
+        "that",
+        "which",
+        "something",
+        "anything",
+        "can",
+        "could",
+        "should",
+        "i",
+        "my",
+        "me",
+        "not",
+        "or",
+        "but",
+        "if",
+        "to",
+        "from",
+    }
+)
+
+# Words joining the parts of a conversion, never the end of an ingredient name
+CONVERSION_WORDS: Final = frozenset({"in", "into", "to", "as", "of"})
+
+# Words that negate what follows them, e.g. "non vegetarian"
+NEGATIONS: Final = frozenset({"non", "not", "never", "nothing", "none", "anti"})
+
+# Words that constrain a request in ways the structured format cannot hold
+QUALIFIER_WORDS: Final = frozenset(
+    {
+        "cheap",
+        "budget",
+        "inexpensive",
+        "affordable",
+        "expensive",
+        "kid",
+        "kids",
+        "child",
+        "children",
+        "family",
+        "friendly",
+        "healthy",
+        "unhealthy",
+        "light",
+        "low",
+        "high",
+        "fancy",
+        "party",
+        "romantic",
+        "leftover",
+        "leftovers",
+        "authentic",
+        "traditional",
+    }
+)
+
+# Words that only flavour a request and are left out of the search
+FILLER_WORDS: Final = frozenset(
+    {"quick", "easy", "simple", "delicious", "tasty", "good", "nice", "great", "best", "homemade"}
+)
+
+LEAD_IN: Final = re.compile(
+    r"^(?:(?:hi|hey|please|can you|could you|would you|will you)[,\s]+)*"
+    r"(?:find|search for|search|look for|show|give|get|suggest|recommend|"
+    r"i want|i would like|i'd like|i need|i am looking for|i'm looking for)"
+    r"(?:\s+me)?\s+"
+)
+ARTICLE: Final = re.compile(r"^(?:a|an|the|some|any)\s+")
+EXCLUDE_CLAUSE: Final = re.compile(
+    r"\s*[,]?\s*\b(?:and\s+|but\s+)?(?:without|with no|excluding|no)\s+(?:any\s+)?(?P<items>.+)$"
+)
+INCLUDE_CLAUSE: Final = re.compile(
+    r"\s*\b(?:with|containing|using|including|that has|that have)\s+(?P<items>.+)$"
+)
+FREE_MODIFIER: Final = re.compile(r"^(?P<name>[a-z ]+?)[- ]free$")
+
+AMOUNT: Final = r"(?P<amount>\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+|[½¼¾⅓⅔⅛]|\d+\s*[½¼¾⅓⅔⅛])"
+INGREDIENT: Final = r"(?P<ingredient>[a-z][a-z\- ]*?)"
+UNIT_NAMES: Final = "|".join(
+    re.escape(name) for name in sorted(set(UNITS) | set(UNIT_ALIASES), key=len, reverse=True) if name
+)
+CONVERSION_PATTERNS: Final = [
+    re.compile(
+        r"^(?:(?:please|can you|could you)\s+)*"
+        r"(?:convert|how much is|how much are|what is|what's|how many \S+ (?:is|are))\s+"
+        + AMOUNT
+        + rf"\s*(?P<unit>{UNIT_NAMES})\.?\s+(?:of\s+)?"
+        + INGREDIENT
+        + rf"\s+(?:in|into|to|as)\s+(?P<target>{UNIT_NAMES})\.?$"
+    ),
+    re.compile(
+        r"^(?:(?:please|can you|could you)\s+)*"
+        rf"how many (?P<target>{UNIT_NAMES}) (?:is|are) (?:there )?in\s+"
+        + AMOUNT
+        + rf"\s*(?P<unit>{UNIT_NAMES})\.?\s+(?:of\s+)?"
+        + INGREDIENT
+        + r"$"
+    ),
+]
+
+SUBSTITUTE_PATTERNS: Final = [
+    re.compile(p)
+    for p in (
+        r"^what (?:is|are|'s|would be) (?:a |an |some )?(?:good |possible )?(?:substitutes?|replacements?|alternatives?) (?:for|to) (?P<ingredient>.+)$",
+        r"^what can i (?:use|substitute|have) (?:instead of|in place of|for) (?P<ingredient>.+)$",
+        r"^what can i replace (?P<ingredient>.+?) with$",
+        r"^(?:(?:please|can you|could you)\s+)*(?:suggest|find|give me|list|show me)\s+(?:a |an |some )?(?:good )?(?:substitutes?|replacements?|alternatives?) (?:for|to) (?P<ingredient>.+)$",
+        r"^(?:substitutes?|replacements?|alternatives?) (?:for|to) (?P<ingredient>.+)$",
+        r"^how (?:can|do) i (?:substitute|replace) (?P<ingredient>.+)$",
+    )
+]
+# "substitute A for B" replaces B, and "replace A with B" replaces A
+SUBSTITUTE_FOR: Final = re.compile(
+    r"^(?:how (?:can|do) i|can i|could i|should i) (?:substitute|use|swap) (?P<replacement>.+?) for (?P<ingredient>.+)$"
+)
+REPLACE_WITH: Final = re.compile(
+    r"^(?:how (?:can|do) i|can i|could i|should i) (?:substitute|replace|swap) (?P<ingredient>.+?) (?:with|by) (?P<replacement>.+)$"
+)
+SUBSTITUTE_TAIL: Final = re.compile(r"\s+(?:in|for|when|if|because|since|so|while)\b.*$")
+
+
+def _clean(text: str) -> str:
+    """Lowercase and trim a request, dropping trailing punctuation"""
+    text = " ".join(text.lower().replace("’", "'").split())
+    return text.rstrip(" .!?")
+
+
+def _words_ok(text: str, max_words: int = 4) -> bool:
+    """Whether a phrase is a short run of plain words the parser can vouch for"""
+    words = text.split()
+    return (
+        0 < len(words) <= max_words
+        and all(re.fullmatch(r"[a-z][a-z\-']*", word) for word in words)
+        and not UNPARSEABLE_WORDS.intersection(words)
+    )
+
+
+def _partial(text: str) -> bool:
+    """Whether a phrase still holds a "-free" modifier the parser did not take, e.g. sugar-free dessert"""
+    return "free" in re.split(r"[\s\-]+", text)
+
+
+def _split_items(text: str) -> Optional[List[str]]:
+    """Split an ingredient list such as "tomato, carrots and cucumber" """
+    items = []
+    for item in re.split(r"\s*,\s*(?:and\s+)?|\s+and\s+|\s*&\s*", text):
+        item = ARTICLE.sub("", item.strip())
+        if not item:
+            continue
+        if not _words_ok(item, max_words=3) or _partial(item):
+            return None
+        items.append(item)
+    return items
+
+
+def _take_modifiers(words: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    """Consume leading diet, "<x>-free" and filler words, returning diets, intolerances and the rest"""
+    diets: List[str] = []
+    intolerances: List[str] = []
+    while words:
+        if words[0] in FILLER_WORDS:
+            words = words[1:]
+            continue
+        for size in (2, 1):
+            if len(words) < size:
+                continue
+            phrase = " ".join(words[:size])
+            if phrase in DIETS:
+                diets.append(DIETS[phrase])
+                break
+            match = FREE_MODIFIER.match(phrase)
+            if match and match.group("name").rstrip("s") in INTOLERANCES:
+                intolerances.append(INTOLERANCES[match.group("name").rstrip("s")])
+                break
+        else:
+            return diets, intolerances, words
+        words = words[size:]
+        if words and words[0] in ("and", ","):
+            words = words[1:]
+    return diets, intolerances, words
+
+
+def parse_recipe_requirements(text: str) -> Optional[Dict[str, str]]:
+    """Parse a simple recipe request without a language model.
+
+    Handles requests such as "Find me a gluten-free vegetarian salad recipe with
+    tomato and carrots and without any eggs."
+
+    Args:
+        text (str): The user requirement in plain English.
+
+    Returns:
+        Optional[Dict[str, str]]: The breakdown the recipe analyzer produces, or None
+            if the request is not simple enough to parse with confidence.
+    """
+    text = _clean(text)
+    words = text.replace("-", " ").split()
+    if NEGATIONS.intersection(words) or QUALIFIER_WORDS.intersection(words):
+        return None
+    # Without a lead-in such as "find me", a bare phrase like "hello" is not known to be a request
+    anchored = LEAD_IN.match(text) is not None
+    text = LEAD_IN.sub("", text)
+    text = ARTICLE.sub("", text)
+
+    exclude: List[str] = []
+    match = EXCLUDE_CLAUSE.search(text)
+    if match:
+        items = _split_items(match.group("items"))
+        if items is None:
+            return None
+        exclude = items
+        text = text[: match.start()]
+
+    include: List[str] = []
+    match = INCLUDE_CLAUSE.search(text)
+    if match:
+        items = _split_items(match.group("items"))
+        if items is None:
+            return None
+        include = items
+        text = text[: match.start()]
+
+    text = text.replace(",", " , ")
+    match = re.search(r"(?:^|\s+)(?:recipes?|dish(?:es)?|meals?)$", text)
+    if match:
+        anchored = True
+        text = text[: match.start()]
+    diets, intolerances, words = _take_modifiers(text.split())
+    food = " ".join(word for word in words if word not in FILLER_WORDS)
+    if food in ("recipe", "recipes"):
+        food = ""
+    if food and (not _words_ok(food, max_words=3) or _partial(food)):
+        return None
+    if not (food or diets or include):
+        return None
+    if not (anchored or diets or intolerances or include or exclude):
+        return None
+
+    return {
+        "food": food,
+        "diet": ",".join(diets),
+        "intolerances": ",".join(intolerances),
+        "include_ingredients": ",".join(include),
+        "exclude_ingredients": ",".join(exclude),
+    }
+
+
+def parse_conversion_requirements(text: str) -> Optional[Dict[str, str]]:
+    """Parse a simple conversion request such as "Convert 2 cups of flour into grams".
+
+    Args:
+        text (str): The conversion requirement in plain English.
+
+    Returns:
+        Optional[Dict[str, str]]: The breakdown the conversion analyzer produces, or None
+            if the request is not simple enough to parse with confidence.
+    """
+    text = _clean(text)
+    for pattern in CONVERSION_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        unit, target = match.group("unit"), match.group("target")
+        ingredient = ARTICLE.sub("", match.group("ingredient").strip())
+        # An ingredient such as "oil in" is what is left of a request with no target unit after it
+        if (
+            normalize_unit(unit) is None
+            or normalize_unit(target) is None
+            or parse_amount(match.group("amount")) is None
+            or not _words_ok(ingredient, max_words=3)
+            or CONVERSION_WORDS.intersection(ingredient.split())
+            or any(normalize_unit(word) is not None for word in ingredient.split())
+        ):
+            continue
+        return {
+            "ingredient_name": ingredient,
+            "source_amount": match.group("amount").strip(),
+            "source_unit": unit,
+            "target_unit": target,
+        }
+    return None
+
+
+def parse_substitute_requirements(text: str) -> Optional[Dict[str, str]]:
+    """Parse a simple substitution request such as "What can I use instead of butter?".
+
+    Args:
+        text (str): The substitution requirement in plain English.
+
+    Returns:
+        Optional[Dict[str, str]]: The breakdown the substitution analyzer produces, or None
+            if the request is not simple enough to parse with confidence.
+    """
+    text = _clean(text)
+    match = SUBSTITUTE_FOR.match(text) or REPLACE_WITH.match(text)
+    if match:
+        ingredient = ARTICLE.sub("", SUBSTITUTE_TAIL.sub("", match.group("ingredient")).strip())
+        # "substitute butter for baking" names a purpose, not the ingredient being replaced
+        if _words_ok(ingredient, max_words=3) and not ingredient.endswith("ing"):
+            return {"ingredient_name": ingredient}
+        return None
+    for pattern in SUBSTITUTE_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        ingredient = SUBSTITUTE_TAIL.sub("", match.group("ingredient"))
+        ingredient = ARTICLE.sub("", ingredient.strip())
+        if _words_ok(ingredient, max_words=3):
+            return {"ingredient_name": ingredient}
+    return None
@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Final, Hashable, Optional
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+
+class Prefetcher:
+    """Runs the predictable follow-up of an action in the background, while the model deliberates"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, enabled: bool = True) -> None:
+        """
+        Initialize the prefetcher.
+
+        Args:
+            max_workers (int, optional): Prefetches run at once. Defaults to 2.
+            max_pending (int, optional): Unclaimed prefetches kept before new ones are skipped. Defaults to 8.
+            enabled (bool, optional): Whether to prefetch at all. Defaults to True.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.enabled = enabled
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self.issued = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+        self.wasted = 0
+        self.cancelled = 0
+
+    def prefetch(self, key: Hashable, fn: Callable[..., Any], *args) -> None:
+        """Start a follow-up call in the background, unless it is already pending.
+
+        Args:
+            key (Hashable): Identifies the call, for the action that will ask for it.
+            fn (Callable[..., Any]): The call.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            if len(self._pending) >= self.max_pending:
+                self.skipped += 1
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="surfrecipes-prefetch"
+                )
+            # In a copy of the caller's context, so push back counts for the task that prefetched
+            self._pending[key] = self._executor.submit(contextvars.copy_context().run, fn, *args)
+            self.issued += 1
+        logger.debug(f"prefetching {key}")
+
+    def _claim(self, key: Hashable) -> Optional[Future]:
+        """Take the prefetch of a call, counting a miss when there is none"""
+        with self._lock:
+            future = self._pending.pop(key, None)
+            if future is None:
+                self.misses += 1
+            return future
+
+    def _count(self, key: Hashable, error: Optional[BaseException]) -> None:
+        """Count a claimed prefetch as a hit, or as a failure and a miss when the call has to be made"""
+        with self._lock:
+            if error is None:
+                self.hits += 1
+                return
+            self.failed += 1
+            self.misses += 1
+        logger.debug(f"prefetch of {key} failed: {error}")
+
+    def run(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        """Return the prefetched result of a call, or make the call when there is none.
+
+        A failed prefetch is retried by making the call.
+
+        Args:
+            key (Hashable): Identifies the call.
+            fn (Callable[..., Any]): The call.
+
+        Returns:
+            Any: The result of the call
+        """
+        future = self._claim(key)
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception as e:
+                self._count(key, e)
+            else:
+                self._count(key, None)
+                return result
+        return fn(*args)
+
+    async def arun(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Async variant of run(), awaiting the prefetch without blocking the event loop"""
+        future = self._claim(key)
+        if future is not None:
+            try:
+                result = await asyncio.wrap_future(future)
+            except Exception as e:
+                self._count(key, e)
+            else:
+                self._count(key, None)
+                return result
+        return await fn(*args)
+
+    def close(self) -> None:
+        """Cancel prefetches not yet started, and count the unclaimed ones that ran anyway as wasted.
+
+        Waits for the prefetches already running, so none of them still writes into the
+        task's directory once the caller removes it.
+        """
+        with self._lock:
+            for future in self._pending.values():
+                if future.cancel():
+                    self.cancelled += 1
+                else:
+                    self.wasted += 1
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Prefetches issued, claimed, failed, wasted and cancelled, and the hit rate of the calls asked for.
+
+        Only a claimed prefetch that succeeded is a hit; one that failed is also a miss, since
+        the call is made again. Unclaimed prefetches that ran are wasted, while those cancelled
+        before they started cost nothing and are counted apart.
+        """
+        with self._lock:
+            asked = self.hits + self.misses
+            return {
+                "issued": self.issued,
+                "skipped": self.skipped,
+                "hits": self.hits,
+                "misses": self.misses,
+                "failed": self.failed,
+                "wasted": self.wasted + sum(1 for f in self._pending.values() if f.done()),
+                "cancelled": self.cancelled,
+                "hit_rate": round(self.hits / asked, 3) if asked else 0.0,
+            }
+
+    @classmethod
+    def from_env(cls) -> "Prefetcher":
+        """Create a prefetcher configured from environment variables.
+
+        SURFRECIPES_PREFETCH (true or false), SURFRECIPES_PREFETCH_WORKERS and
+        SURFRECIPES_PREFETCH_MAX_PENDING.
+
+        Returns:
+            Prefetcher: The prefetcher
+        """
+        return cls(
+            max_workers=int(os.getenv("SURFRECIPES_PREFETCH_WORKERS", "2")),
+            max_pending=int(os.getenv("SURFRECIPES_PREFETCH_MAX_PENDING", "8")),
+            enabled=os.getenv("SURFRECIPES_PREFETCH", "true").lower() == "true",
+        )
@@ -52,4 +52,13 @@ Example: If the user says "What is a substitute for butter" or "What can I use i
 {
     "ingredient_name": "butter"
 }
-"""
\ No newline at end of file
+"""
+agent_system_prompt = (
+    "You are a helpful AI assistant that analyzes user requirements and suggests actions that must be executed to meet those requirements."
+    "You will receive details of a task and your job is to suggest what action should be taken next."
+    "The actions available to you are {tools}."
+    "When you respond, always give a raw JSON adhering to the following schema and with the correct action called."
+    "Schema: {schema}"
+    "If no further action is needed, return 'result' as the action_name."
+    "Let me know when you are ready and I'll send you the user requirement."
+)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a full scheduler"""
+
+
+class TaskScheduler:
+    """Runs jobs on a fixed pool of async workers behind a bounded queue"""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 32,
+        deadline: Optional[float] = 600.0,
+        window: int = 256,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            workers (int, optional): Jobs run at once. Defaults to 4.
+            max_queue (int, optional): Jobs waiting for a worker before new ones are rejected. Defaults to 32.
+            deadline (float, optional): Seconds a job may take from admission, queueing included.
+                None means no deadline. Defaults to 600.
+            window (int, optional): Recent queue waits kept for the stats. Defaults to 256.
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._waits: deque = deque(maxlen=window)
+
+        self.busy = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    def start(self) -> None:
+        """Start the workers on the running event loop"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"surfrecipes-worker-{i}") for i in range(self.workers)
+        ]
+        logger.info(f"task scheduler started with {self.workers} workers, queue of {self.max_queue}")
+
+    async def stop(self) -> None:
+        """Cancel the workers, abandoning any queued jobs"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        deadline: Optional[float] = None,
+        on_timeout: Optional[Callable[[], Any]] = None,
+        name: str = "job",
+    ) -> None:
+        """Admit a job, or reject it when the queue is full.
+
+        Args:
+            job (Callable[[], Awaitable[Any]]): Coroutine function to run.
+            deadline (float, optional): Deadline in seconds, overriding the scheduler's. Defaults to None.
+            on_timeout (Callable[[], Any], optional): Called when the job misses its deadline,
+                whether queued or running. Defaults to None.
+            name (str, optional): Name used in logs. Defaults to "job".
+
+        Raises:
+            QueueFull: When no more jobs can be queued.
+        """
+        if self._queue is None:
+            raise RuntimeError("scheduler is not started")
+        deadline = self.deadline if deadline is None else deadline
+        expires = time.monotonic() + deadline if deadline is not None else None
+        try:
+            self._queue.put_nowait((job, time.monotonic(), expires, on_timeout, name))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"{self._queue.qsize()} jobs already queued")
+        self.submitted += 1
+
+    async def _work(self) -> None:
+        """Worker loop: take jobs off the queue and run them within their deadline"""
+        assert self._queue is not None
+        while True:
+            job, queued, expires, on_timeout, name = await self._queue.get()
+            self._waits.append(time.monotonic() - queued)
+            self.busy += 1
+            try:
+                timeout = expires - time.monotonic() if expires is not None else None
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(job(), timeout=timeout)
+                self.completed += 1
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                logger.warning(f"{name} missed its deadline")
+                if on_timeout is not None:
+                    try:
+                        await asyncio.to_thread(on_timeout)
+                    except Exception as e:
+                        logger.error(f"{name} timeout handler failed: {e}")
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"{name} failed: {e}")
+            finally:
+                self.busy -= 1
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker usage, outcome counters and recent queue waits"""
+        waits = sorted(self._waits)
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0,
+            },
+        }
+
+    @classmethod
+    def from_env(cls) -> "TaskScheduler":
+        """Create a scheduler configured from environment variables.
+
+        SURFRECIPES_WORKERS, SURFRECIPES_MAX_QUEUE and SURFRECIPES_TASK_DEADLINE (seconds,
+        0 for none).
+
+        Returns:
+            TaskScheduler: The scheduler
+        """
+        deadline = float(os.getenv("SURFRECIPES_TASK_DEADLINE", "600"))
+        return cls(
+            workers=int(os.getenv("SURFRECIPES_WORKERS", "4")),
+            max_queue=int(os.getenv("SURFRECIPES_MAX_QUEUE", "32")),
+            deadline=deadline or None,
+        )
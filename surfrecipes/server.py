@@ -1,15 +1,21 @@
+import asyncio
 import logging
 import os
 import sys
+import time
 from contextlib import asynccontextmanager
-from typing import Final
+from typing import Annotated, Final
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from surfkit.auth.transport import get_user_dependency
+from surfkit.server.models import V1SolveTask, V1UserProfile
 from surfkit.server.routes import task_router
+from taskara import Task, TaskStatus
 
 from .agent import Agent, router
+from .scheduler import QueueFull, TaskScheduler
 
 # Configure logging
 logger: Final = logging.getLogger("surfrecipes")
@@ -28,12 +34,16 @@ ALLOW_ORIGINS = os.getenv("ALLOW_ORIGINS", "*").split(",")
 ALLOW_METHODS = os.getenv("ALLOW_METHODS", "*").split(",")
 ALLOW_HEADERS = os.getenv("ALLOW_HEADERS", "*").split(",")
 
+scheduler = TaskScheduler.from_env()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize the agent type before the server comes live
     Agent.init()
+    scheduler.start()
     yield
+    await scheduler.stop()
 
 
 app = FastAPI(lifespan=lifespan)  # type: ignore
@@ -46,7 +56,120 @@ app.add_middleware(
     allow_headers=ALLOW_HEADERS,
 )
 
-app.include_router(task_router(Agent, router))
+scheduler_router = APIRouter()
+
+
+@scheduler_router.post("/v1/tasks")
+async def solve_task(
+    current_user: Annotated[V1UserProfile, Depends(get_user_dependency())],
+    task_model: V1SolveTask,
+):
+    """Queue a task on the scheduler, answering 429 when the queue is full"""
+    logger.info(f"solving task: {task_model.model_dump()}")
+    # Everything below that talks to the LLM providers or the tracker runs in worker
+    # threads, so the routes and the scheduler's workers share the event loop freely
+    try:
+        await asyncio.to_thread(router.check_model)
+    except Exception as e:
+        logger.error(f"Cannot connect to LLM providers: {e} -- did you provide a valid key?")
+        raise HTTPException(
+            status_code=500,
+            detail=f"failed to conect to LLM providers: {e} -- did you provide a valid key?",
+        )
+
+    owner_id = task_model.task.owner_id or "local"
+    task = await asyncio.to_thread(Task.from_v1, task_model.task, owner_id=owner_id)
+
+    def on_timeout() -> None:
+        _fail_task(task, "task deadline exceeded", f"Task '{task.description}' ran past its deadline")
+
+    try:
+        scheduler.submit(
+            lambda: _solve_task(task_model, task), on_timeout=on_timeout, name=f"task {task.id}"
+        )
+    except QueueFull as e:
+        logger.warning(f"rejecting task {task.id}: {e}")
+        raise HTTPException(status_code=429, detail="too many queued tasks, retry later")
+    logger.info("queued task...")
+    return
+
+
+@scheduler_router.get("/v1/scheduler")
+async def scheduler_stats():
+    """Worker pool, queue depth and queue wait statistics"""
+    return scheduler.stats()
+
+
+async def _solve_task(task_model: V1SolveTask, task: Task) -> None:
+    """Run a queued task, mirroring surfkit's task router"""
+    logger.info("Saving remote tasks status to running...")
+    task.status = TaskStatus.IN_PROGRESS
+    task.started = time.time()
+    await asyncio.to_thread(task.save)
+
+    if not task_model.task.device:
+        raise ValueError("No device provided")
+
+    logger.info(f"connecting to device {task_model.task.device.name}...")
+    device = None
+    for Device in Agent.supported_devices():
+        if Device.type() == task_model.task.device.type:
+            config = Device.connect_config_type()(**task_model.task.device.config)  # type: ignore
+            device = await asyncio.to_thread(Device.connect, config=config)
+    if not device:
+        raise ValueError(
+            f"Device {task_model.task.device.name} provided in solve task, but not supported by agent"
+        )
+
+    logger.info("starting agent...")
+    if task_model.agent:
+        config = Agent.config_type().model_validate(task_model.agent.config)
+        agent = Agent.from_config(config=config)
+    else:
+        agent = Agent.default()
+
+    try:
+        final_task = await agent.asolve_task(task=task, device=device, max_steps=task.max_steps)
+    except Exception as e:
+        logger.error(f"error running agent: {e}")
+        await asyncio.to_thread(_fail_task, task, str(e), f"Failed to run task '{task.description}': {e}")
+        return
+    finally:
+        print(f"► task run ended '{task.id}'", flush=True)
+
+    if final_task:
+        await asyncio.to_thread(_complete_task, final_task)
+
+
+def _fail_task(task: Task, error: str, message: str) -> None:
+    """Mark a task failed in the tracker and tell the user why"""
+    if task.remote:
+        task.refresh()
+    task.status = TaskStatus.FAILED
+    task.error = error
+    task.completed = time.time()
+    task.save()
+    task.post_message("assistant", message)
+
+
+def _complete_task(task: Task) -> None:
+    """Stamp a solved task's completion time in the tracker"""
+    if task.remote:
+        task.refresh()
+    task.completed = time.time()
+    task.save()
+
+
+# Tasks are solved through the scheduler rather than surfkit's unbounded background tasks
+task_routes = task_router(Agent, router)
+task_routes.routes = [
+    route
+    for route in task_routes.routes
+    if not (getattr(route, "path", None) == "/v1/tasks" and "POST" in getattr(route, "methods", ()))
+]
+
+app.include_router(scheduler_router)
+app.include_router(task_routes)
 
 if __name__ == "__main__":
     port = os.getenv("SERVER_PORT", "9090")
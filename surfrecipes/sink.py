@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Final, List, Optional, Tuple
+
+import requests
+from taskara import Task
+from tenacity import Retrying, before_sleep_log, retry_if_exception, stop_after_attempt, wait_exponential
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+# Tracker responses worth retrying
+RETRY_STATUSES: Final = frozenset({429, 500, 502, 503, 504})
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a tracker write failed in a way that may succeed if retried"""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+
+class TaskSink:
+    """Buffers task updates during a step and writes them to the tracker in one batch.
+
+    Updates are replayed in order on a single writer thread, so a remote tracker's
+    round trips stay off the agent's critical path. Consecutive saves are coalesced.
+    An update failing transiently is retried with backoff before it is dropped.
+    """
+
+    def __init__(
+        self,
+        task: Task,
+        background: bool = True,
+        attempts: int = 3,
+        backoff: float = 0.5,
+        backoff_max: float = 8.0,
+    ) -> None:
+        """
+        Initialize the sink.
+
+        Args:
+            task (Task): The task to update.
+            background (bool, optional): Write batches on a background thread rather than
+                in the caller. Defaults to True.
+            attempts (int, optional): Tries per update when the tracker fails transiently. Defaults to 3.
+            backoff (float, optional): Seconds before the first retry, doubling after. Defaults to 0.5.
+            backoff_max (float, optional): Longest wait between retries. Defaults to 8.0.
+        """
+        self.task = task
+        self.background = background
+        self.attempts = attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+        self._buffer: List[Tuple[str, tuple, dict]] = []
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._last: Optional[Future] = None
+        self._save_error: Optional[Exception] = None
+
+        self.updates = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.retries = 0
+        self.errors = 0
+
+    def post_message(self, role: str, msg: str, **kwargs) -> None:
+        """Buffer Task.post_message()"""
+        self._add("post_message", (role, msg), kwargs)
+
+    def add_prompt(self, prompt: Any) -> None:
+        """Buffer Task.add_prompt()"""
+        self._add("add_prompt", (prompt,), {})
+
+    def record_action(self, **kwargs) -> None:
+        """Buffer Task.record_action()"""
+        self._add("record_action", (), kwargs)
+
+    def save(self) -> None:
+        """Buffer Task.save(), coalescing it with a save buffered just before"""
+        with self._lock:
+            if self._buffer and self._buffer[-1][0] == "save":
+                self.coalesced += 1
+                return
+        self._add("save", (), {})
+
+    def _add(self, method: str, args: tuple, kwargs: dict) -> None:
+        """Buffer one update"""
+        with self._lock:
+            self._buffer.append((method, args, kwargs))
+            self.updates += 1
+
+    def flush(self, wait: bool = False) -> None:
+        """Write the buffered updates as one batch.
+
+        Args:
+            wait (bool, optional): Block until every batch so far is written. Defaults to False.
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            if batch:
+                self.batches += 1
+                if self.background:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=1, thread_name_prefix="surfrecipes-sink"
+                        )
+                    self._last = self._executor.submit(self._write, batch)
+            last = self._last
+
+        if batch and not self.background:
+            self._write(batch)
+        elif wait and last is not None:
+            last.result()
+
+    def _write(self, batch: List[Tuple[str, tuple, dict]]) -> None:
+        """Apply a batch of updates to the task, in order, retrying transient failures"""
+        for method, args, kwargs in batch:
+            try:
+                for attempt in Retrying(
+                    stop=stop_after_attempt(self.attempts),
+                    retry=retry_if_exception(is_transient),
+                    wait=wait_exponential(multiplier=self.backoff, max=self.backoff_max),
+                    before_sleep=self._before_retry,
+                    reraise=True,
+                ):
+                    with attempt:
+                        getattr(self.task, method)(*args, **kwargs)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"failed to write task update {method}: {e}")
+                if method == "save":
+                    self._save_error = e
+            else:
+                if method == "save":
+                    self._save_error = None
+
+    def _before_retry(self, retry_state) -> None:
+        """Count and log a retried update"""
+        self.retries += 1
+        before_sleep_log(logger, logging.WARNING)(retry_state)
+
+    def close(self, raise_errors: bool = True) -> None:
+        """Write everything still buffered and stop the writer.
+
+        Args:
+            raise_errors (bool, optional): Raise a failed final save rather than log it. Pass False
+                while another exception is propagating, so it is not masked. Defaults to True.
+
+        Raises:
+            Exception: The error of the last save, if it could not be written even after
+                retrying, since the tracker then does not hold the task's final state.
+        """
+        self.flush(wait=True)
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        if self._save_error is not None:
+            if raise_errors:
+                raise self._save_error
+            logger.error(f"final task save failed: {self._save_error}")
+
+    def stats(self) -> Dict[str, int]:
+        """Updates buffered, saves coalesced, batches written, retried writes and failed writes"""
+        return {
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "retries": self.retries,
+            "errors": self.errors,
+        }
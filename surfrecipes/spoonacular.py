@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Dict, Final, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .pacing import record_pushback
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+SPOONACULAR_BASE_URL = "https://api.spoonacular.com"
+
+# Read timeouts in seconds, keyed by the endpoint name passed to the client
+DEFAULT_TIMEOUTS: Final[Dict[str, float]] = {
+    "search": 10.0,
+    "card": 20.0,
+    "convert": 5.0,
+    "substitutes": 5.0,
+    "image": 30.0,
+}
+
+# Statuses worth retrying; 402 means the daily quota is spent and is not retried
+RETRY_STATUSES: Final = frozenset({429, 500, 502, 503, 504})
+
+
+class SpoonacularError(Exception):
+    """Raised when Spoonacular answers with an error after any retries"""
+
+
+class TransientSpoonacularError(SpoonacularError):
+    """Raised when Spoonacular still answers with a retryable status once the client's retries are spent"""
+
+
+def status_error(status_code: int, message: str) -> SpoonacularError:
+    """The error for a non 200 response; only RETRY_STATUSES give a TransientSpoonacularError"""
+    if status_code in RETRY_STATUSES:
+        return TransientSpoonacularError(f"{message} (status {status_code})")
+    return SpoonacularError(f"{message} (status {status_code})")
+
+
+# Errors left once the client has retried a request, which choosing another action will not fix
+TRANSIENT_ERRORS: Final = (
+    TransientSpoonacularError,
+    requests.ConnectionError,
+    requests.Timeout,
+    httpx.TransportError,
+)
+
+
+class SpoonacularClient:
+    """A pooled, keep-alive HTTP client for the Spoonacular API"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = SPOONACULAR_BASE_URL,
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        connect_timeout: float = 3.05,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+    ) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            api_key (str): Spoonacular API key, added to every API request.
+            base_url (str, optional): API base url. Defaults to SPOONACULAR_BASE_URL.
+            pool_connections (int, optional): Number of host pools to cache. Defaults to 4.
+            pool_maxsize (int, optional): Max connections kept alive per host. Defaults to 16.
+            connect_timeout (float, optional): Connect timeout in seconds. Defaults to 3.05.
+            timeouts (Dict[str, float], optional): Read timeout per endpoint name. Defaults to DEFAULT_TIMEOUTS.
+            default_timeout (float, optional): Read timeout for endpoints without one. Defaults to 10.0.
+            max_retries (int, optional): Retries on 429/5xx and connection errors. Defaults to 3.
+            backoff_factor (float, optional): Base of the exponential backoff in seconds. Defaults to 0.5.
+            max_backoff (float, optional): Upper bound of a single backoff in seconds. Defaults to 30.0.
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        # Retries are handled here so they can honour the quota headers
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Async clients are bound to an event loop, so keep one per loop
+        self.pool_maxsize = pool_maxsize
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        self._lock = threading.Lock()
+        self.quota_used: Optional[float] = None
+        self.quota_left: Optional[float] = None
+
+        # Push back seen from Spoonacular by every task; each task's own share goes to its Pushback
+        self.throttled = 0
+        self.upstream_errors = 0
+        self.retry_after: Optional[float] = None
+
+    def get(
+        self, endpoint: str, path: str, params: Optional[dict] = None, **kwargs
+    ) -> requests.Response:
+        """Call a Spoonacular API path, adding the API key.
+
+        Args:
+            endpoint (str): Endpoint name, used to pick the timeout.
+            path (str): Path relative to the base url, e.g. "/recipes/convert".
+            params (dict, optional): Query parameters. Defaults to None.
+
+        Returns:
+            requests.Response: The final response, after any retries.
+        """
+        params = dict(params or {})
+        params["apiKey"] = self.api_key
+        return self.fetch(f"{self.base_url}{path}", endpoint=endpoint, params=params, **kwargs)
+
+    def fetch(self, url: str, endpoint: str = "image", **kwargs) -> requests.Response:
+        """GET an arbitrary url through the shared pool with timeouts and retries.
+
+        Args:
+            url (str): Absolute url to fetch.
+            endpoint (str, optional): Endpoint name, used to pick the timeout. Defaults to "image".
+
+        Returns:
+            requests.Response: The final response, after any retries.
+        """
+        kwargs.setdefault("timeout", self.timeout(endpoint))
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                with self._lock:
+                    self.upstream_errors += 1
+                record_pushback()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.info(f"{endpoint}: {e} -- retrying in {delay:.2f}s")
+            else:
+                self._record_quota(response)
+                if response.status_code in RETRY_STATUSES:
+                    self._record_pushback(response)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.info(f"{endpoint}: status {response.status_code} -- retrying in {delay:.2f}s")
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    async def aget(self, endpoint: str, path: str, params: Optional[dict] = None) -> httpx.Response:
+        """Async variant of get().
+
+        Args:
+            endpoint (str): Endpoint name, used to pick the timeout.
+            path (str): Path relative to the base url, e.g. "/recipes/convert".
+            params (dict, optional): Query parameters. Defaults to None.
+
+        Returns:
+            httpx.Response: The final response, after any retries.
+        """
+        params = dict(params or {})
+        params["apiKey"] = self.api_key
+        return await self.afetch(f"{self.base_url}{path}", endpoint=endpoint, params=params)
+
+    async def afetch(
+        self,
+        url: str,
+        endpoint: str = "image",
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """Async variant of fetch(), sharing its timeouts, retries and quota tracking.
+
+        Args:
+            url (str): Absolute url to fetch.
+            endpoint (str, optional): Endpoint name, used to pick the timeout. Defaults to "image".
+            params (dict, optional): Query parameters. Defaults to None.
+            headers (dict, optional): Request headers. Defaults to None.
+            stream (bool, optional): Leave the body unread, to be iterated with aiter_bytes(). The caller
+                must close the response with aclose(). Defaults to False.
+
+        Returns:
+            httpx.Response: The final response, after any retries.
+        """
+        client = self._async_client()
+        connect, read = self.timeout(endpoint)
+        timeout = httpx.Timeout(read, connect=connect)
+
+        attempt = 0
+        while True:
+            try:
+                request = client.build_request("GET", url, params=params, headers=headers, timeout=timeout)
+                response = await client.send(request, stream=stream)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                with self._lock:
+                    self.upstream_errors += 1
+                record_pushback()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.info(f"{endpoint}: {e} -- retrying in {delay:.2f}s")
+            else:
+                self._record_quota(response)
+                if response.status_code in RETRY_STATUSES:
+                    self._record_pushback(response)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.info(f"{endpoint}: status {response.status_code} -- retrying in {delay:.2f}s")
+                await response.aclose()
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _async_client(self) -> httpx.AsyncClient:
+        """The pooled async client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                ),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def timeout(self, endpoint: str) -> tuple:
+        """Connect and read timeout for an endpoint"""
+        return (self.connect_timeout, self.timeouts.get(endpoint, self.default_timeout))
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before the next attempt.
+
+        A Retry-After header wins; otherwise exponential backoff with jitter.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        delay = self.backoff_factor * (2**attempt)
+        return min(delay + random.uniform(0, self.backoff_factor), self.max_backoff)
+
+    def _record_pushback(self, response: requests.Response) -> None:
+        """Count rate limits and server errors, for the client and for the task that made the call"""
+        try:
+            retry_after: Optional[float] = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None
+        with self._lock:
+            if response.status_code == 429:
+                self.throttled += 1
+            else:
+                self.upstream_errors += 1
+            self.retry_after = retry_after
+        record_pushback(retry_after)
+
+    def pushback(self) -> int:
+        """Number of rate limits and upstream errors seen so far, across all tasks"""
+        with self._lock:
+            return self.throttled + self.upstream_errors
+
+    def _record_quota(self, response: requests.Response) -> None:
+        """Track the points quota Spoonacular reports on every response"""
+        used = response.headers.get("X-API-Quota-Used")
+        left = response.headers.get("X-API-Quota-Left")
+        with self._lock:
+            if used is not None:
+                self.quota_used = float(used)
+            if left is not None:
+                self.quota_left = float(left)
+                if self.quota_left <= 0:
+                    logger.warning("Spoonacular quota exhausted")
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
+
+    async def aclose(self) -> None:
+        """Close the pooled connections of the running event loop"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @classmethod
+    def from_env(cls, api_key: str) -> "SpoonacularClient":
+        """Create a client configured from environment variables.
+
+        SPOONACULAR_POOL_CONNECTIONS, SPOONACULAR_POOL_MAXSIZE, SPOONACULAR_CONNECT_TIMEOUT,
+        SPOONACULAR_TIMEOUT (default read timeout), SPOONACULAR_TIMEOUT_<ENDPOINT> (e.g.
+        SPOONACULAR_TIMEOUT_SEARCH), SPOONACULAR_MAX_RETRIES and SPOONACULAR_BACKOFF_FACTOR.
+
+        Args:
+            api_key (str): Spoonacular API key.
+
+        Returns:
+            SpoonacularClient: The client
+        """
+        timeouts = {
+            name: float(os.getenv(f"SPOONACULAR_TIMEOUT_{name.upper()}", str(default)))
+            for name, default in DEFAULT_TIMEOUTS.items()
+        }
+        return cls(
+            api_key=api_key,
+            base_url=os.getenv("SPOONACULAR_BASE_URL", SPOONACULAR_BASE_URL),
+            pool_connections=int(os.getenv("SPOONACULAR_POOL_CONNECTIONS", "4")),
+            pool_maxsize=int(os.getenv("SPOONACULAR_POOL_MAXSIZE", "16")),
+            connect_timeout=float(os.getenv("SPOONACULAR_CONNECT_TIMEOUT", "3.05")),
+            timeouts=timeouts,
+            default_timeout=float(os.getenv("SPOONACULAR_TIMEOUT", "10")),
+            max_retries=int(os.getenv("SPOONACULAR_MAX_RETRIES", "3")),
+            backoff_factor=float(os.getenv("SPOONACULAR_BACKOFF_FACTOR", "0.5")),
+        )
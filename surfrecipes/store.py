@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Final, Optional
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+HASH_CHUNK_SIZE: Final = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """A content addressed, size bounded image store shared across tasks.
+
+    Images are stored once under the store root, named by the hash of their bytes.
+    Task directories hold hard links into the store, so identical images take the
+    disk space once, and removing a task directory only drops its links.
+
+    The store keeps a running total and an LRU index of its images, so adding,
+    linking and releasing only touch the disk to evict when the total is over budget.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024) -> None:
+        """
+        Initialize the store, indexing the images already under its root.
+
+        Args:
+            root (str): Directory holding the stored images.
+            max_bytes (int, optional): Total size of stored images before the least
+                recently used ones are evicted. Defaults to 512MiB.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+        entries = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                st = os.stat(path)
+                entries.append((st.st_mtime, path, st.st_size))
+        self._index: OrderedDict = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self._total = sum(self._index.values())
+
+    def path(self, digest: str, ext: str) -> str:
+        """Path of the stored image with a digest"""
+        return os.path.join(self.root, digest[:2], f"{digest}{ext}")
+
+    def add(self, src_path: str, directory: str, name: Optional[str] = None) -> str:
+        """Move a file into the store and link it into a task directory.
+
+        Args:
+            src_path (str): File to store. It is moved, or removed when its bytes are already stored.
+            directory (str): Task directory to link the image into.
+            name (str, optional): Name of the link. Defaults to the name of src_path.
+
+        Returns:
+            str: Path to the stored image
+        """
+        name = name or os.path.basename(src_path)
+        digest = file_digest(src_path)
+        stored = self.path(digest, os.path.splitext(name)[1].lower())
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            if stored in self._index and os.path.exists(stored):
+                os.remove(src_path)
+            else:
+                os.makedirs(os.path.dirname(stored), exist_ok=True)
+                size = os.path.getsize(src_path)
+                shutil.move(src_path, stored)
+                self._total += size - self._index.get(stored, 0)
+                self._index[stored] = size
+            # Linked under the same lock, so the image cannot be evicted in between
+            self._link(stored, os.path.join(directory, name))
+            self._evict()
+        return stored
+
+    def link(self, stored: str, directory: str, name: Optional[str] = None) -> str:
+        """Link a stored image into a task directory, copying it when links are not possible.
+
+        Args:
+            stored (str): Path to the stored image.
+            directory (str): Task directory.
+            name (str, optional): Name of the link. Defaults to the stored name.
+
+        Raises:
+            FileNotFoundError: If the image was evicted since it was looked up, in which
+                case the caller adds it again.
+
+        Returns:
+            str: Path to the link
+        """
+        path = os.path.join(directory, name or os.path.basename(stored))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._link(stored, path)
+        return path
+
+    def _link(self, stored: str, path: str) -> None:
+        """Link a stored image to a path and mark it recently used. Callers hold the lock."""
+        if not os.path.exists(stored):
+            self._forget(stored)
+            raise FileNotFoundError(f"{stored} is no longer in the image store")
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            os.link(stored, path)
+        except OSError:
+            shutil.copyfile(stored, path)
+        os.utime(stored)
+        if stored in self._index:
+            self._index.move_to_end(stored)
+
+    def _forget(self, stored: str) -> None:
+        """Drop an image from the index. Callers hold the lock."""
+        self._total -= self._index.pop(stored, 0)
+
+    def contains(self, stored: Optional[str]) -> bool:
+        """Whether a stored image is still in the store"""
+        return bool(stored) and os.path.exists(stored)  # type: ignore
+
+    def evict(self) -> None:
+        """Remove the least recently used images while the store is over budget.
+
+        Images still linked from a task directory are kept, since removing them frees
+        no space until the task is released.
+        """
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """evict() for callers holding the lock"""
+        if self._total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for path in list(self._index):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                if os.stat(path).st_nlink > 1:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._forget(path)
+            evicted += 1
+        logger.debug(f"evicted {evicted} stored images")
+        if self._total > self.max_bytes:
+            logger.warning(f"image store over budget by {self._total - self.max_bytes} bytes held by running tasks")
+
+    def release(self, directory: str) -> None:
+        """Remove a task directory and its links, then enforce the budget.
+
+        Args:
+            directory (str): Task directory.
+        """
+        shutil.rmtree(directory, ignore_errors=True)
+        self.evict()
+
+    def stats(self) -> Dict[str, int]:
+        """Number and total size of stored images"""
+        with self._lock:
+            return {"entries": len(self._index), "bytes": self._total}
+
+
+@lru_cache(maxsize=None)
+def image_store(data_path: str) -> ImageStore:
+    """The process wide image store living under a data path, bounded by
+    SURFRECIPES_IMAGE_STORE_MAX_BYTES"""
+    return ImageStore(
+        os.path.join(data_path, "images", "store"),
+        max_bytes=int(os.getenv("SURFRECIPES_IMAGE_STORE_MAX_BYTES", str(512 * 1024 * 1024))),
+    )
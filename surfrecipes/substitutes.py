@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Final, Iterable, List, Optional
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+SUBSTITUTES_PATH: Final = os.path.join(os.path.dirname(__file__), "data", "substitutes.json")
+
+
+def singular_forms(name: str) -> List[str]:
+    """Candidate singular forms of an ingredient name, most likely first"""
+    forms = [name]
+    if name.endswith("ies"):
+        forms.append(name[:-3] + "y")
+    if name.endswith("oes") or name.endswith("ches") or name.endswith("shes"):
+        forms.append(name[:-2])
+    if name.endswith("s") and not name.endswith("ss"):
+        forms.append(name[:-1])
+    return forms
+
+
+class SubstitutesIndex:
+    """A lazily loaded index of ingredient substitutes"""
+
+    def __init__(self, path: str = SUBSTITUTES_PATH, learned_path: Optional[str] = None) -> None:
+        """
+        Initialize the index. Nothing is read until the first lookup.
+
+        Args:
+            path (str, optional): The packaged substitutes file. Defaults to SUBSTITUTES_PATH.
+            learned_path (str, optional): JSON file holding substitutes learned from the API.
+                Defaults to None, which keeps them in memory only.
+        """
+        self.path = path
+        self.learned_path = learned_path
+        self._ingredients: Optional[Dict[str, List[str]]] = None
+        self._synonyms: Dict[str, str] = {}
+        self._learned: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, List[str]]:
+        """Load the packaged index and any learned entries on first use"""
+        if self._ingredients is not None:
+            return self._ingredients
+        with self._lock:
+            if self._ingredients is None:
+                with open(self.path) as f:
+                    data = json.load(f)
+                self._synonyms = data.get("synonyms", {})
+                ingredients = data.get("ingredients", {})
+                if self.learned_path and os.path.exists(self.learned_path):
+                    with open(self.learned_path) as f:
+                        self._learned = json.load(f)
+                    ingredients.update(self._learned)
+                self._ingredients = ingredients
+                logger.debug(f"loaded substitutes for {len(ingredients)} ingredients")
+        return self._ingredients
+
+    def normalize(self, name: str) -> str:
+        """Canonical index key of an ingredient name, resolving plurals and synonyms"""
+        ingredients = self._load()
+        name = re.sub(r"[^a-z\- ]", " ", name.lower())
+        name = " ".join(name.split())
+        for form in singular_forms(name):
+            form = self._synonyms.get(form, form)
+            if form in ingredients:
+                return form
+        return self._synonyms.get(name, name)
+
+    def lookup(self, name: str) -> Optional[List[str]]:
+        """Substitutes of an ingredient.
+
+        Args:
+            name (str): Ingredient name.
+
+        Returns:
+            Optional[List[str]]: The substitutes, or None if the ingredient is not indexed.
+        """
+        return self._load().get(self.normalize(name))
+
+    def lookup_many(self, names: Iterable[str]) -> Dict[str, Optional[List[str]]]:
+        """Substitutes of several ingredients in one call.
+
+        Args:
+            names (Iterable[str]): Ingredient names.
+
+        Returns:
+            Dict[str, Optional[List[str]]]: Substitutes keyed by the given names, None where not indexed.
+        """
+        return {name: self.lookup(name) for name in names}
+
+    def add(self, name: str, substitutes: List[str]) -> None:
+        """Add or refresh the substitutes of an ingredient, e.g. from an API answer.
+
+        Args:
+            name (str): Ingredient name.
+            substitutes (List[str]): Its substitutes.
+        """
+        ingredients = self._load()
+        key = self.normalize(name)
+        with self._lock:
+            ingredients[key] = list(substitutes)
+            self._learned[key] = list(substitutes)
+            self._save()
+
+    def _save(self) -> None:
+        """Persist the learned entries"""
+        if not self.learned_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.learned_path)), exist_ok=True)
+        tmp_path = f"{self.learned_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._learned, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.learned_path)
+
+
+@lru_cache(maxsize=None)
+def substitutes_index(data_path: str) -> SubstitutesIndex:
+    """The process wide substitutes index learning into a data path"""
+    return SubstitutesIndex(learned_path=os.path.join(data_path, "substitutes.json"))
@@ -0,0 +1,98 @@
+import logging
+import os
+from typing import Dict, Final, List
+
+from threadmem import RoleMessage, RoleThread
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+# Rough characters per token of English text and JSON
+CHARS_PER_TOKEN: Final = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate of a text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ThreadCompactor:
+    """Windows a role thread to a token budget before it is sent to the model"""
+
+    def __init__(
+        self,
+        budget: int = 6000,
+        keep_head: int = 2,
+        keep_exchanges: int = 3,
+        summary_chars: int = 240,
+    ) -> None:
+        """
+        Initialize the compactor.
+
+        Args:
+            budget (int, optional): Estimated tokens the window may take. Defaults to 6000.
+            keep_head (int, optional): Leading messages always kept verbatim, i.e. the system
+                prompt and its answer. Defaults to 2.
+            keep_exchanges (int, optional): Latest request/response exchanges kept verbatim. Defaults to 3.
+            summary_chars (int, optional): Characters kept of older messages. Defaults to 240.
+        """
+        self.budget = budget
+        self.keep_head = keep_head
+        self.keep_exchanges = keep_exchanges
+        self.summary_chars = summary_chars
+        self._summaries: Dict[str, RoleMessage] = {}
+
+    def compact(self, thread: RoleThread) -> RoleThread:
+        """Window a thread: the head and the latest exchanges verbatim, older messages
+        truncated, and the oldest of those dropped while the window is over budget.
+
+        Args:
+            thread (RoleThread): The full thread; it is not modified.
+
+        Returns:
+            RoleThread: The thread itself when nothing needs compacting, otherwise a copy.
+        """
+        messages = thread.messages()
+        # The last message is the pending request, the exchanges come before it
+        keep_last = 2 * self.keep_exchanges + 1
+        if len(messages) <= self.keep_head + keep_last:
+            return thread
+
+        head = messages[: self.keep_head]
+        older = [self._summary(msg) for msg in messages[self.keep_head : -keep_last]]
+        recent = messages[-keep_last:]
+
+        tokens = self.tokens(head + older + recent)
+        dropped = 0
+        # Drop whole exchanges so roles keep alternating
+        while tokens > self.budget and older:
+            tokens -= self.tokens(older[:2])
+            older = older[2:]
+            dropped += 1
+        if dropped:
+            logger.debug(f"dropped {dropped} old exchanges to fit {self.budget} tokens")
+
+        window = thread.copy()
+        window_messages = window.messages()
+        window_messages[:] = head + older + recent
+        return window
+
+    def _summary(self, msg: RoleMessage) -> RoleMessage:
+        """A truncated copy of an older message, made once per message"""
+        if len(msg.text) <= self.summary_chars:
+            return msg
+        summary = self._summaries.get(msg.id)
+        if summary is None:
+            elided = len(msg.text) - self.summary_chars
+            summary = RoleMessage(
+                role=msg.role,
+                text=f"{msg.text[: self.summary_chars]}... [{elided} characters elided]",
+                thread_id=msg.thread_id,
+            )
+            self._summaries[msg.id] = summary
+        return summary
+
+    @staticmethod
+    def tokens(messages: List[RoleMessage]) -> int:
+        """Estimated tokens of a list of messages"""
+        return sum(estimate_tokens(msg.text) for msg in messages)
@@ -1,18 +1,31 @@
+import asyncio
+import contextvars
 import logging
 import os
 import json
-from typing import List, Dict, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Union
 
-import requests
 from mllm import RoleThread, Router
 from PIL import Image
 from rich.console import Console
 from taskara import Task
-from toolfuse import Tool, action, observation
+from toolfuse import Action, Tool, action, observation
 
 from .prompts import recipe_req_analyzer_prompt, \
                         conversion_analyzer_prompt, \
                         substitution_analyzer_prompt
+from .cache import analyzer_cache, response_cache
+from .cards import CardDownloader, thumbnail_path
+from .parsers import parse_conversion_requirements, \
+                        parse_recipe_requirements, \
+                        parse_substitute_requirements
+from .prefetch import Prefetcher
+from .spoonacular import SpoonacularClient, status_error
+from .store import image_store
+from .substitutes import substitutes_index
+from .units import unit_converter
 
 router = Router.from_env()
 console = Console()
@@ -25,6 +38,63 @@ if not SPOONACULAR_API_KEY:
     print ("Please set your SPOONACULAR_API_KEY first.")
     raise
 
+spoonacular = SpoonacularClient.from_env(SPOONACULAR_API_KEY)
+
+# Recipe cards fetched at once by the bulk search, and its largest number of results
+CARD_CONCURRENCY = int(os.getenv("SURFRECIPES_CARD_CONCURRENCY", "4"))
+MAX_RECIPES = 10
+
+
+@lru_cache(maxsize=None)
+def analyzer_router() -> Router:
+    """The router shared by the requirement analyzers"""
+    return Router(preference=["gpt-4-turbo"])
+
+
+# Requirement analyzers: rule based parser, LLM prompt, how the prompt introduces
+# the requirement, and the keys of the breakdown
+ANALYZERS = {
+    "recipe": (
+        parse_recipe_requirements,
+        recipe_req_analyzer_prompt,
+        "user requirement",
+        ("food", "diet", "intolerances", "include_ingredients", "exclude_ingredients"),
+    ),
+    "conversion": (
+        parse_conversion_requirements,
+        conversion_analyzer_prompt,
+        "conversion requirement",
+        ("ingredient_name", "source_amount", "source_unit", "target_unit"),
+    ),
+    "substitute": (
+        parse_substitute_requirements,
+        substitution_analyzer_prompt,
+        "substitution requirement",
+        ("ingredient_name",),
+    ),
+}
+
+
+def _breakdown(analyzer: str, keys: tuple, reply: Any) -> Dict[str, Union[str, List[str]]]:
+    """The required keys of an analyzer's output, raising ValueError if any is missing"""
+    if not isinstance(reply, dict) or not all(key in reply for key in keys):
+        raise ValueError(f"The {analyzer} analyzer returned an incomplete breakdown: {reply}")
+    return {key: reply[key] for key in keys}
+
+
+def _analyzer_thread(msg: str) -> RoleThread:
+    """A role thread holding an analyzer prompt; creating and posting both save the thread"""
+    thread = RoleThread()
+    thread.post(role="user", msg=msg)
+    return thread
+
+
+def show_image(path: str) -> None:
+    """Open an image in the default viewer"""
+    with Image.open(path) as img:
+        img.show()
+
+
 class SurfRecipesTool(Tool):
     """A recipe surfer tool that finds recipes and does other tasks related to recipes."""
 
@@ -45,35 +115,169 @@ class SurfRecipesTool(Tool):
         os.makedirs(self.img_path, exist_ok=True)
 
         self.task = task
+        self.cache = response_cache(self.data_path)
+        self.analyzer_cache = analyzer_cache(self.data_path)
+        self.units = unit_converter(self.data_path)
+        self.substitutes = substitutes_index(self.data_path)
+        self.images = image_store(self.data_path)
+        self.cards = CardDownloader(spoonacular, self.cache, self.images)
+        self.prefetcher = Prefetcher.from_env()
+
+    def close(self) -> None:
+        """Stop prefetching and release the task's images; stored copies stay for other tasks until evicted"""
+        self.prefetcher.close()
+        self.images.release(self.img_path)
+
+    def _get_json(self, endpoint: str, path: str, params: dict, error: str) -> dict:
+        """Get a Spoonacular response, serving it from the response cache when possible.
+
+        Args:
+            endpoint (str): Endpoint name.
+            path (str): API path.
+            params (dict): Query parameters, without the API key.
+            error (str): Error message raised on a non 200 response.
+
+        Returns:
+            dict: The decoded JSON response.
+        """
+        cached = self.cache.get(endpoint, path, params)
+        if cached is not None:
+            logger.debug(f"{endpoint} served from cache")
+            return cached
+
+        response = spoonacular.get(endpoint, path, params=params)
+        if response.status_code != 200:
+            raise status_error(response.status_code, error)
+        data = json.loads(response.text)
+        self.cache.set(endpoint, path, params, data)
+        return data
+
+    async def _aget_json(self, endpoint: str, path: str, params: dict, error: str) -> dict:
+        """Async variant of _get_json(). The response cache is SQLite, so it is read and
+        written from a worker thread."""
+        cached = await asyncio.to_thread(self.cache.get, endpoint, path, params)
+        if cached is not None:
+            logger.debug(f"{endpoint} served from cache")
+            return cached
+
+        response = await spoonacular.aget(endpoint, path, params=params)
+        if response.status_code != 200:
+            raise status_error(response.status_code, error)
+        data = json.loads(response.text)
+        await asyncio.to_thread(self.cache.set, endpoint, path, params, data)
+        return data
+
+    def _requirements(self, analyzer: str, requirements: str) -> Dict[str, Union[str, List[str]]]:
+        """Break down a requirement with the rule based parser, falling back to the LLM.
+
+        Args:
+            analyzer (str): Analyzer name, a key of ANALYZERS.
+            requirements (str): The user requirement in plain English.
+
+        Returns:
+            Dict[str, Union[str, List[str]]]: The structured breakdown.
+        """
+        parser, prompt, intro, keys = ANALYZERS[analyzer]
+        requirements_breakdown = parser(requirements)
+        if requirements_breakdown is not None:
+            logger.debug(f"{analyzer} requirements parsed without the LLM")
+            return requirements_breakdown
+
+        requirements_breakdown = self.analyzer_cache.get(analyzer, requirements)
+        if requirements_breakdown is not None:
+            return _breakdown(analyzer, keys, requirements_breakdown)
+
+        thread = _analyzer_thread(f"{prompt} Here is the {intro} in plain English: {requirements}")
+
+        response = analyzer_router().chat(thread)
+        # Only complete breakdowns are cached, so a malformed reply is asked for again next time
+        requirements_breakdown = _breakdown(analyzer, keys, json.loads(response.msg.text))
+        self.analyzer_cache.set(analyzer, requirements, requirements_breakdown)
+        return requirements_breakdown
+
+    async def _arequirements(self, analyzer: str, requirements: str) -> Dict[str, Union[str, List[str]]]:
+        """Async variant of _requirements(). The analyzer cache may persist to SQLite and
+        role threads are saved as they are written, so both run in a worker thread."""
+        parser, prompt, intro, keys = ANALYZERS[analyzer]
+        requirements_breakdown = parser(requirements)
+        if requirements_breakdown is not None:
+            logger.debug(f"{analyzer} requirements parsed without the LLM")
+            return requirements_breakdown
+
+        requirements_breakdown = await asyncio.to_thread(self.analyzer_cache.get, analyzer, requirements)
+        if requirements_breakdown is not None:
+            return _breakdown(analyzer, keys, requirements_breakdown)
+
+        thread = await asyncio.to_thread(
+            _analyzer_thread, f"{prompt} Here is the {intro} in plain English: {requirements}"
+        )
+
+        response = await analyzer_router().chat_async(thread)
+        # Only complete breakdowns are cached, so a malformed reply is asked for again next time
+        requirements_breakdown = _breakdown(analyzer, keys, json.loads(response.msg.text))
+        await asyncio.to_thread(self.analyzer_cache.set, analyzer, requirements, requirements_breakdown)
+        return requirements_breakdown
+
+    async def ause(self, action: Action, **kwargs) -> Any:
+        """Async variant of use(). Runs the action's async implementation when it has one,
+        otherwise runs the action in a worker thread.
+
+        Args:
+            action (Action): The action to take.
+
+        Returns:
+            Any: The result of the action.
+        """
+        self._validate_parameters(action.schema, kwargs)
+        method = getattr(self, f"a{action.name}", None)
+        if method is not None and asyncio.iscoroutinefunction(method):
+            return await method(**kwargs)
+        return await asyncio.to_thread(action, **kwargs)
 
     @observation
     def get_recipe_requirements(self, requirements: str) -> Dict[str, Union[str, List[str]]]:
         """
         This is the first step in finding a recipe. It takes a text describing what type of recipe the user wants and returns a structured breakdown of user requirements. The structured breakdown clarifies the food, diet, intolerances, include_ingredients and exclude_ingredients that the user wants in the recipe. This breakdown can then be used to search for suitable recipes.
         """
-        thread = RoleThread()
-        router = Router(preference=["gpt-4-turbo"])
-
-        analyzer_msg = f"{recipe_req_analyzer_prompt} Here is the user requirement in plain English: {requirements}"
-        thread.post(role="user", msg=analyzer_msg)
-
-        response = router.chat(thread)
-        requirements_breakdown = json.loads(response.msg.text)
+        return self._requirements("recipe", requirements)
 
-        return {
-            "food": requirements_breakdown["food"],
-            "diet": requirements_breakdown["diet"],
-            "intolerances": requirements_breakdown["intolerances"],
-            "include_ingredients": requirements_breakdown["include_ingredients"],
-            "exclude_ingredients": requirements_breakdown["exclude_ingredients"],
-        }
+    async def aget_recipe_requirements(self, requirements: str) -> Dict[str, Union[str, List[str]]]:
+        return await self._arequirements("recipe", requirements)
 
     @action
     def search_recipe(self, requirements_breakdown: Dict[str, str]) -> str:
         """
         Searches for a recipe that meet the user's requirements. The user's requirements are provided as a structured dictionary with the following keys: food, diet, intolerances, include_ingredients, exclude_ingredients. Using this dictionary, this method queries the spoonacular recipe search api and returns the ID of a recipe that meets the requirements.
         """
-        params = {'apiKey': SPOONACULAR_API_KEY, 'number': 1}
+        recipe_id = self._search_recipe_id(requirements_breakdown)
+        # The card is almost always asked for next
+        self.prefetcher.prefetch(("card", str(recipe_id)), self._recipe_card_url, recipe_id)
+        return recipe_id
+
+    async def asearch_recipe(self, requirements_breakdown: Dict[str, str]) -> str:
+        recipe_id = await self._asearch_recipe_id(requirements_breakdown)
+        self.prefetcher.prefetch(("card", str(recipe_id)), self._recipe_card_url, recipe_id)
+        return recipe_id
+
+    def _search_recipe_id(self, requirements_breakdown: Dict[str, str]) -> str:
+        """Id of the best recipe for a requirements breakdown"""
+        recipe = self._get_json(
+            "search", "/recipes/complexSearch", self._search_params(requirements_breakdown), "Error searching recipes on Spoonacular"
+        )
+        recipe_id = recipe['results'][0]['id']
+        return recipe_id
+
+    async def _asearch_recipe_id(self, requirements_breakdown: Dict[str, str]) -> str:
+        recipe = await self._aget_json(
+            "search", "/recipes/complexSearch", self._search_params(requirements_breakdown), "Error searching recipes on Spoonacular"
+        )
+        recipe_id = recipe['results'][0]['id']
+        return recipe_id
+
+    def _search_params(self, requirements_breakdown: Dict[str, str], number: int = 1) -> dict:
+        """Query parameters of a recipe search for a requirements breakdown"""
+        params = {'number': number}
+        if number > 1: params['addRecipeInformation'] = 'true'
         if requirements_breakdown['food']: params['query'] = requirements_breakdown['food']
         if requirements_breakdown['diet']: params['diet'] = requirements_breakdown['diet']
         if requirements_breakdown['intolerances']:
@@ -91,37 +295,147 @@ class SurfRecipesTool(Tool):
                 params['excludeIngredients'] = ','.join(requirements_breakdown['exclude_ingredients'])
             else:
                 params['excludeIngredients'] =requirements_breakdown['exclude_ingredients']
-
-        search_recipe_api_url = "https://api.spoonacular.com/recipes/complexSearch"
-        response = requests.get(search_recipe_api_url, params=params)
-        if response.status_code != 200:
-            raise Exception("Error searching recipes on Spoonacular")
-        recipe = json.loads(response.text)
-        recipe_id = recipe['results'][0]['id']
-        return recipe_id
+        return params
 
     @action
     def get_recipe_details(self, recipe_id: str) -> str:
         """
         Fetches the details of a recipe identified by the given recipe ID. The fetched details are contained in an image hosted in a recipe_card_url. Later, the recipe_card_url can be shown to the user.
         """
-        params = {'apiKey': SPOONACULAR_API_KEY}
-        get_recipe_card_api_url = f"https://api.spoonacular.com/recipes/{recipe_id}/card"
-        recipe_card_response = requests.get(get_recipe_card_api_url, params=params)
-        if recipe_card_response.status_code != 200:
-            raise Exception("Error getting recipe card from Spoonacular")
-        recipe_card = json.loads(recipe_card_response.text)
+        recipe_card_url = self.prefetcher.run(("card", str(recipe_id)), self._recipe_card_url, recipe_id)
+        # The card image is almost always displayed next
+        self.prefetcher.prefetch(("image", recipe_card_url), self.cards.download, recipe_card_url, self.img_path)
+        return recipe_card_url
+
+    async def aget_recipe_details(self, recipe_id: str) -> str:
+        recipe_card_url = await self.prefetcher.arun(("card", str(recipe_id)), self._arecipe_card_url, recipe_id)
+        self.prefetcher.prefetch(("image", recipe_card_url), self.cards.download, recipe_card_url, self.img_path)
+        return recipe_card_url
+
+    def _recipe_card_url(self, recipe_id: str) -> str:
+        """Url of the recipe card of a recipe"""
+        recipe_card = self._get_json(
+            "card", f"/recipes/{recipe_id}/card", {}, "Error getting recipe card from Spoonacular"
+        )
         recipe_card_url = recipe_card['url']
         return recipe_card_url
 
+    async def _arecipe_card_url(self, recipe_id: str) -> str:
+        recipe_card = await self._aget_json(
+            "card", f"/recipes/{recipe_id}/card", {}, "Error getting recipe card from Spoonacular"
+        )
+        recipe_card_url = recipe_card['url']
+        return recipe_card_url
+
+    @action
+    def find_recipe(self, requirements: str) -> str:
+        """
+        Finds a recipe in a single step and is the preferred way to find one. It takes a text describing what type of recipe the user wants, breaks it down into requirements, searches for a recipe that meets them and returns the URL of its recipe card. The recipe card can then be displayed with display_recipe_details.
+        """
+        requirements_breakdown = self.get_recipe_requirements(requirements)
+        recipe_id = self._search_recipe_id(requirements_breakdown)
+        recipe_card_url = self._recipe_card_url(recipe_id)
+        self.prefetcher.prefetch(("image", recipe_card_url), self.cards.download, recipe_card_url, self.img_path)
+        return recipe_card_url
+
+    async def afind_recipe(self, requirements: str) -> str:
+        requirements_breakdown = await self.aget_recipe_requirements(requirements)
+        recipe_id = await self._asearch_recipe_id(requirements_breakdown)
+        recipe_card_url = await self._arecipe_card_url(recipe_id)
+        self.prefetcher.prefetch(("image", recipe_card_url), self.cards.download, recipe_card_url, self.img_path)
+        return recipe_card_url
+
+    @action
+    def find_recipes(self, requirements: str, number: int = 5) -> List[Dict[str, Union[str, int]]]:
+        """
+        Finds several recipe options in a single step. It takes a text describing what type of recipe the user wants and the number of options wanted (at most 10), searches for the best matching recipes and returns a list with the id, title, ready_in_minutes, servings, source_url and recipe_card_url of each. The recipe_card_url is null when that card could not be fetched.
+        """
+        requirements_breakdown = self.get_recipe_requirements(requirements)
+        results = self._search_results(
+            self._get_json(
+                "search",
+                "/recipes/complexSearch",
+                self._search_params(requirements_breakdown, self._recipes_number(number)),
+                "Error searching recipes on Spoonacular",
+            )
+        )
+        if results:
+            with ThreadPoolExecutor(max_workers=min(CARD_CONCURRENCY, len(results))) as executor:
+                # Each download runs in a copy of this context, so its push back counts for this task
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._recipe_card_url, r['id'])
+                    for r in results
+                ]
+                card_urls = [future.exception() or future.result() for future in futures]
+            self._add_card_urls(results, card_urls)
+        return results
+
+    async def afind_recipes(self, requirements: str, number: int = 5) -> List[Dict[str, Union[str, int]]]:
+        requirements_breakdown = await self.aget_recipe_requirements(requirements)
+        results = self._search_results(
+            await self._aget_json(
+                "search",
+                "/recipes/complexSearch",
+                self._search_params(requirements_breakdown, self._recipes_number(number)),
+                "Error searching recipes on Spoonacular",
+            )
+        )
+        semaphore = asyncio.Semaphore(CARD_CONCURRENCY)
+
+        async def card_url(recipe_id: int) -> str:
+            async with semaphore:
+                return await self._arecipe_card_url(recipe_id)
+
+        card_urls = await asyncio.gather(*(card_url(r['id']) for r in results), return_exceptions=True)
+        self._add_card_urls(results, card_urls)
+        return results
+
+    def _add_card_urls(self, results: List[Dict[str, Union[str, int]]], card_urls: List[Any]) -> None:
+        """Add the card url, or the error fetching it, to each search result.
+
+        A card that failed leaves its recipe without a url rather than failing the search,
+        unless every card failed, in which case the first error is raised.
+        """
+        errors = [url for url in card_urls if isinstance(url, BaseException)]
+        if errors and len(errors) == len(card_urls):
+            raise errors[0]
+        for result, url in zip(results, card_urls):
+            if isinstance(url, BaseException):
+                logger.warning(f"recipe card of {result['id']} failed: {url}")
+                url = None
+            result['recipe_card_url'] = url
+
+    def _recipes_number(self, number: int) -> int:
+        """Clamp the number of recipes asked for"""
+        return max(1, min(int(number), MAX_RECIPES))
+
+    def _search_results(self, recipes: dict) -> List[Dict[str, Union[str, int]]]:
+        """Compact list of the recipes of a search with recipe information"""
+        return [
+            {
+                'id': recipe['id'],
+                'title': recipe.get('title', ''),
+                'ready_in_minutes': recipe.get('readyInMinutes', ''),
+                'servings': recipe.get('servings', ''),
+                'source_url': recipe.get('sourceUrl', ''),
+            }
+            for recipe in recipes.get('results', [])
+        ]
+
     @observation
     def display_recipe_details(self, recipe_card_url: str) -> None:
         """Displays the details of a recipe using a recipe card available in the specified recipe_card_url."""
-        img_content = requests.get(recipe_card_url, stream=True)
-        if img_content.status_code != 200:
-            raise Exception("Error loading recipe card image")
-        img = Image.open(img_content.raw)
-        img.show()
+        card_path = self.prefetcher.run(
+            ("image", recipe_card_url), self.cards.download, recipe_card_url, self.img_path
+        )
+        show_image(thumbnail_path(card_path))
+        return "Task Complete"
+
+    async def adisplay_recipe_details(self, recipe_card_url: str) -> None:
+        card_path = await self.prefetcher.arun(
+            ("image", recipe_card_url), self.cards.adownload, recipe_card_url, self.img_path
+        )
+        await asyncio.to_thread(show_image, thumbnail_path(card_path))
         return "Task Complete"
 
     @observation
@@ -129,36 +443,63 @@ class SurfRecipesTool(Tool):
         """
         Transforms the user request to covert ingredients from one unit to another from a plain English format to a structured format. It takes a text describing what the uer is trying to convert and returns a structured breakdown that clarifies the ingredient name, source amount, source unit and target unit for conversion. These details can then be used to perform the conversion.
         """
-        thread = RoleThread()
-        router = Router(preference=["gpt-4-turbo"])
+        return self._requirements("conversion", requirements)
 
-        analyzer_msg = f"{conversion_analyzer_prompt} Here is the conversion requirement in plain English: {requirements}"
-        thread.post(role="user", msg=analyzer_msg)
-
-        response = router.chat(thread)
-        requirements_breakdown = json.loads(response.msg.text)
-
-        return {
-            "ingredient_name": requirements_breakdown["ingredient_name"],
-            "source_amount": requirements_breakdown["source_amount"],
-            "source_unit": requirements_breakdown["source_unit"],
-            "target_unit": requirements_breakdown["target_unit"],
-        }
+    async def aget_conversion_requirements(self, requirements: str) -> Dict[str, Union[str, List[str]]]:
+        return await self._arequirements("conversion", requirements)
 
     @action
     def convert_ingredient_amounts(self, requirements_breakdown: Dict[str, str]) -> None:
         """Converts ingredient amount from one unit to another. It needs the conversion request to be in a structured format. Then, it can perform the conversion."""
-        params = {'apiKey': SPOONACULAR_API_KEY}
+        params = self._conversion_params(requirements_breakdown)
+        local_answer = self._local_conversion(params)
+        if local_answer:
+            return local_answer
+
+        conversion = self._get_json(
+            "convert", "/recipes/convert", params, "Error converting amounts on Spoonacular"
+        )
+        return self._learn_conversion(params, conversion)
+
+    async def aconvert_ingredient_amounts(self, requirements_breakdown: Dict[str, str]) -> str:
+        # The unit tables live on disk, so they are read and written off the event loop
+        params = self._conversion_params(requirements_breakdown)
+        local_answer = await asyncio.to_thread(self._local_conversion, params)
+        if local_answer:
+            return local_answer
+
+        conversion = await self._aget_json(
+            "convert", "/recipes/convert", params, "Error converting amounts on Spoonacular"
+        )
+        return await asyncio.to_thread(self._learn_conversion, params, conversion)
+
+    def _conversion_params(self, requirements_breakdown: Dict[str, str]) -> dict:
+        """Query parameters of a conversion for a requirements breakdown"""
+        params = {}
         params['ingredientName'] = requirements_breakdown['ingredient_name']
         params['sourceAmount'] = requirements_breakdown['source_amount']
         params['sourceUnit'] = requirements_breakdown['source_unit']
         params['targetUnit'] = requirements_breakdown['target_unit']
+        return params
 
-        convert_amount_api_url = "https://api.spoonacular.com/recipes/convert"
-        response = requests.get(convert_amount_api_url, params=params)
-        if response.status_code != 200:
-            raise Exception("Error converting amounts on Spoonacular")
-        conversion = json.loads(response.text)
+    def _local_conversion(self, params: dict) -> Optional[str]:
+        """Answer a conversion locally when the ingredient and both units are known"""
+        local_answer = self.units.answer(
+            params['ingredientName'], params['sourceAmount'], params['sourceUnit'], params['targetUnit']
+        )
+        if local_answer:
+            logger.debug("conversion answered locally")
+        return local_answer
+
+    def _learn_conversion(self, params: dict, conversion: dict) -> str:
+        """Feed a Spoonacular conversion to the local tables and return its answer"""
+        self.units.learn(
+            params['ingredientName'],
+            conversion.get('sourceAmount', params['sourceAmount']),
+            conversion.get('sourceUnit', params['sourceUnit']),
+            conversion.get('targetAmount', ""),
+            conversion.get('targetUnit', params['targetUnit']),
+        )
         conversion_answer = conversion['answer']
         return conversion_answer
 
@@ -167,33 +508,89 @@ class SurfRecipesTool(Tool):
         """
         Transforms the user request to find ingredient substitutes from a plain English format to a structured format. It takes a text describing what the uer is trying to substitute and returns a structured breakdown that clarifies the ingredient name, which can then be used to search for substitutes.
         """
-        thread = RoleThread()
-        router = Router(preference=["gpt-4-turbo"])
-
-        analyzer_msg = f"{substitution_analyzer_prompt} Here is the substitution requirement in plain English: {requirements}"
-        thread.post(role="user", msg=analyzer_msg)
+        return self._requirements("substitute", requirements)
 
-        response = router.chat(thread)
-        requirements_breakdown = json.loads(response.msg.text)
-
-        return {
-            "ingredient_name": requirements_breakdown["ingredient_name"],
-        }
+    async def aget_substitute_requirements(self, requirements: str) -> Dict[str, Union[str, List[str]]]:
+        return await self._arequirements("substitute", requirements)
 
     @action
     def get_ingredient_substitutes(self, requirements_breakdown: Dict[str, str]) -> None:
         """Find substitutes for a given ingredient. It needs the substitution request to be in a structured format. Then, it can find the substitutes."""
-        params = {'apiKey': SPOONACULAR_API_KEY}
-        params['ingredientName'] = requirements_breakdown['ingredient_name']
+        return self._substitutes_answer(requirements_breakdown['ingredient_name'])
 
-        substitute_api_url = "https://api.spoonacular.com/food/ingredients/substitutes"
-        response = requests.get(substitute_api_url, params=params)
-        if response.status_code != 200:
-            raise Exception("Error finding substitutes from Spoonacular")
-        conversion = json.loads(response.text)
+    async def aget_ingredient_substitutes(self, requirements_breakdown: Dict[str, str]) -> None:
+        return await self._asubstitutes_answer(requirements_breakdown['ingredient_name'])
+
+    @action
+    def get_many_ingredient_substitutes(self, ingredient_names: List[str]) -> str:
+        """Find substitutes for several ingredients in one call. It takes a list of ingredient names and returns the substitutes of each of them."""
+        local = self.substitutes.lookup_many(ingredient_names)
+        return "\n".join(self._substitutes_answer(name, local[name]) for name in ingredient_names)
+
+    async def aget_many_ingredient_substitutes(self, ingredient_names: List[str]) -> str:
+        local = await asyncio.to_thread(self.substitutes.lookup_many, ingredient_names)
+        answers = await asyncio.gather(
+            *(self._asubstitutes_answer(name, local[name]) for name in ingredient_names)
+        )
+        return "\n".join(answers)
+
+    def _substitutes_answer(self, ingredient_name: str, substitutes: Optional[List[str]] = None) -> str:
+        """Answer a substitution request from the local index, falling back to Spoonacular.
+
+        Args:
+            ingredient_name (str): Ingredient to substitute.
+            substitutes (List[str], optional): Substitutes already looked up in the index.
+
+        Returns:
+            str: The answer for the user.
+        """
+        local_answer = self._local_substitutes(ingredient_name, substitutes)
+        if local_answer:
+            return local_answer
+
+        params = {}
+        params['ingredientName'] = ingredient_name
+
+        conversion = self._get_json(
+            "substitutes",
+            "/food/ingredients/substitutes",
+            params,
+            "Error finding substitutes from Spoonacular",
+        )
+        return self._learn_substitutes(ingredient_name, conversion)
+
+    async def _asubstitutes_answer(self, ingredient_name: str, substitutes: Optional[List[str]] = None) -> str:
+        """Async variant of _substitutes_answer(), reading and writing the index off the event loop"""
+        local_answer = await asyncio.to_thread(self._local_substitutes, ingredient_name, substitutes)
+        if local_answer:
+            return local_answer
+
+        params = {}
+        params['ingredientName'] = ingredient_name
+
+        conversion = await self._aget_json(
+            "substitutes",
+            "/food/ingredients/substitutes",
+            params,
+            "Error finding substitutes from Spoonacular",
+        )
+        return await asyncio.to_thread(self._learn_substitutes, ingredient_name, conversion)
+
+    def _local_substitutes(self, ingredient_name: str, substitutes: Optional[List[str]] = None) -> Optional[str]:
+        """Answer a substitution request from the local index, if it knows the ingredient"""
+        if substitutes is None:
+            substitutes = self.substitutes.lookup(ingredient_name)
+        if substitutes:
+            logger.debug("substitutes answered locally")
+            return f"Substitutes for {ingredient_name}: " + ", ".join(substitutes)
+        return None
+
+    def _learn_substitutes(self, ingredient_name: str, conversion: dict) -> str:
+        """Feed a Spoonacular substitutes answer to the local index and return the answer"""
         if conversion['status'] == 'success':
-            conversion_answer = f"Substitutes for {params['ingredientName']}: "
+            self.substitutes.add(ingredient_name, conversion['substitutes'])
+            conversion_answer = f"Substitutes for {ingredient_name}: "
             conversion_answer += ", ".join(conversion['substitutes'])
         else:
-            conversion_answer = f"Spoonacular did not return any substitutes for {params['ingredientName']}"
-        return conversion_answer
\ No newline at end of file
+            conversion_answer = f"Spoonacular did not return any substitutes for {ingredient_name}"
+        return conversion_answer
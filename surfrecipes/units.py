@@ -0,0 +1,392 @@
+import json
+import logging
+import os
+import re
+import threading
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Final, Optional, Tuple, Union
+
+logger: Final = logging.getLogger(__name__)
+logger.setLevel(int(os.getenv("LOG_LEVEL", str(logging.DEBUG))))
+
+VOLUME: Final = "volume"
+MASS: Final = "mass"
+COUNT: Final = "count"
+
+# Size of each canonical unit in its base unit: milliliters, grams or pieces
+UNITS: Final[Dict[str, Tuple[str, float]]] = {
+    "teaspoon": (VOLUME, 4.92892),
+    "tablespoon": (VOLUME, 14.7868),
+    "fluid ounce": (VOLUME, 29.5735),
+    "cup": (VOLUME, 236.588),
+    "pint": (VOLUME, 473.176),
+    "quart": (VOLUME, 946.353),
+    "gallon": (VOLUME, 3785.41),
+    "milliliter": (VOLUME, 1.0),
+    "liter": (VOLUME, 1000.0),
+    "milligram": (MASS, 0.001),
+    "gram": (MASS, 1.0),
+    "kilogram": (MASS, 1000.0),
+    "ounce": (MASS, 28.3495),
+    "pound": (MASS, 453.592),
+    "piece": (COUNT, 1.0),
+}
+
+UNIT_ALIASES: Final[Dict[str, str]] = {
+    "tsp": "teaspoon",
+    "tsps": "teaspoon",
+    "teaspoons": "teaspoon",
+    "tbsp": "tablespoon",
+    "tbsps": "tablespoon",
+    "tbs": "tablespoon",
+    "tablespoons": "tablespoon",
+    "fl oz": "fluid ounce",
+    "fl. oz": "fluid ounce",
+    "fluid ounces": "fluid ounce",
+    "c": "cup",
+    "cups": "cup",
+    "pt": "pint",
+    "pints": "pint",
+    "qt": "quart",
+    "quarts": "quart",
+    "gal": "gallon",
+    "gallons": "gallon",
+    "ml": "milliliter",
+    "milliliters": "milliliter",
+    "millilitre": "milliliter",
+    "millilitres": "milliliter",
+    "l": "liter",
+    "liters": "liter",
+    "litre": "liter",
+    "litres": "liter",
+    "mg": "milligram",
+    "milligrams": "milligram",
+    "g": "gram",
+    "grams": "gram",
+    "gramme": "gram",
+    "grammes": "gram",
+    "kg": "kilogram",
+    "kgs": "kilogram",
+    "kilograms": "kilogram",
+    "oz": "ounce",
+    "ounces": "ounce",
+    "lb": "pound",
+    "lbs": "pound",
+    "pounds": "pound",
+    "pieces": "piece",
+    "pcs": "piece",
+    "whole": "piece",
+    "each": "piece",
+    "serving": "piece",
+    "servings": "piece",
+}
+
+# Grams per milliliter
+DENSITIES: Final[Dict[str, float]] = {
+    "flour": 0.528,
+    "all-purpose flour": 0.528,
+    "bread flour": 0.537,
+    "whole wheat flour": 0.507,
+    "almond flour": 0.406,
+    "cornstarch": 0.473,
+    "sugar": 0.845,
+    "caster sugar": 0.845,
+    "brown sugar": 0.9,
+    "powdered sugar": 0.507,
+    "icing sugar": 0.507,
+    "butter": 0.959,
+    "cream cheese": 0.959,
+    "water": 1.0,
+    "milk": 1.03,
+    "buttermilk": 1.03,
+    "cream": 1.01,
+    "heavy cream": 1.01,
+    "yogurt": 1.036,
+    "sour cream": 0.972,
+    "honey": 1.437,
+    "maple syrup": 1.319,
+    "oil": 0.92,
+    "vegetable oil": 0.92,
+    "olive oil": 0.91,
+    "salt": 1.217,
+    "baking soda": 1.217,
+    "baking powder": 0.811,
+    "cocoa powder": 0.355,
+    "rice": 0.84,
+    "oats": 0.376,
+    "rolled oats": 0.376,
+    "chocolate chips": 0.719,
+    "peanut butter": 1.141,
+    "cheese": 0.478,
+    "parmesan": 0.423,
+    "walnuts": 0.478,
+    "almonds": 0.6,
+    "raisins": 0.63,
+    "shredded coconut": 0.36,
+    "breadcrumbs": 0.473,
+    "egg": 1.03,
+}
+
+# Grams per piece
+UNIT_WEIGHTS: Final[Dict[str, float]] = {
+    "egg": 50.0,
+    "banana": 118.0,
+    "apple": 182.0,
+    "onion": 110.0,
+    "garlic": 5.0,
+    "tomato": 123.0,
+    "lemon": 58.0,
+    "lime": 44.0,
+    "potato": 213.0,
+    "carrot": 61.0,
+    "avocado": 201.0,
+}
+
+# Leading words that do not change how an ingredient converts. Words that change its
+# density, such as "packed", "sifted", "melted" or "chopped", are kept in the name.
+QUALIFIERS: Final = frozenset(
+    {
+        "fresh",
+        "organic",
+        "raw",
+        "plain",
+        "softened",
+        "cold",
+        "unsalted",
+        "salted",
+        "granulated",
+        "white",
+        "large",
+        "medium",
+        "small",
+        "uncooked",
+    }
+)
+
+# Words ending in "s" that are not plurals
+SINGULAR_NOUNS: Final = frozenset(
+    {"molasses", "hummus", "couscous", "asparagus", "citrus", "swiss", "grits", "hibiscus"}
+)
+
+UNICODE_FRACTIONS: Final = {"½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅛": "1/8"}
+
+
+def normalize_unit(unit: Optional[str]) -> Optional[str]:
+    """Canonical name of a unit, or None if it is unknown"""
+    unit = (unit or "").strip().lower().rstrip(".")
+    if unit in UNITS:
+        return unit
+    return UNIT_ALIASES.get(unit)
+
+
+def singularize(name: str) -> str:
+    """Singular form of an ingredient name, e.g. cherry tomato for cherry tomatoes"""
+    head, _, word = name.rpartition(" ")
+    if word in SINGULAR_NOUNS or word.endswith(("ss", "us", "is")) or not word.endswith("s"):
+        singular = word
+    elif word.endswith("ies") and len(word) > 4:
+        singular = word[:-3] + "y"
+    elif word.endswith(("oes", "ches", "shes", "xes", "zes", "sses")):
+        singular = word[:-2]
+    else:
+        singular = word[:-1]
+    return f"{head} {singular}" if head else singular
+
+
+def parse_amount(amount: Union[str, int, float]) -> Optional[float]:
+    """Parse amounts such as "2", "2.5", "1/2", "1 1/2" or "1½".
+
+    Args:
+        amount (Union[str, int, float]): The amount.
+
+    Returns:
+        Optional[float]: The amount as a float, or None if it cannot be parsed.
+    """
+    if isinstance(amount, (int, float)):
+        return float(amount)
+    text = str(amount).strip()
+    for char, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(char, f" {fraction}")
+    try:
+        return float(sum(Fraction(part) for part in text.split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def format_amount(amount: float) -> str:
+    """Format an amount the way Spoonacular answers read, e.g. 312.5 or 2"""
+    return f"{round(amount, 2):g}" if amount < 1e6 else f"{amount:.0f}"
+
+
+class UnitConverter:
+    """Converts ingredient amounts between volume, mass and count units"""
+
+    def __init__(self, learned_path: Optional[str] = None) -> None:
+        """
+        Initialize the converter.
+
+        Args:
+            learned_path (str, optional): JSON file holding densities and unit weights
+                learned from the API. Defaults to None, which keeps them in memory only.
+        """
+        self.learned_path = learned_path
+        self.densities: Dict[str, float] = dict(DENSITIES)
+        self.unit_weights: Dict[str, float] = dict(UNIT_WEIGHTS)
+        self._lock = threading.Lock()
+
+        if learned_path and os.path.exists(learned_path):
+            with open(learned_path) as f:
+                learned = json.load(f)
+            self.densities.update(learned.get("densities", {}))
+            self.unit_weights.update(learned.get("unit_weights", {}))
+
+    def normalize_ingredient(self, name: str) -> str:
+        """Find the table entry for an ingredient name, dropping plurals and qualifiers.
+
+        An ingredient without an entry gets its singular form, the key learn() stores it
+        under, so "eggs" and "egg" find what either one learned.
+        """
+        words = re.sub(r"[^a-z\- ]", " ", name.lower()).split()
+        while words:
+            candidate = " ".join(words)
+            for form in (candidate, singularize(candidate)):
+                if form in self.densities or form in self.unit_weights:
+                    return form
+            if words[0] not in QUALIFIERS:
+                break
+            words = words[1:]
+        return singularize(" ".join(words)) if words else ""
+
+    def convert(
+        self,
+        ingredient: str,
+        amount: Union[str, float],
+        source_unit: str,
+        target_unit: str,
+    ) -> Optional[float]:
+        """Convert an ingredient amount locally.
+
+        Args:
+            ingredient (str): Ingredient name.
+            amount (Union[str, float]): Source amount.
+            source_unit (str): Unit to convert from.
+            target_unit (str): Unit to convert into.
+
+        Returns:
+            Optional[float]: The target amount, or None if the units or ingredient are unknown.
+        """
+        source = normalize_unit(source_unit)
+        target = normalize_unit(target_unit)
+        value = parse_amount(amount)
+        if source is None or target is None or value is None:
+            return None
+
+        source_kind, source_size = UNITS[source]
+        target_kind, target_size = UNITS[target]
+        base = value * source_size
+        if source_kind != target_kind:
+            base = self._convert_base(self.normalize_ingredient(ingredient), base, source_kind, target_kind)
+            if base is None:
+                return None
+        return base / target_size
+
+    def _convert_base(self, name: str, value: float, source: str, target: str) -> Optional[float]:
+        """Move a value in base units (ml, g, pieces) from one dimension to another"""
+        density = self.densities.get(name)
+        weight = self.unit_weights.get(name)
+
+        # Go through grams, which every conversion can reach
+        if source == VOLUME:
+            if density is None:
+                return None
+            grams = value * density
+        elif source == COUNT:
+            if weight is None:
+                return None
+            grams = value * weight
+        else:
+            grams = value
+
+        if target == VOLUME:
+            return grams / density if density else None
+        if target == COUNT:
+            return grams / weight if weight else None
+        return grams
+
+    def answer(
+        self,
+        ingredient: str,
+        amount: Union[str, float],
+        source_unit: str,
+        target_unit: str,
+    ) -> Optional[str]:
+        """A Spoonacular style answer, e.g. "2 cups flour translates to 249.85 grams."
+
+        Returns:
+            Optional[str]: The answer, or None if the conversion is not known locally.
+        """
+        result = self.convert(ingredient, amount, source_unit, target_unit)
+        if result is None:
+            return None
+        return (
+            f"{format_amount(parse_amount(amount))} {source_unit} {ingredient} "
+            f"translates to {format_amount(result)} {target_unit}."
+        )
+
+    def learn(
+        self,
+        ingredient: str,
+        source_amount: Union[str, float],
+        source_unit: str,
+        target_amount: Union[str, float],
+        target_unit: str,
+    ) -> bool:
+        """Learn a density or unit weight from a conversion answered elsewhere.
+
+        Returns:
+            bool: Whether anything was learned.
+        """
+        source = normalize_unit(source_unit)
+        target = normalize_unit(target_unit)
+        source_value = parse_amount(source_amount)
+        target_value = parse_amount(target_amount)
+        if None in (source, target, source_value, target_value) or not source_value or not target_value:
+            return False
+
+        values = {
+            UNITS[source][0]: source_value * UNITS[source][1],
+            UNITS[target][0]: target_value * UNITS[target][1],
+        }
+        if MASS not in values or len(values) != 2:
+            return False
+
+        name = self.normalize_ingredient(ingredient)
+        with self._lock:
+            if VOLUME in values:
+                self.densities[name] = values[MASS] / values[VOLUME]
+            else:
+                self.unit_weights[name] = values[MASS] / values[COUNT]
+            self._save()
+        logger.debug(f"learned conversion for {name}")
+        return True
+
+    def _save(self) -> None:
+        """Persist the entries that differ from the built in tables"""
+        if not self.learned_path:
+            return
+        learned = {
+            "densities": {k: v for k, v in self.densities.items() if DENSITIES.get(k) != v},
+            "unit_weights": {k: v for k, v in self.unit_weights.items() if UNIT_WEIGHTS.get(k) != v},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.learned_path)), exist_ok=True)
+        tmp_path = f"{self.learned_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(learned, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.learned_path)
+
+
+@lru_cache(maxsize=None)
+def unit_converter(data_path: str) -> UnitConverter:
+    """The process wide unit converter learning into a data path"""
+    return UnitConverter(os.path.join(data_path, "units.json"))
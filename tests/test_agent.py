@@ -0,0 +1,323 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from skillpacks.server.models import V1ActionSelection
+from threadmem import RoleMessage
+
+from surfrecipes.sink import TaskSink
+from surfrecipes.spoonacular import TransientSpoonacularError
+
+
+@pytest.fixture
+def agent_mod(monkeypatch, tmp_path):
+    """The agent module, importable without real API keys, with task data under tmp_path."""
+    monkeypatch.setenv("SPOONACULAR_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.chdir(tmp_path)
+    from surfrecipes import agent
+
+    agent.primer_store.cache_clear()
+    return agent
+
+
+class FakeRouter:
+    """Helper router replying to the primer and selecting queued actions."""
+
+    def __init__(self, *actions):
+        self.actions = list(actions)
+        self.selections = 0
+        self.primers = 0
+
+    async def chat_async(self, thread, namespace=None, expect=None, **kwargs):
+        if namespace == "system":
+            self.primers += 1
+            return SimpleNamespace(msg=SimpleNamespace(text="ok"))
+        self.selections += 1
+        name, parameters = self.actions.pop(0)
+        selection = V1ActionSelection.model_validate(
+            {
+                "observation": "seen",
+                "reason": "because",
+                "action": {"name": name, "parameters": parameters},
+                "expectation": "done",
+            }
+        )
+        return SimpleNamespace(
+            prompt=None, parsed=selection, msg=RoleMessage(role="assistant", text="{}"), model="fake"
+        )
+
+
+def create_task(description="Find me a vegan pasta recipe"):
+    """Helper function to create a local task. The fake router has no real prompts to store."""
+    from taskara import Task
+
+    task = Task(description=description)
+    task.add_prompt = lambda prompt: None
+    return task
+
+
+def test_asolve_task_keeps_blocking_calls_off_the_loop(agent_mod, monkeypatch):
+    """Test that the tracker, thread store and tool teardown run in worker threads."""
+    monkeypatch.setattr(agent_mod, "router", FakeRouter(("result", {"value": "pasta"})))
+    calls = {}
+
+    def record(name, fn):
+        def wrapper(*args, **kwargs):
+            calls[name] = threading.current_thread()
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(agent_mod, "new_thread", record("new_thread", agent_mod.new_thread))
+    monkeypatch.setattr(agent_mod, "next_thread", record("next_thread", agent_mod.next_thread))
+    monkeypatch.setattr(
+        agent_mod.SurfRecipesTool, "close", record("close", agent_mod.SurfRecipesTool.close)
+    )
+    task = create_task()
+    monkeypatch.setattr(task, "ensure_thread", record("ensure_thread", task.ensure_thread))
+
+    async def run():
+        loop_thread = threading.current_thread()
+        await agent_mod.SurfRecipes().asolve_task(task, max_steps=2)
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert task.status.value == "finished"
+    assert set(calls) == {"new_thread", "next_thread", "close", "ensure_thread"}
+    assert all(thread is not loop_thread for thread in calls.values())
+
+
+def test_sync_entry_points_close_the_loop_client(agent_mod, monkeypatch):
+    """Test that solve_task closes the async client of the loop it ran on."""
+    monkeypatch.setattr(agent_mod, "router", FakeRouter(("result", {"value": "pasta"})))
+    clients = agent_mod.spoonacular._async_clients
+
+    async def fetch_then_finish(*args, **kwargs):
+        agent_mod.spoonacular._async_client()
+        assert len(clients) == 1
+        return create_task()
+
+    monkeypatch.setattr(agent_mod.SurfRecipes, "asolve_task", fetch_then_finish)
+    agent_mod.SurfRecipes().solve_task(create_task())
+    assert len(clients) == 0
+
+
+def test_primed_reply_is_reused_until_the_prompt_changes(agent_mod, monkeypatch):
+    """Test that the primer is asked for once, survives a restart and is asked again for a new prompt."""
+    fake = FakeRouter()
+    monkeypatch.setattr(agent_mod, "router", fake)
+    recipetool = SimpleNamespace(data_path="./.data")
+    monkeypatch.setattr(agent_mod, "system_prompt", lambda recipetool: "prompt v1")
+
+    assert asyncio.run(agent_mod.primed_reply(recipetool)) == "ok"
+    assert asyncio.run(agent_mod.primed_reply(recipetool)) == "ok"
+    agent_mod.primer_store.cache_clear()
+    assert asyncio.run(agent_mod.primed_reply(recipetool)) == "ok"
+    assert fake.primers == 1
+
+    monkeypatch.setattr(agent_mod, "system_prompt", lambda recipetool: "prompt v2")
+    asyncio.run(agent_mod.primed_reply(recipetool))
+    assert fake.primers == 2
+
+
+def create_step(agent_mod, task, ause):
+    """Helper function to create a tool whose actions run ause, and a thread to take a step on."""
+    recipetool = agent_mod.SurfRecipesTool(task=task)
+    recipetool.ause = ause
+    return recipetool, agent_mod.new_thread(("user", "system prompt"))
+
+
+def test_transient_execute_errors_retry_the_same_selection(agent_mod, monkeypatch):
+    """Test that a transient error retries execution of the kept selection, without asking the model again."""
+    fake = FakeRouter(("find_recipe", {"requirements": "pasta"}), ("find_recipe", {"requirements": "pasta"}))
+    monkeypatch.setattr(agent_mod, "router", fake)
+    outcomes = [TransientSpoonacularError("Error searching recipes (status 503)"), "https://cards/100.png"]
+    calls = []
+
+    async def ause(action, **kwargs):
+        calls.append(kwargs)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    task = create_task()
+    recipetool, thread = create_step(agent_mod, task, ause)
+    agent = agent_mod.SurfRecipes(agent_mod.SurfRecipesConfig(backoff_initial=0))
+    _, state, done = asyncio.run(agent.atake_action(recipetool, task, thread, task.description))
+    assert (state, done) == ("https://cards/100.png", False)
+    assert calls == [{"requirements": "pasta"}] * 2
+    assert fake.selections == 1
+    recipetool.close()
+
+
+def test_failed_execute_does_not_select_again(agent_mod, monkeypatch):
+    """Test that execution failing on every attempt raises without another call to the model."""
+    fake = FakeRouter(("find_recipe", {"requirements": "pasta"}), ("find_recipe", {"requirements": "pasta"}))
+    monkeypatch.setattr(agent_mod, "router", fake)
+    calls = []
+
+    async def ause(action, **kwargs):
+        calls.append(action.name)
+        raise TransientSpoonacularError("Error searching recipes (status 503)")
+
+    task = create_task()
+    recipetool, thread = create_step(agent_mod, task, ause)
+    config = agent_mod.SurfRecipesConfig(backoff_initial=0, execute_attempts=4)
+    with pytest.raises(TransientSpoonacularError):
+        asyncio.run(agent_mod.SurfRecipes(config).atake_action(recipetool, task, thread, task.description))
+    assert calls == ["find_recipe"] * 4
+    assert fake.selections == 1
+    recipetool.close()
+
+
+def test_other_execute_errors_are_not_retried(agent_mod, monkeypatch):
+    """Test that an action failing for a reason other than a transient error is neither retried nor selected again."""
+    fake = FakeRouter(("find_recipe", {"requirements": "pasta"}), ("find_recipe", {"requirements": "pasta"}))
+    monkeypatch.setattr(agent_mod, "router", fake)
+    calls = []
+
+    async def ause(action, **kwargs):
+        calls.append(action.name)
+        raise ValueError("bad requirements")
+
+    task = create_task()
+    recipetool, thread = create_step(agent_mod, task, ause)
+    with pytest.raises(ValueError, match="bad requirements"):
+        asyncio.run(agent_mod.SurfRecipes().atake_action(recipetool, task, thread, task.description))
+    assert calls == ["find_recipe"]
+    assert fake.selections == 1
+    recipetool.close()
+
+
+def test_invalid_selections_are_selected_again(agent_mod, monkeypatch):
+    """Test that an unknown action or parameters that do not fit it go back to the model for a new selection."""
+    fake = FakeRouter(
+        ("no_such_action", {}),
+        ("find_recipe", {"wrong": "pasta"}),
+        ("find_recipe", {"requirements": "pasta"}),
+    )
+    monkeypatch.setattr(agent_mod, "router", fake)
+
+    async def ause(action, requirements):
+        return "https://cards/100.png"
+
+    task = create_task()
+    recipetool, thread = create_step(agent_mod, task, ause)
+    _, state, done = asyncio.run(agent_mod.SurfRecipes().atake_action(recipetool, task, thread, task.description))
+    assert (state, done) == ("https://cards/100.png", False)
+    assert fake.selections == 3
+    recipetool.close()
+
+
+def test_selection_gives_up_after_its_attempts(agent_mod, monkeypatch):
+    """Test that the select stage raises once every attempt gave an invalid selection."""
+    fake = FakeRouter(*[("no_such_action", {})] * 3)
+    monkeypatch.setattr(agent_mod, "router", fake)
+
+    async def ause(action, **kwargs):
+        return "https://cards/100.png"
+
+    task = create_task()
+    recipetool, thread = create_step(agent_mod, task, ause)
+    with pytest.raises(agent_mod.InvalidSelection):
+        asyncio.run(agent_mod.SurfRecipes().atake_action(recipetool, task, thread, task.description))
+    assert fake.selections == 3
+    recipetool.close()
+
+
+def test_only_transient_errors_count_as_pushback(agent_mod, monkeypatch):
+    """Test that a failed step paces the task only when upstream services pushed back."""
+    monkeypatch.setattr(
+        agent_mod,
+        "router",
+        FakeRouter(("find_recipe", {"requirements": "pasta"}), ("find_recipe", {"requirements": "pasta"})),
+    )
+    errors = [ValueError("bad requirements"), TransientSpoonacularError("Error searching recipes (status 503)")]
+
+    async def ause(action, **kwargs):
+        raise errors[0]
+
+    task = create_task()
+    recipetool, thread = create_step(agent_mod, task, ause)
+    agent = agent_mod.SurfRecipes(agent_mod.SurfRecipesConfig(backoff_initial=0, execute_attempts=1))
+    pushback = agent_mod.Pushback()
+    with agent_mod.tracking_pushback(pushback):
+        with pytest.raises(ValueError):
+            asyncio.run(agent.atake_action(recipetool, task, thread, task.description))
+        assert pushback.take() == (0, None)
+        errors.pop(0)
+        with pytest.raises(TransientSpoonacularError):
+            asyncio.run(agent.atake_action(recipetool, task, thread, task.description))
+        assert pushback.take() == (1, None)
+    recipetool.close()
+
+
+def test_record_stage_retries_in_the_sink(agent_mod, monkeypatch):
+    """Test that recording an action the tracker fails to take at first is retried by the sink's writer."""
+    monkeypatch.setattr(agent_mod, "router", FakeRouter(("find_recipe", {"requirements": "pasta"})))
+    recorded = []
+
+    def flaky_record_action(**kwargs):
+        recorded.append(kwargs["result"])
+        if len(recorded) == 1:
+            raise ConnectionError("tracker down")
+
+    async def ause(action, **kwargs):
+        return "https://cards/100.png"
+
+    task = create_task()
+    task.record_action = flaky_record_action
+    recipetool, thread = create_step(agent_mod, task, ause)
+    sink = TaskSink(task, backoff=0)
+    asyncio.run(agent_mod.SurfRecipes().atake_action(recipetool, task, thread, task.description, sink=sink))
+    sink.close()
+    assert recorded == ["https://cards/100.png"] * 2
+    assert sink.stats()["retries"] == 1
+    assert sink.stats()["errors"] == 0
+    recipetool.close()
+
+
+def test_cancelling_refreshes_before_saving(agent_mod, monkeypatch):
+    """Test that a task cancelled through the watcher is refreshed before CANCELED is saved over it."""
+    events = []
+    task = create_task()
+    task.remote = "http://tracker"
+    task.refresh = lambda: events.append("refresh")
+    task.save = lambda: events.append(("save", task.status.value))
+    watcher = SimpleNamespace(cancelled=lambda: True, poll_soon=lambda: None, status=agent_mod.TaskStatus.CANCELING)
+    recipetool, thread = create_step(agent_mod, task, None)
+
+    _, _, done = asyncio.run(
+        agent_mod.SurfRecipes().atake_action(recipetool, task, thread, task.description, watcher=watcher)
+    )
+    assert done
+    assert events == ["refresh", ("save", "canceled")]
+    recipetool.close()
+
+
+def test_cancelling_while_selecting_skips_the_action(agent_mod, monkeypatch):
+    """Test that a cancellation seen during the select stage stops the step before the action runs."""
+    fake = FakeRouter(("find_recipe", {"requirements": "pasta"}))
+    monkeypatch.setattr(agent_mod, "router", fake)
+    task = create_task()
+    polls = []
+    watcher = SimpleNamespace(
+        cancelled=lambda: fake.selections > 0, poll_soon=lambda: polls.append(1), status=agent_mod.TaskStatus.CANCELING
+    )
+    calls = []
+
+    async def ause(action, **kwargs):
+        calls.append(action.name)
+
+    recipetool, thread = create_step(agent_mod, task, ause)
+    _, _, done = asyncio.run(
+        agent_mod.SurfRecipes().atake_action(recipetool, task, thread, task.description, watcher=watcher)
+    )
+    assert done
+    assert polls == [1]
+    assert calls == []
+    assert task.status == agent_mod.TaskStatus.CANCELED
+    recipetool.close()
@@ -0,0 +1,29 @@
+from benchmarks.suite import compare, load_baselines, measure, save_baselines
+
+
+def test_measure():
+    """Test that timings are taken over the requested runs."""
+    calls = []
+    result = measure(lambda: calls.append(1), repeat=3, warmup=1)
+    assert len(calls) == 4
+    assert result["repeat"] == 3
+    assert result["min"] <= result["median"] <= result["max"]
+
+
+def test_compare_flags_regressions():
+    """Test that only slowdowns beyond the threshold regress."""
+    baselines = {"fast": {"median": 1.0}, "slow": {"median": 1.0}}
+    results = {"fast": {"median": 1.1}, "slow": {"median": 1.5}, "new": {"median": 2.0}}
+    report = compare(results, baselines, threshold=0.25)
+    assert not report["fast"]["regressed"]
+    assert report["slow"]["regressed"]
+    assert round(report["slow"]["change"], 2) == 0.5
+    assert report["new"] == {"median": 2.0, "baseline": None, "change": None, "regressed": False}
+
+
+def test_save_baselines_keeps_others(tmp_path):
+    """Test that saving a partial run keeps the other baselines."""
+    path = str(tmp_path / "baselines.json")
+    save_baselines({"a": {"median": 1.0, "min": 0.9}, "b": {"median": 2.0, "min": 1.9}}, path)
+    save_baselines({"a": {"median": 0.5, "min": 0.4}}, path)
+    assert load_baselines(path) == {"a": {"median": 0.5, "min": 0.4}, "b": {"median": 2.0, "min": 1.9}}
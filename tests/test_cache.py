@@ -0,0 +1,104 @@
+import time
+
+from surfrecipes.cache import AnalyzerCache, PrimerStore, ResponseCache, normalize_params, normalize_text
+
+
+def create_cache(tmp_path, **kwargs):
+    """Helper function to create a cache in a temporary directory."""
+    return ResponseCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_normalize_params():
+    """Test that the API key is dropped and values are normalized."""
+    params = {"apiKey": "secret", "query": " Salad ", "includeIngredients": "tomato, Carrot"}
+    assert normalize_params(params) == {"includeIngredients": "carrot,tomato", "query": "salad"}
+
+
+def test_hit_and_miss(tmp_path):
+    """Test that equivalent requests share an entry and counters are kept."""
+    cache = create_cache(tmp_path)
+    path = "/food/ingredients/substitutes"
+    assert cache.get("substitutes", path, {"ingredientName": "butter"}) is None
+
+    cache.set("substitutes", path, {"ingredientName": "butter", "apiKey": "a"}, {"status": "success"})
+    assert cache.get("substitutes", path, {"ingredientName": "Butter", "apiKey": "b"}) == {
+        "status": "success"
+    }
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["endpoints"]["substitutes"] == {"hits": 1, "misses": 1}
+    assert stats["entries"] == 1
+
+
+def test_persists_across_instances(tmp_path):
+    """Test that responses survive a restart."""
+    create_cache(tmp_path).set("card", "/recipes/1/card", {}, {"url": "u"})
+    assert create_cache(tmp_path).get("card", "/recipes/1/card") == {"url": "u"}
+
+
+def test_ttl_per_endpoint(tmp_path):
+    """Test that expired entries are not served."""
+    cache = create_cache(tmp_path, ttls={"search": -1})
+    cache.set("search", "/recipes/complexSearch", {"query": "salad"}, {"results": []})
+    cache.set("convert", "/recipes/convert", {"sourceUnit": "cups"}, {"answer": "a"})
+    assert cache.get("search", "/recipes/complexSearch", {"query": "salad"}) is None
+    assert cache.get("convert", "/recipes/convert", {"sourceUnit": "cups"}) == {"answer": "a"}
+
+
+def test_lru_eviction(tmp_path):
+    """Test that the least recently used entries are evicted over budget."""
+    cache = create_cache(tmp_path, max_bytes=100)
+    value = {"data": "x" * 30}
+    cache.set("card", "/recipes/1/card", {}, value)
+    time.sleep(0.01)
+    cache.set("card", "/recipes/2/card", {}, value)
+    time.sleep(0.01)
+    cache.get("card", "/recipes/1/card")
+    time.sleep(0.01)
+    cache.set("card", "/recipes/3/card", {}, value)
+
+    assert cache.get("card", "/recipes/2/card") is None
+    assert cache.get("card", "/recipes/1/card") == value
+    assert cache.get("card", "/recipes/3/card") == value
+
+
+def test_normalize_text():
+    """Test that trivially different requests normalize alike."""
+    assert normalize_text("What can I use instead of Butter?") == normalize_text(
+        "  what can i use   instead of butter"
+    )
+    assert normalize_text("Convert 2.5 cups") == "convert 2.5 cups"
+
+
+def test_analyzer_cache_lru():
+    """Test that analyzer outputs are memoized and bounded."""
+    cache = AnalyzerCache(max_entries=2)
+    cache.set("substitute", "Butter?", {"ingredient_name": "butter"})
+    cache.set("substitute", "eggs", {"ingredient_name": "eggs"})
+    assert cache.get("substitute", "butter") == {"ingredient_name": "butter"}
+    assert cache.get("conversion", "butter") is None
+
+    cache.set("substitute", "milk", {"ingredient_name": "milk"})
+    assert cache.get("substitute", "eggs") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 2}
+
+
+def test_analyzer_cache_persists(tmp_path):
+    """Test that analyzer outputs can survive a restart."""
+    AnalyzerCache(persist=create_cache(tmp_path)).set("recipe", "vegan pasta", {"food": "pasta"})
+    assert AnalyzerCache(persist=create_cache(tmp_path)).get("recipe", "Vegan pasta!") == {"food": "pasta"}
+
+
+def test_primer_store(tmp_path):
+    """Test that replies are kept per prompt and survive a restart."""
+    store = PrimerStore(str(tmp_path / "primers"))
+    assert store.get("prompt v1") is None
+    store.set("prompt v1", "ok")
+    assert store.cached("prompt v1") == "ok"
+
+    store = PrimerStore(str(tmp_path / "primers"))
+    assert store.cached("prompt v1") is None
+    assert store.get("prompt v1") == "ok"
+    assert store.get("prompt v2") is None
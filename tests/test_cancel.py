@@ -0,0 +1,55 @@
+import time
+
+from taskara import Task, TaskStatus
+
+from surfrecipes.cancel import CancellationWatcher
+
+
+def test_in_process_status():
+    """Test that a status set in process is seen without polling."""
+    task = Task(description="find a salad recipe")
+    watcher = CancellationWatcher(task)
+    assert not watcher.cancelled()
+    task.status = TaskStatus.CANCELING
+    assert watcher.cancelled()
+    assert watcher.status == TaskStatus.CANCELING
+
+
+def test_polls_in_the_background():
+    """Test that a cancellation stored by someone else sets the flag."""
+    task = Task(description="find a soup recipe")
+    watcher = CancellationWatcher(task, interval=0.01)
+    watcher.start()
+
+    other = Task.find(id=task.id)[0]
+    other.status = TaskStatus.CANCELING
+    other.save()
+
+    deadline = time.time() + 5
+    while not watcher.cancelled() and time.time() < deadline:
+        time.sleep(0.01)
+    watcher.stop()
+
+    assert watcher.cancelled()
+    assert task.status != TaskStatus.CANCELING
+    assert watcher.polls >= 1
+
+
+def test_poll_soon_skips_the_interval():
+    """Test that waking the watcher polls right away rather than after the interval."""
+    task = Task(description="find a curry recipe")
+    watcher = CancellationWatcher(task, interval=60)
+    watcher.start()
+
+    other = Task.find(id=task.id)[0]
+    other.status = TaskStatus.CANCELING
+    other.save()
+    watcher.poll_soon()
+
+    deadline = time.time() + 5
+    while not watcher.cancelled() and time.time() < deadline:
+        time.sleep(0.01)
+    watcher.stop()
+
+    assert watcher.cancelled()
+    assert watcher.polls == 1
@@ -0,0 +1,191 @@
+import asyncio
+import os
+from io import BytesIO
+
+import httpx
+import pytest
+import requests
+from PIL import Image
+
+from surfrecipes.cache import ResponseCache
+from surfrecipes.cards import CardDownloader, make_thumbnail, thumbnail_path
+from surfrecipes.spoonacular import SpoonacularClient
+from surfrecipes.store import ImageStore
+
+URL = "https://spoonacular.com/recipeCardImages/recipeCard-1.jpg"
+
+
+def create_jpeg(size=(1200, 900)):
+    """Helper function to create JPEG bytes."""
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 100, 50)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def create_response(status_code=200, headers=None, body=b""):
+    """Helper function to create a canned response."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+def create_downloader(tmp_path, responses):
+    """Helper function to create a downloader that replays the given responses."""
+    client = SpoonacularClient(api_key="key")
+    calls = []
+
+    def fake_get(url, **kw):
+        calls.append(kw.get("headers") or {})
+        return responses.pop(0)
+
+    client.session.get = fake_get
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    store = ImageStore(str(tmp_path / "store"))
+    return CardDownloader(client, cache, store, chunk_size=1024), calls
+
+
+def test_download_and_revalidate(tmp_path):
+    """Test that cards are written to disk and revalidated by later tasks."""
+    body = create_jpeg()
+    downloader, calls = create_downloader(
+        tmp_path,
+        [
+            create_response(200, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, body),
+            create_response(304),
+        ],
+    )
+    first, second = tmp_path / "task1", tmp_path / "task2"
+    first.mkdir()
+    second.mkdir()
+
+    path = downloader.download(URL, str(first))
+    with open(path, "rb") as f:
+        assert f.read() == body
+    assert os.path.exists(thumbnail_path(path))
+    assert calls[0] == {}
+
+    reused = downloader.download(URL, str(second))
+    assert calls[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert os.path.dirname(reused) == str(second)
+    with open(reused, "rb") as f:
+        assert f.read() == body
+    assert os.path.samefile(path, reused)
+    assert os.path.exists(thumbnail_path(reused))
+
+
+def test_make_thumbnail(tmp_path):
+    """Test that thumbnails fit the bounding box."""
+    path = tmp_path / "card.jpg"
+    path.write_bytes(create_jpeg())
+    with Image.open(make_thumbnail(str(path), (300, 300))) as thumb:
+        assert max(thumb.size) <= 300
+
+
+def test_failed_download_leaves_no_partial_file(tmp_path):
+    """Test that a stream failing half way, or a failed store, removes the partial file."""
+    response = create_response(200, {}, b"")
+
+    def broken_stream(chunk_size=1):
+        yield b"half a card"
+        raise requests.ConnectionError("connection reset")
+
+    response.iter_content = broken_stream
+    downloader, _ = create_downloader(tmp_path, [response])
+    task = tmp_path / "task"
+    task.mkdir()
+
+    with pytest.raises(requests.ConnectionError):
+        downloader.download(URL, str(task))
+    assert os.listdir(task) == []
+
+    async def fake_afetch(url, **kw):
+        return httpx.Response(200, content=create_jpeg())
+
+    def full_disk(*args, **kwargs):
+        raise OSError("no space left on device")
+
+    downloader.client.afetch = fake_afetch
+    downloader.store.add = full_disk
+    with pytest.raises(OSError):
+        asyncio.run(downloader.adownload(URL, str(task)))
+    assert os.listdir(task) == []
+
+
+class ChunkedBody(httpx.AsyncByteStream):
+    """Helper response body served in chunks, recording how far it was read and whether it was closed."""
+
+    def __init__(self, body, chunk_size=1024):
+        self.chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.served = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.served += 1
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_async_download_streams_the_card(tmp_path):
+    """Test that the async download streams the body to disk, after the client retried a server error."""
+    body = create_jpeg()
+    streams = [ChunkedBody(b"busy"), ChunkedBody(body)]
+    responses = [
+        httpx.Response(503, stream=streams[0]),
+        httpx.Response(200, headers={"ETag": '"v1"'}, stream=streams[1]),
+    ]
+    downloader, _ = create_downloader(tmp_path, [])
+    downloader.client.backoff_factor = 0
+    task = tmp_path / "task"
+    task.mkdir()
+
+    async def run():
+        downloader.client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: responses.pop(0))
+        )
+        try:
+            return await downloader.adownload(URL, str(task))
+        finally:
+            await downloader.client.aclose()
+
+    path = asyncio.run(run())
+    with open(path, "rb") as f:
+        assert f.read() == body
+    assert streams[0].closed and streams[0].served == 0
+    assert streams[1].closed and streams[1].served == len(streams[1].chunks) > 1
+    assert sorted(os.listdir(task)) == sorted([os.path.basename(path), os.path.basename(thumbnail_path(path))])
+
+
+def test_card_evicted_after_revalidation_is_downloaded_again(tmp_path):
+    """Test that a card evicted between revalidation and linking is fetched in full instead."""
+    body = create_jpeg()
+    downloader, calls = create_downloader(
+        tmp_path,
+        [create_response(200, {"ETag": '"v1"'}, body), create_response(304), create_response(200, {}, body)],
+    )
+    first, second = tmp_path / "task1", tmp_path / "task2"
+    first.mkdir()
+    second.mkdir()
+    downloader.download(URL, str(first))
+
+    contains = downloader.store.contains
+
+    def evicted_meanwhile(stored):
+        found = contains(stored)
+        if found:
+            os.remove(stored)
+        return found
+
+    downloader.store.contains = evicted_meanwhile
+    path = downloader.download(URL, str(second))
+    downloader.store.contains = contains
+    assert calls[1] == {"If-None-Match": '"v1"'}
+    assert calls[2] == {}
+    with open(path, "rb") as f:
+        assert f.read() == body
+    assert os.path.exists(thumbnail_path(path))
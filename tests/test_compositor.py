@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from surfrecipes.compositor import VerticalCompositor
+from surfrecipes.img import combine_images_vertically
+
+
+def create_images():
+    """Helper function to create images of different sizes."""
+    return [
+        Image.radial_gradient("L").resize((300, 200)).convert("RGB"),
+        Image.new("RGB", (120, 90), "blue"),
+        Image.linear_gradient("L").resize((250, 40)).convert("RGB"),
+    ]
+
+
+def stitch(compositor, band_height):
+    """Helper function to put streamed bands back together."""
+    img = Image.new("RGB", (compositor.width, compositor.height))
+    for top, band in compositor.bands(band_height):
+        img.paste(band, (0, top))
+    return img
+
+
+def test_layout():
+    """Test that images are stacked below their padding with dividers in between."""
+    compositor = VerticalCompositor(create_images())
+    assert compositor.tops.tolist() == [10, 232, 344]
+    assert compositor.dividers.tolist() == [220, 332]
+    assert (compositor.width, compositor.height) == (400, 394)
+    assert compositor.scale == 1
+
+
+def test_render():
+    """Test that images are pasted right of the gutter and labelled."""
+    img = VerticalCompositor(create_images()).render()
+    pixels = np.asarray(img)
+    assert img.size == (400, 394)
+    assert tuple(pixels[232 + 45, 100 + 60]) == (0, 0, 255)
+    assert tuple(pixels[221, 50]) == (0, 0, 0)
+    # A label in the gutter of each image
+    for top, height in ((10, 200), (232, 90), (344, 40)):
+        assert (pixels[top : top + height, :100] < 128).any()
+
+
+@pytest.mark.parametrize("budget", [{}, {"max_height": 200}])
+def test_bands_match_render(budget):
+    """Test that streamed bands add up to the whole composite."""
+    compositor = VerticalCompositor(create_images(), **budget)
+    assert np.array_equal(np.asarray(stitch(compositor, 37)), np.asarray(compositor.render()))
+
+
+def test_downscale_to_budget():
+    """Test that images are downscaled to the height and byte budgets."""
+    images = create_images()
+    by_height = VerticalCompositor(images, max_height=200)
+    assert by_height.height <= 200
+    assert 0 < by_height.scale < 1
+
+    by_bytes = VerticalCompositor(images, max_bytes=3 * 200 * 300)
+    assert 3 * by_bytes.width * by_bytes.height <= 3 * 200 * 300
+    assert by_bytes.render().size == (by_bytes.width, by_bytes.height)
+
+    with pytest.raises(ValueError):
+        VerticalCompositor(images, max_height=50)
+
+    # Even 1px images leave the padding and dividers over budget
+    many = [Image.new("RGB", (100, 100))] * 15
+    with pytest.raises(ValueError):
+        combine_images_vertically(many, max_height=335)
+    with pytest.raises(ValueError):
+        VerticalCompositor(many, max_bytes=3 * 100 * 335)
+    assert VerticalCompositor(many, max_height=400).height <= 400
+
+
+def test_write_png():
+    """Test that the streamed PNG decodes to the composite."""
+    compositor = VerticalCompositor(create_images())
+    buffer = io.BytesIO()
+    compositor.write_png(buffer, band_height=50)
+    decoded = Image.open(io.BytesIO(buffer.getvalue()))
+    assert decoded.mode == "RGB"
+    assert np.array_equal(np.asarray(decoded), np.asarray(compositor.render()))
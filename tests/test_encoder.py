@@ -0,0 +1,114 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from surfrecipes.encoder import ImageEncoder
+from surfrecipes.img import b64_to_image, image_to_b64, load_image_base64
+
+
+def create_test_image(width=400, height=300):
+    """Helper function to create an RGB gradient image."""
+    return Image.radial_gradient("L").resize((width, height)).convert("RGB")
+
+
+def decode(uri):
+    """Helper function to split a data URI into its MIME type and bytes."""
+    header, data = uri.split(",", 1)
+    return header, base64.b64decode(data)
+
+
+def test_image_to_b64_matches_plain_png():
+    """Test that the default encoding is the PNG Pillow writes."""
+    img = create_test_image()
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    header, data = decode(image_to_b64(img, encoder=ImageEncoder()))
+    assert header == "data:image/png;base64"
+    assert data == buffer.getvalue()
+
+
+def test_cache_hit():
+    """Test that encoding the same pixels twice is served from the cache."""
+    encoder = ImageEncoder()
+    first = encoder.data_uri(create_test_image())
+    assert encoder.data_uri(create_test_image()) is first
+    assert encoder.stats()["hits"] == 1
+    encoder.data_uri(create_test_image(), "JPEG")
+    assert encoder.stats()["misses"] == 2
+
+
+def test_cache_evicts_over_budget():
+    """Test that the cache keeps within its byte budget."""
+    encoder = ImageEncoder(cache_bytes=len(ImageEncoder().data_uri(create_test_image())) + 1)
+    encoder.data_uri(create_test_image())
+    encoder.data_uri(create_test_image(300, 400))
+    stats = encoder.stats()
+    assert stats["entries"] == 1 and stats["bytes"] <= encoder.cache_bytes
+
+
+def test_quality():
+    """Test that JPEG quality is applied and RGBA images are flattened."""
+    img = create_test_image().convert("RGBA")
+    low = decode(ImageEncoder("jpeg", quality=10).data_uri(img))
+    high = decode(ImageEncoder("jpeg", quality=95).data_uri(img))
+    assert low[0] == "data:image/jpeg;base64"
+    assert len(low[1]) < len(high[1])
+
+
+def test_max_dimension():
+    """Test that images larger than max_dimension are downscaled, keeping their aspect ratio."""
+    uri = ImageEncoder(max_dimension=200).data_uri(create_test_image())
+    assert b64_to_image(uri).size == (200, 150)
+
+
+def test_unsupported_format():
+    """Test that unknown formats are rejected."""
+    with pytest.raises(ValueError):
+        ImageEncoder("bmpx")
+
+
+def test_load_image_base64_passthrough(tmp_path):
+    """Test that files needing no transform are sent as they are."""
+    path = tmp_path / "image.png"
+    create_test_image().save(path, compress_level=1)
+    encoder = ImageEncoder()
+    header, data = decode(load_image_base64(str(path), encoder=encoder))
+    assert header == "data:image/png;base64"
+    assert data == path.read_bytes()
+    assert encoder.stats()["passthroughs"] == 1
+
+
+def test_load_image_base64_transform(tmp_path):
+    """Test that files are converted and downscaled when the encoder asks for it."""
+    path = tmp_path / "image.png"
+    create_test_image().save(path)
+    header, data = decode(load_image_base64(str(path), encoder=ImageEncoder("WEBP", max_dimension=100)))
+    assert header == "data:image/webp;base64"
+    assert Image.open(io.BytesIO(data)).size == (100, 75)
+
+
+def test_load_image_base64_reencodes_when_settings_are_set(tmp_path):
+    """Test that a quality or compression level set for the file's format is applied, not passed through."""
+    png, jpeg = tmp_path / "image.png", tmp_path / "image.jpg"
+    create_test_image().save(png, compress_level=0)
+    create_test_image().save(jpeg, quality=95)
+
+    encoder = ImageEncoder(compress_level=9)
+    assert len(decode(load_image_base64(str(png), encoder=encoder))[1]) < png.stat().st_size
+    encoder = ImageEncoder(quality=10)
+    assert len(decode(load_image_base64(str(jpeg), encoder=encoder))[1]) < jpeg.stat().st_size
+    assert encoder.stats()["passthroughs"] == 0
+
+
+def test_cache_key_includes_the_palette():
+    """Test that palette images with the same indices but different palettes are not confused."""
+    red, blue = Image.new("P", (20, 20), 0), Image.new("P", (20, 20), 0)
+    red.putpalette([255, 0, 0] * 256)
+    blue.putpalette([0, 0, 255] * 256)
+    encoder = ImageEncoder()
+    assert b64_to_image(encoder.data_uri(red)).convert("RGB").getpixel((0, 0)) == (255, 0, 0)
+    assert b64_to_image(encoder.data_uri(blue)).convert("RGB").getpixel((0, 0)) == (0, 0, 255)
+    assert encoder.stats()["hits"] == 0
+    assert encoder.data_uri(red.copy()) == encoder.data_uri(red)
@@ -1,9 +1,19 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
 import pytest
 from PIL import Image
-from surfslicer.img import (
+
+from surfrecipes.blend import PreparedLayer
+from surfrecipes.img import (
     create_grid_image_by_num_cells,
+    divide_image_into_cells,
+    divide_image_into_grid,
     zoom_in,
     superimpose_images,
+    superimpose_many,
     Box,
 )  # Adjust the import according to your module structure
 
@@ -63,3 +73,94 @@ def test_superimpose_images():
     superimposed_img = superimpose_images(base_img, layer_img)
     assert superimposed_img.size == base_img.size
     # Further checks could verify pixel values to ensure correct superimposition.
+
+
+def test_divide_image_into_grid():
+    """Test that cells match crops of their boxes."""
+    img = Image.radial_gradient("L").resize((301, 200)).convert("RGB")
+    grid = divide_image_into_grid(img, 3)
+    assert len(grid) == 9
+    # Cells run down the columns
+    assert (grid.boxes[1].left, grid.boxes[1].top) == (0, 66)
+    assert grid.boxes[8].right == 300
+    for cell, box in zip(grid, grid.boxes):
+        assert cell.tobytes() == box.crop_image(img).tobytes()
+
+
+def test_divide_image_into_grid_is_lazy():
+    """Test that only the cells asked for are copied, and the composite is built on demand."""
+    grid = divide_image_into_grid(create_test_image(300, 300), 3)
+    assert grid[4] is grid[4]
+    assert list(grid._cells) == [4]
+    assert "composite" not in grid.__dict__
+    assert grid.composite.width == 200
+    assert len(grid._cells) == 9
+
+
+def test_divide_image_into_grid_views():
+    """Test that cell views share the pixels of the image."""
+    img = Image.radial_gradient("L").resize((90, 60))
+    grid = divide_image_into_grid(img, 3)
+    assert grid.view(5).base is grid.view(0).base
+    assert grid.view(5).shape == (20, 30)
+    assert grid.view(5).tobytes() == grid[5].tobytes()
+
+
+def test_divide_image_into_cells_returns_a_tuple():
+    """Test that the composite, cells and boxes still unpack as before."""
+    img = Image.radial_gradient("L").resize((90, 60)).convert("RGB")
+    composite, cells, boxes = divide_image_into_cells(img, 3)
+    grid = divide_image_into_grid(img, 3)
+    assert composite.tobytes() == grid.composite.tobytes()
+    assert [cell.tobytes() for cell in cells] == [cell.tobytes() for cell in grid]
+    assert [(b.left, b.top, b.right, b.bottom) for b in boxes] == [(b.left, b.top, b.right, b.bottom) for b in grid.boxes]
+
+
+def reference_superimpose(base, layer, opacity):
+    """Helper function superimposing the long way round, one conversion at a time."""
+    merged = Image.new("RGBA", base.size)
+    merged.paste(base.convert("RGBA").convert("L"), (0, 0))
+    faded = Image.blend(Image.new("RGBA", layer.size, (0, 0, 0, 0)), layer.convert("RGBA"), opacity)
+    return Image.alpha_composite(merged, faded)
+
+
+@pytest.mark.parametrize("opacity", [1, 0.5])
+def test_superimpose_images_pixels(opacity):
+    """Test that superimposing matches doing every conversion separately."""
+    base = Image.radial_gradient("L").resize((120, 80)).convert("RGB")
+    layer = create_test_image(120, 80, (0, 255, 0, 128))
+    expected = np.asarray(reference_superimpose(base, layer, opacity))
+    assert np.array_equal(np.asarray(superimpose_images(base, layer, opacity)), expected)
+
+    out = Image.new("RGBA", base.size)
+    assert superimpose_images(base, PreparedLayer(layer, opacity), out=out) is out
+    assert np.array_equal(np.asarray(out), expected)
+
+
+def test_superimpose_many():
+    """Test that one prepared layer serves many base images."""
+    layer = create_test_image(50, 50, (0, 0, 255, 200))
+    bases = [create_test_image(50, 50, color) for color in ((255, 0, 0, 255), (0, 255, 0, 255))]
+    results = superimpose_many(bases, layer, 0.7)
+    assert len(results) == 2
+    for base, result in zip(bases, results):
+        assert np.array_equal(np.asarray(result), np.asarray(reference_superimpose(base, layer, 0.7)))
+    with pytest.raises(ValueError):
+        superimpose_images(create_test_image(40, 50), PreparedLayer(layer))
+
+
+def test_merge_image_script(tmp_path):
+    """Test that the merge_image command line runs as a module and writes the merged image."""
+    create_test_image(40, 30).save(tmp_path / "base.png")
+    create_test_image(40, 30, (0, 0, 255, 255)).save(tmp_path / "layer.png")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-m", "surfrecipes.merge_image", "--image1", "base.png", "--image2", "layer.png"],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=root),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    with Image.open(tmp_path / "merged_image.png") as merged:
+        assert merged.size == (40, 30)
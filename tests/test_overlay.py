@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from surfrecipes.overlay import StampAtlas, cell_grid, intersection_grid, load_font, stamp_atlas
+
+
+def test_load_font_once():
+    """Test that fonts are loaded once per size from the package font directory."""
+    assert load_font("arialbd.ttf", 20) is load_font("arialbd.ttf", 20)
+    assert load_font("arialbd.ttf", 20).path.endswith(os.path.join("surfrecipes", "data", "fonts", "arialbd.ttf"))
+
+
+def test_layout():
+    """Test that numbers are split into digits with their offsets."""
+    atlas = StampAtlas(load_font("arialbd.ttf", 30), 10, "red", "yellow")
+    digits, offsets, bbox = atlas.layout(np.array([7, 42, 105]))
+    assert digits.tolist() == [[7, -1, -1], [4, 2, -1], [1, 0, 5]]
+    assert offsets[2, 1] == atlas.advances[1]
+    assert offsets[2, 2] == atlas.advances[1] + atlas.advances[0]
+    assert bbox[1, 2] > bbox[0, 2]
+
+
+def test_stamp_atlas_cached():
+    """Test that atlases are rendered once per font size and colors."""
+    assert stamp_atlas("arialbd.ttf", 20, 14, "red", "yellow") is stamp_atlas("arialbd.ttf", 20, 14, "red", "yellow")
+    assert stamp_atlas("arialbd.ttf", 20, 14, "red", "yellow") is not stamp_atlas("arialbd.ttf", 20, 14, "blue", "yellow")
+
+
+def test_intersection_grid_markers():
+    """Test that the circles sit on the inner intersections only."""
+    pixels = np.asarray(intersection_grid(600, 600, 3, "red", "yellow"))
+    assert pixels[0, 0, 3] == 0
+    # Inside each of the four circles, above the number
+    for x in (200, 400):
+        for y in (200, 400):
+            assert tuple(pixels[y - 25, x]) == (255, 0, 0, 255)
+    assert not pixels[:, 100, 3].any()
+
+
+def test_cell_grid_numbers():
+    """Test that every cell gets a circle with its number in it."""
+    pixels = np.asarray(cell_grid(300, 200, 100, "red", "yellow"))
+    for x in (50, 150, 250):
+        for y in (50, 150):
+            cell = pixels[y - 45 : y + 45, x - 45 : x + 45]
+            assert tuple(cell[45, 2]) == (255, 0, 0, 255)
+            assert ((cell[..., 0] == 255) & (cell[..., 1] == 255)).any()
+    assert pixels[0, 0, 3] == 0
+
+
+def test_overlays_are_copies():
+    """Test that changing a returned overlay leaves the cached one alone."""
+    first = cell_grid(200, 200, 100, "red", "yellow")
+    first.paste((0, 0, 0, 0), (0, 0, 200, 200))
+    assert cell_grid(200, 200, 100, "red", "yellow").getbbox() is not None
+
+
+def test_grid_script_runs_from_any_directory(tmp_path):
+    """Test that the grid example runs as a module and finds the packaged font outside the repo."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    result = subprocess.run(
+        [sys.executable, "-m", "surfrecipes.grid"], cwd=tmp_path, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / "test.png").exists()
+    assert "not found" not in result.stderr
@@ -0,0 +1,69 @@
+import asyncio
+
+from surfrecipes.pacing import Pushback, StepPacer, record_pushback, tracking_pushback
+
+
+def test_no_delay_by_default():
+    """Test that clean steps are not paused."""
+    pacer = StepPacer()
+    with pacer.working():
+        pass
+    pacer.step_done()
+    pacer.wait()
+    assert pacer.delay == 0
+    assert pacer.stats()["waiting_seconds"] == 0
+    assert pacer.stats()["steps"] == 1
+
+
+def test_backs_off_and_recovers():
+    """Test that push back grows the pause and clean steps shrink it again."""
+    pacer = StepPacer(backoff_initial=1, backoff_factor=2, backoff_max=5)
+    pacer.step_done(pushed_back=True)
+    assert pacer.delay == 1
+    pacer.step_done(pushed_back=True)
+    pacer.step_done(pushed_back=True)
+    pacer.step_done(pushed_back=True)
+    assert pacer.delay == 5
+
+    pacer.step_done()
+    assert pacer.delay == 2.5
+    pacer.step_done()
+    pacer.step_done()
+    assert pacer.delay == 0
+    assert pacer.stats()["backoffs"] == 4
+
+
+def test_honours_retry_after():
+    """Test that an upstream Retry-After hint sets the pause."""
+    pacer = StepPacer(backoff_max=30)
+    pacer.step_done(pushed_back=True, retry_after=7)
+    assert pacer.delay == 7
+
+
+def test_wait_is_accounted():
+    """Test that waiting time is reported separately from working time."""
+    pacer = StepPacer(delay=0.01)
+    pacer.wait()
+    stats = pacer.stats()
+    assert stats["waiting_seconds"] > 0
+    assert stats["waiting_ratio"] == 1.0
+
+
+def test_pushback_is_per_task():
+    """Test that push back is counted for the task whose context recorded it, and reset per step."""
+    first, second = Pushback(), Pushback()
+
+    async def task(pushback, hits, retry_after):
+        with tracking_pushback(pushback):
+            for _ in range(hits):
+                await asyncio.to_thread(record_pushback, retry_after)
+                await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(task(first, 2, 3.0), task(second, 0, None))
+
+    asyncio.run(main())
+    record_pushback(10.0)
+    assert first.take() == (2, 3.0)
+    assert first.take() == (0, None)
+    assert second.take() == (0, None)
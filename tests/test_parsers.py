@@ -0,0 +1,89 @@
+from surfrecipes.parsers import (
+    parse_conversion_requirements,
+    parse_recipe_requirements,
+    parse_substitute_requirements,
+)
+
+
+def test_parse_recipe_requirements():
+    """Test the example from the recipe analyzer prompt."""
+    breakdown = parse_recipe_requirements(
+        "Find me a nut-free vegetarian salad recipe with tomato and cucumber and without any dairy."
+    )
+    assert breakdown == {
+        "food": "salad",
+        "diet": "vegetarian",
+        "intolerances": "nut",
+        "include_ingredients": "tomato,cucumber",
+        "exclude_ingredients": "dairy",
+    }
+
+
+def test_parse_recipe_requirements_variants():
+    """Test lists, diet aliases and filler words."""
+    breakdown = parse_recipe_requirements("Can you find me an easy keto chicken recipe with broccoli, cheese and garlic?")
+    assert breakdown["food"] == "chicken"
+    assert breakdown["diet"] == "ketogenic"
+    assert breakdown["include_ingredients"] == "broccoli,cheese,garlic"
+
+
+def test_parse_recipe_requirements_defers_to_llm():
+    """Test that requests the grammar cannot represent are left to the LLM."""
+    assert parse_recipe_requirements("I want a dinner for 4 under 30 minutes") is None
+    assert parse_recipe_requirements("Show me something healthy") is None
+
+
+def test_parse_recipe_requirements_rejects_unsure_parses():
+    """Test that greetings, negations and unknown qualifiers are not taken as food."""
+    assert parse_recipe_requirements("hello") is None
+    assert parse_recipe_requirements("non vegetarian curry") is None
+    assert parse_recipe_requirements("Find me a non-vegetarian curry") is None
+    assert parse_recipe_requirements("kid friendly pizza") is None
+    assert parse_recipe_requirements("cheap pasta") is None
+    assert parse_recipe_requirements("pasta recipe")["food"] == "pasta"
+
+
+def test_parse_recipe_requirements_rejects_unknown_free_modifiers():
+    """Test that a "-free" modifier that is not a known intolerance is left to the LLM rather than split off."""
+    assert parse_recipe_requirements("Find me a sugar-free dessert") is None
+    assert parse_recipe_requirements("Find me a sugar free dessert recipe") is None
+    assert parse_recipe_requirements("Find me a dessert with sugar-free chocolate") is None
+    assert parse_recipe_requirements("Find me a gluten-free dessert")["intolerances"] == "gluten"
+
+
+def test_parse_conversion_requirements():
+    """Test the conversion grammar."""
+    assert parse_conversion_requirements("Convert 2.5 cups of flour into grams") == {
+        "ingredient_name": "flour",
+        "source_amount": "2.5",
+        "source_unit": "cups",
+        "target_unit": "grams",
+    }
+    breakdown = parse_conversion_requirements("How many grams are in 1 1/2 tbsp brown sugar?")
+    assert breakdown["ingredient_name"] == "brown sugar"
+    assert breakdown["source_amount"] == "1 1/2"
+    assert parse_conversion_requirements("convert this recipe to metric") is None
+
+
+def test_parse_conversion_requirements_rejects_partial_parses():
+    """Test that a request missing its target unit is not parsed with the connector left in the ingredient."""
+    assert parse_conversion_requirements("Convert 2 cups of oil in") is None
+    assert parse_conversion_requirements("How many grams are in 2 cups of oil in") is None
+    assert parse_conversion_requirements("How many grams are in 2 cups of oil in cups") is None
+    assert parse_conversion_requirements("How many grams are in 2 cups of oil")["ingredient_name"] == "oil"
+
+
+def test_parse_substitute_requirements():
+    """Test the substitution grammar."""
+    assert parse_substitute_requirements("What can I use instead of butter?") == {"ingredient_name": "butter"}
+    assert parse_substitute_requirements("What is a good substitute for eggs in cookies?") == {
+        "ingredient_name": "eggs"
+    }
+    assert parse_substitute_requirements("I have no eggs, what now?") is None
+
+
+def test_parse_substitute_requirements_direction():
+    """Test that the ingredient being replaced is returned, whichever way round it is written."""
+    assert parse_substitute_requirements("How can I substitute heavy cream for milk?") == {"ingredient_name": "milk"}
+    assert parse_substitute_requirements("How do I replace butter with oil?") == {"ingredient_name": "butter"}
+    assert parse_substitute_requirements("Can I substitute butter for baking?") is None
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+from surfrecipes.prefetch import Prefetcher
+
+
+def test_hit_and_miss():
+    """Test that claimed prefetches are hits and calls made directly are misses."""
+    prefetcher = Prefetcher()
+    calls = []
+
+    def fetch(recipe_id):
+        calls.append(recipe_id)
+        return f"card {recipe_id}"
+
+    prefetcher.prefetch(("card", 1), fetch, 1)
+    assert prefetcher.run(("card", 1), fetch, 1) == "card 1"
+    assert prefetcher.run(("card", 2), fetch, 2) == "card 2"
+    assert calls == [1, 2]
+
+    stats = prefetcher.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_failed_prefetch_falls_back():
+    """Test that a failed prefetch is retried by the caller and counted as a miss, not a hit."""
+    prefetcher = Prefetcher()
+
+    def flaky():
+        raise ValueError("boom")
+
+    prefetcher.prefetch("key", flaky)
+    assert prefetcher.run("key", lambda: "ok") == "ok"
+
+    async def direct():
+        return "ok"
+
+    prefetcher.prefetch("other", flaky)
+    assert asyncio.run(prefetcher.arun("other", direct)) == "ok"
+
+    stats = prefetcher.stats()
+    assert stats["hits"] == 0
+    assert stats["misses"] == 2
+    assert stats["failed"] == 2
+
+
+def test_async_run():
+    """Test that async callers await the prefetch."""
+    prefetcher = Prefetcher()
+    prefetcher.prefetch("key", lambda: "prefetched")
+
+    async def direct():
+        return "direct"
+
+    assert asyncio.run(prefetcher.arun("key", direct)) == "prefetched"
+    assert asyncio.run(prefetcher.arun("other", direct)) == "direct"
+
+
+def test_bounded_wasted_and_cancelled():
+    """Test that prefetches are bounded, and unclaimed ones are wasted if they ran and cancelled if not."""
+    prefetcher = Prefetcher(max_workers=1, max_pending=2)
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait()
+        finished.set()
+
+    prefetcher.prefetch("a", blocking)
+    prefetcher.prefetch("b", lambda: None)
+    prefetcher.prefetch("c", lambda: None)
+    started.wait()
+    threading.Timer(0.05, release.set).start()
+    prefetcher.close()
+    # close() returns only once the running prefetch is done
+    assert finished.is_set()
+
+    stats = prefetcher.stats()
+    assert stats["issued"] == 2
+    assert stats["skipped"] == 1
+    assert stats["wasted"] == 1
+    assert stats["cancelled"] == 1
+
+
+def test_disabled():
+    """Test that nothing is prefetched when disabled."""
+    prefetcher = Prefetcher(enabled=False)
+    prefetcher.prefetch("key", lambda: "x")
+    assert prefetcher.stats()["issued"] == 0
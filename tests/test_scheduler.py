@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from surfrecipes.scheduler import QueueFull, TaskScheduler
+
+
+def create_job(results, name, seconds=0.0):
+    """Helper function to create a job that records its name when done."""
+
+    async def job():
+        await asyncio.sleep(seconds)
+        results.append(name)
+
+    return job
+
+
+def test_runs_jobs_on_the_pool():
+    """Test that queued jobs run and are counted."""
+
+    async def run():
+        scheduler = TaskScheduler(workers=2, max_queue=4)
+        scheduler.start()
+        results = []
+        for name in "abc":
+            scheduler.submit(create_job(results, name))
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    assert sorted(results) == ["a", "b", "c"]
+    stats = scheduler.stats()
+    assert stats["completed"] == 3
+    assert stats["queued"] == 0
+
+
+def test_rejects_when_full():
+    """Test admission control once the queue is full."""
+
+    async def run():
+        scheduler = TaskScheduler(workers=1, max_queue=1)
+        scheduler.start()
+        results = []
+        scheduler.submit(create_job(results, "a", 0.05))
+        await asyncio.sleep(0)
+        scheduler.submit(create_job(results, "b"))
+        with pytest.raises(QueueFull):
+            scheduler.submit(create_job(results, "c"))
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    assert results == ["a", "b"]
+    assert scheduler.stats()["rejected"] == 1
+    assert scheduler.stats()["wait_seconds"]["max"] > 0
+
+
+def test_deadline():
+    """Test that jobs past their deadline are cancelled and reported."""
+
+    async def run():
+        scheduler = TaskScheduler(workers=1, max_queue=2, deadline=0.02)
+        scheduler.start()
+        results, timeouts = [], []
+        scheduler.submit(create_job(results, "slow", 1), on_timeout=lambda: timeouts.append("slow"))
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return scheduler, results, timeouts
+
+    scheduler, results, timeouts = asyncio.run(run())
+    assert results == []
+    assert timeouts == ["slow"]
+    assert scheduler.stats()["timed_out"] == 1
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from surfrecipes.scheduler import TaskScheduler
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """The server module, without auth or LLM checks, with task data under tmp_path."""
+    monkeypatch.setenv("SPOONACULAR_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("AGENTSEA_HUB_URL", "http://localhost")
+    monkeypatch.setenv("AGENT_NO_AUTH", "true")
+    monkeypatch.chdir(tmp_path)
+    from surfrecipes import server
+
+    monkeypatch.setattr(server.router, "check_model", lambda: None)
+    return server
+
+
+def install(server, monkeypatch, scheduler, seconds=0.0):
+    """Helper function to use a scheduler whose tasks sleep instead of running the agent."""
+    tasks = []
+
+    async def fake_solve_task(task_model, task):
+        tasks.append(task)
+        await asyncio.sleep(seconds)
+
+    monkeypatch.setattr(server, "scheduler", scheduler)
+    monkeypatch.setattr(server, "_solve_task", fake_solve_task)
+    return tasks
+
+
+@asynccontextmanager
+async def serve(server):
+    """Helper function to run the app's lifespan and yield a client talking to it in process."""
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+
+async def wait_for(client, key, value, timeout=5.0):
+    """Helper function to poll the scheduler stats until a counter reaches a value."""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        stats = (await client.get("/v1/scheduler")).json()
+        if stats[key] >= value:
+            return stats
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{key} never reached {value}")
+
+
+def test_post_task_runs_on_scheduler(server, monkeypatch):
+    """Test that POST /v1/tasks queues the task and a worker runs it."""
+    tasks = install(server, monkeypatch, TaskScheduler(workers=1, max_queue=4))
+
+    async def run():
+        async with serve(server) as client:
+            response = await client.post("/v1/tasks", json={"task": {"description": "Find me a pasta recipe"}})
+            assert response.status_code == 200
+            return await wait_for(client, "completed", 1)
+
+    stats = asyncio.run(run())
+    assert stats["submitted"] == 1
+    assert tasks[0].description == "Find me a pasta recipe"
+
+
+def test_post_task_rejects_when_queue_is_full(server, monkeypatch):
+    """Test that a full queue answers 429 while the scheduler route stays responsive."""
+    install(server, monkeypatch, TaskScheduler(workers=1, max_queue=1), seconds=0.5)
+
+    async def run():
+        async with serve(server) as client:
+            statuses = [
+                (await client.post("/v1/tasks", json={"task": {"description": f"task {i}"}})).status_code
+                for i in range(3)
+            ]
+            return statuses, (await client.get("/v1/scheduler")).json()
+
+    statuses, stats = asyncio.run(run())
+    assert statuses[0] == 200
+    assert statuses[-1] == 429
+    assert stats["rejected"] >= 1
+
+
+def test_post_task_fails_task_past_its_deadline(server, monkeypatch):
+    """Test that a task running past its deadline is marked failed."""
+    tasks = install(server, monkeypatch, TaskScheduler(workers=1, deadline=0.05), seconds=5)
+
+    async def run():
+        async with serve(server) as client:
+            await client.post("/v1/tasks", json={"task": {"description": "a slow task"}})
+            await wait_for(client, "timed_out", 1)
+
+    asyncio.run(run())
+    task = tasks[0]
+    assert task.status.value == "failed"
+    assert task.error == "task deadline exceeded"
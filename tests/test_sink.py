@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from surfrecipes.sink import TaskSink
+
+
+class FakeTask:
+    """A task recording the updates written to it."""
+
+    def __init__(self, fail=False, save_failures=0, error=ConnectionError):
+        self.updates = []
+        self.threads = set()
+        self.fail = fail
+        self.save_failures = save_failures
+        self.error = error
+
+    def post_message(self, role, msg, **kwargs):
+        self.updates.append(("post_message", msg, threading.current_thread().name))
+        if self.fail:
+            raise self.error("tracker down")
+
+    def save(self):
+        self.updates.append(("save", None, threading.current_thread().name))
+        if self.save_failures:
+            self.save_failures -= 1
+            raise self.error("tracker down")
+
+
+def test_updates_are_buffered_until_flushed():
+    """Test that nothing is written before the step ends, then everything in order."""
+    task = FakeTask()
+    sink = TaskSink(task)
+    sink.post_message("assistant", "one")
+    sink.save()
+    sink.save()
+    sink.post_message("assistant", "two")
+    assert task.updates == []
+
+    sink.flush(wait=True)
+    assert [(method, msg) for method, msg, _ in task.updates] == [
+        ("post_message", "one"),
+        ("save", None),
+        ("post_message", "two"),
+    ]
+    assert all(name.startswith("surfrecipes-sink") for _, _, name in task.updates)
+    assert sink.stats() == {"updates": 3, "coalesced": 1, "batches": 1, "retries": 0, "errors": 0}
+    sink.close()
+
+
+def test_close_flushes_and_message_failures_do_not_raise():
+    """Test that closing writes the rest, and a message still failing after retries is dropped and counted."""
+    task = FakeTask(fail=True)
+    sink = TaskSink(task, background=False, backoff=0)
+    sink.post_message("assistant", "lost?")
+    sink.close()
+    assert len(task.updates) == 3
+    assert sink.stats()["retries"] == 2
+    assert sink.stats()["errors"] == 1
+
+
+def test_transient_failures_are_retried():
+    """Test that a save failing transiently is retried until it is written."""
+    task = FakeTask(save_failures=2)
+    sink = TaskSink(task, backoff=0)
+    sink.save()
+    sink.close()
+    assert len(task.updates) == 3
+    assert sink.stats()["retries"] == 2
+    assert sink.stats()["errors"] == 0
+
+
+def test_other_failures_are_not_retried():
+    """Test that a failure retrying would not fix is dropped at once."""
+    task = FakeTask(fail=True, error=ValueError)
+    sink = TaskSink(task, background=False, backoff=0)
+    sink.post_message("assistant", "bad message")
+    sink.close()
+    assert len(task.updates) == 1
+    assert sink.stats()["retries"] == 0
+
+
+def test_close_raises_when_the_final_save_failed():
+    """Test that a final save the tracker never took is surfaced by close()."""
+    task = FakeTask(save_failures=5)
+    sink = TaskSink(task, backoff=0)
+    sink.save()
+    with pytest.raises(ConnectionError):
+        sink.close()
+
+
+def test_close_can_log_a_failed_final_save():
+    """Test that close(raise_errors=False) logs a failed final save, so it cannot mask an error already raised."""
+    task = FakeTask(save_failures=5)
+    sink = TaskSink(task, backoff=0)
+    sink.save()
+    sink.close(raise_errors=False)
+    assert sink.stats()["errors"] == 1
@@ -0,0 +1,139 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from surfrecipes.spoonacular import (
+    TRANSIENT_ERRORS,
+    SpoonacularClient,
+    SpoonacularError,
+    TransientSpoonacularError,
+    status_error,
+)
+
+
+def create_response(status_code=200, headers=None, body=b"{}"):
+    """Helper function to create a canned response."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+def create_client(responses, **kwargs):
+    """Helper function to create a client that replays the given responses."""
+    client = SpoonacularClient(api_key="key", backoff_factor=0, **kwargs)
+    calls = []
+
+    def fake_get(url, **kw):
+        calls.append((url, kw))
+        item = responses.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    client.session.get = fake_get
+    return client, calls
+
+
+def test_get_adds_api_key_and_endpoint_timeout():
+    """Test that API calls carry the key and the endpoint's timeout."""
+    client, calls = create_client([create_response()], connect_timeout=1, timeouts={"convert": 2})
+    response = client.get("convert", "/recipes/convert", params={"ingredientName": "flour"})
+    assert response.status_code == 200
+    url, kwargs = calls[0]
+    assert url == "https://api.spoonacular.com/recipes/convert"
+    assert kwargs["params"] == {"ingredientName": "flour", "apiKey": "key"}
+    assert kwargs["timeout"] == (1, 2)
+
+
+def test_retries_on_rate_limit_and_server_errors():
+    """Test that 429 and 5xx responses are retried."""
+    client, calls = create_client(
+        [create_response(429, {"Retry-After": "0"}), create_response(503), create_response(200)]
+    )
+    response = client.get("search", "/recipes/complexSearch")
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    """Test that the last failing response is returned once retries run out."""
+    client, calls = create_client([create_response(500)] * 3, max_retries=2)
+    response = client.get("search", "/recipes/complexSearch")
+    assert response.status_code == 500
+    assert len(calls) == 3
+
+
+def test_quota_exhausted_is_not_retried():
+    """Test that a 402 is returned immediately and the quota is tracked."""
+    client, calls = create_client(
+        [create_response(402, {"X-API-Quota-Used": "150", "X-API-Quota-Left": "0"})]
+    )
+    response = client.get("card", "/recipes/1/card")
+    assert response.status_code == 402
+    assert len(calls) == 1
+    assert client.quota_used == 150
+    assert client.quota_left == 0
+
+
+def test_retries_connection_errors():
+    """Test that connection errors are retried, then re-raised."""
+    client, calls = create_client(
+        [requests.ConnectionError("reset"), create_response(200)]
+    )
+    assert client.fetch("https://img.spoonacular.com/card.jpg").status_code == 200
+
+    client, calls = create_client([requests.Timeout("slow")] * 2, max_retries=1)
+    with pytest.raises(requests.Timeout):
+        client.fetch("https://img.spoonacular.com/card.jpg")
+
+
+def test_async_get_retries_and_tracks_quota():
+    """Test that the async client shares the retry and quota logic."""
+    client = SpoonacularClient(api_key="key", backoff_factor=0)
+    statuses = [429, 200]
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses.pop(0), headers={"X-API-Quota-Left": "7"}, json={})
+
+    async def run():
+        client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await client.aget("search", "/recipes/complexSearch", params={"query": "salad"})
+        finally:
+            await client.aclose()
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert calls[0].url.params["apiKey"] == "key"
+    assert client.throttled == 1
+    assert client.quota_left == 7
+
+def test_from_env(monkeypatch):
+    """Test that pool sizes and timeouts come from the environment."""
+    monkeypatch.setenv("SPOONACULAR_TIMEOUT_SEARCH", "42")
+    monkeypatch.setenv("SPOONACULAR_MAX_RETRIES", "7")
+    client = SpoonacularClient.from_env("key")
+    assert client.timeout("search")[1] == 42
+    assert client.max_retries == 7
+
+
+def test_only_retryable_statuses_are_transient():
+    """Test that 429/5xx give a transient error, while auth, quota and missing resources do not."""
+    for status in (429, 500, 503):
+        assert isinstance(status_error(status, "failed"), TransientSpoonacularError)
+    for status in (401, 402, 404):
+        error = status_error(status, "failed")
+        assert isinstance(error, SpoonacularError)
+        assert not isinstance(error, TRANSIENT_ERRORS)
+    assert isinstance(requests.ConnectionError(), TRANSIENT_ERRORS)
+    assert not isinstance(requests.HTTPError(), TRANSIENT_ERRORS)
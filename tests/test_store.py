@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from surfrecipes.store import ImageStore
+
+
+def create_file(directory, name, data):
+    """Helper function to write a file."""
+    path = directory / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    """Test that tasks share the stored copy of identical bytes."""
+    store = ImageStore(str(tmp_path / "store"))
+    task1, task2 = tmp_path / "task1", tmp_path / "task2"
+    task1.mkdir()
+    task2.mkdir()
+
+    stored1 = store.add(create_file(task1, "a.part", b"card"), str(task1), "card.png")
+    stored2 = store.add(create_file(task2, "b.part", b"card"), str(task2), "card.png")
+
+    assert stored1 == stored2
+    assert os.path.samefile(task1 / "card.png", task2 / "card.png")
+    assert not os.path.exists(task2 / "b.part")
+    assert store.stats() == {"entries": 1, "bytes": 4}
+
+
+def test_release_and_evict(tmp_path):
+    """Test that released images are evicted least recently used first."""
+    store = ImageStore(str(tmp_path / "store"), max_bytes=10)
+    task = tmp_path / "task"
+    task.mkdir()
+
+    old = store.add(create_file(task, "1.part", b"x" * 6), str(task), "old.png")
+    time.sleep(0.01)
+    new = store.add(create_file(task, "2.part", b"y" * 6), str(task), "new.png")
+    # Both are still linked from the task, so nothing can be freed yet
+    assert store.contains(old) and store.contains(new)
+
+    store.release(str(task))
+    assert not os.path.exists(task)
+    assert not store.contains(old)
+    assert store.contains(new)
+
+
+def test_running_total_survives_restart(tmp_path):
+    """Test that the total and index are kept in memory and rebuilt from disk by a new store."""
+    store = ImageStore(str(tmp_path / "store"), max_bytes=10)
+    task = tmp_path / "task"
+    task.mkdir()
+    store.add(create_file(task, "1.part", b"x" * 6), str(task), "a.png")
+    store.add(create_file(task, "2.part", b"y" * 3), str(task), "b.png")
+    assert store.stats() == {"entries": 2, "bytes": 9}
+
+    store.release(str(task))
+    assert ImageStore(str(tmp_path / "store"), max_bytes=10).stats() == {"entries": 2, "bytes": 9}
+
+
+def test_link_after_eviction_raises(tmp_path):
+    """Test that linking an image evicted since it was looked up raises instead of linking nothing."""
+    store = ImageStore(str(tmp_path / "store"), max_bytes=4)
+    task = tmp_path / "task"
+    task.mkdir()
+    stored = store.add(create_file(task, "1.part", b"x" * 6), str(task), "a.png")
+    assert store.contains(stored)
+
+    store.release(str(task))
+    with pytest.raises(FileNotFoundError):
+        store.link(stored, str(tmp_path / "task2"), "a.png")
+    assert store.stats() == {"entries": 0, "bytes": 0}
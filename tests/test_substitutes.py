@@ -0,0 +1,40 @@
+from surfrecipes.substitutes import SubstitutesIndex, singular_forms
+
+
+def test_singular_forms():
+    """Test plural handling."""
+    assert "tomato" in singular_forms("tomatoes")
+    assert "berry" in singular_forms("berries")
+    assert singular_forms("cress") == ["cress"]
+
+
+def test_loads_lazily():
+    """Test that the index file is only read on first lookup."""
+    index = SubstitutesIndex()
+    assert index._ingredients is None
+    assert index.lookup("butter")
+    assert index._ingredients is not None
+
+
+def test_lookup_normalizes_names():
+    """Test that case, plurals and synonyms resolve to the same entry."""
+    index = SubstitutesIndex()
+    assert index.lookup("Eggs") == index.lookup("egg")
+    assert index.lookup("Unsalted Butter") == index.lookup("butter")
+    assert index.lookup("icing sugar") == index.lookup("powdered sugar")
+    assert index.lookup("unobtainium") is None
+
+
+def test_lookup_many():
+    """Test the bulk lookup."""
+    index = SubstitutesIndex()
+    result = index.lookup_many(["butter", "unobtainium"])
+    assert result["butter"] == index.lookup("butter")
+    assert result["unobtainium"] is None
+
+
+def test_add_persists(tmp_path):
+    """Test that substitutes learned from the API are kept."""
+    path = str(tmp_path / "substitutes.json")
+    SubstitutesIndex(learned_path=path).add("Tahini", ["1 cup = 1 cup sunflower seed butter"])
+    assert SubstitutesIndex(learned_path=path).lookup("tahini") == ["1 cup = 1 cup sunflower seed butter"]
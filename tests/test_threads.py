@@ -0,0 +1,42 @@
+from threadmem import RoleThread
+
+from surfrecipes.threads import ThreadCompactor
+
+
+def create_thread(steps, output="x" * 2000):
+    """Helper function to create a thread with a system exchange and some steps."""
+    thread = RoleThread()
+    thread.post(role="user", msg="system prompt")
+    thread.post(role="assistant", msg="ready")
+    for i in range(steps):
+        thread.post(role="user", msg=f"Your current task is {i} {output}")
+        thread.post(role="assistant", msg=f"action {i}")
+    thread.post(role="user", msg="Your current task is next")
+    return thread
+
+
+def test_short_threads_are_untouched():
+    """Test that threads within the verbatim window are sent as they are."""
+    thread = create_thread(2)
+    assert ThreadCompactor(keep_exchanges=3).compact(thread) is thread
+
+
+def test_keeps_head_and_recent_exchanges():
+    """Test that older outputs are truncated while the head and the latest exchanges stay verbatim."""
+    thread = create_thread(6)
+    window = ThreadCompactor(budget=100000, keep_exchanges=2, summary_chars=50).compact(thread)
+    messages = window.messages()
+
+    assert len(messages) == len(thread.messages())
+    assert [m.text for m in messages[:2]] == ["system prompt", "ready"]
+    assert messages[2].text.endswith("characters elided]")
+    assert [m.text for m in messages[-5:]] == [m.text for m in thread.messages()[-5:]]
+    assert len(thread.messages()[2].text) > 2000
+
+
+def test_drops_oldest_exchanges_over_budget():
+    """Test that the window stays flat as the thread grows."""
+    compactor = ThreadCompactor(budget=1500, keep_exchanges=2, summary_chars=200)
+    sizes = [compactor.tokens(compactor.compact(create_thread(steps)).messages()) for steps in (10, 20)]
+    assert all(size <= 1500 for size in sizes)
+    assert abs(sizes[0] - sizes[1]) < 10
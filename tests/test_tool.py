@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from surfrecipes.cache import AnalyzerCache
+from surfrecipes.spoonacular import SpoonacularError
+
+
+class FakeRouter:
+    """Helper router answering analyzer prompts with queued replies."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def chat(self, thread, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(msg=SimpleNamespace(text=json.dumps(self.replies.pop(0))))
+
+
+@pytest.fixture
+def tool_mod(monkeypatch):
+    """The tool module, importable without real API keys."""
+    monkeypatch.setenv("SPOONACULAR_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from surfrecipes import tool
+
+    return tool
+
+
+def create_tool(tool_mod, tmp_path):
+    """Helper function to create a tool with an in-memory analyzer cache."""
+    recipetool = tool_mod.SurfRecipesTool(SimpleNamespace(id="test"), data_path=str(tmp_path))
+    recipetool.analyzer_cache = AnalyzerCache()
+    return recipetool
+
+
+def test_malformed_analyzer_reply_is_not_cached(tool_mod, tmp_path, monkeypatch):
+    """Test that a reply missing required keys raises and is asked for again next time."""
+    router = FakeRouter({"ingredient": "eggs"}, {"ingredient_name": "eggs"})
+    monkeypatch.setattr(tool_mod, "analyzer_router", lambda: router)
+    recipetool = create_tool(tool_mod, tmp_path)
+
+    with pytest.raises(ValueError):
+        recipetool._requirements("substitute", "I have no eggs, what now?")
+    assert recipetool.analyzer_cache.get("substitute", "I have no eggs, what now?") is None
+
+    assert recipetool._requirements("substitute", "I have no eggs, what now?") == {"ingredient_name": "eggs"}
+    assert recipetool._requirements("substitute", "I have no eggs, what now?") == {"ingredient_name": "eggs"}
+    assert router.calls == 2
+
+
+class FakeSpoonacular:
+    """Helper client answering searches and card lookups, tracking concurrent card calls."""
+
+    def __init__(self, results=12, failing=(), seconds=0.0):
+        self.results = results
+        self.failing = set(failing)
+        self.seconds = seconds
+        self.searches = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _search(self, params):
+        self.searches.append(params)
+        number = int(params.get("number", 1))
+        results = [{"id": 100 + i, "title": f"Recipe {i}"} for i in range(min(number, self.results))]
+        return SimpleNamespace(status_code=200, text=json.dumps({"results": results}))
+
+    def _card(self, path):
+        recipe_id = int(path.split("/")[2])
+        if recipe_id in self.failing:
+            return SimpleNamespace(status_code=404, text="{}")
+        return SimpleNamespace(status_code=200, text=json.dumps({"url": f"https://cards/{recipe_id}.png"}))
+
+    def _enter(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def get(self, endpoint, path, params=None, **kwargs):
+        if endpoint == "search":
+            return self._search(params)
+        self._enter()
+        try:
+            time.sleep(self.seconds)
+            return self._card(path)
+        finally:
+            self._exit()
+
+    async def aget(self, endpoint, path, params=None, **kwargs):
+        if endpoint == "search":
+            return self._search(params)
+        self._enter()
+        try:
+            await asyncio.sleep(self.seconds)
+            return self._card(path)
+        finally:
+            self._exit()
+
+
+class FakePrefetcher:
+    """Helper prefetcher recording what would have been prefetched."""
+
+    def __init__(self):
+        self.keys = []
+
+    def prefetch(self, key, fn, *args):
+        self.keys.append(key)
+
+    def close(self):
+        pass
+
+
+def create_search_tool(tool_mod, tmp_path, monkeypatch, client):
+    """Helper function to create a tool searching through a fake client, with no response cache."""
+    monkeypatch.setattr(tool_mod, "spoonacular", client)
+    recipetool = create_tool(tool_mod, tmp_path)
+    recipetool.cache = SimpleNamespace(get=lambda *args: None, set=lambda *args: None)
+    recipetool.prefetcher = FakePrefetcher()
+    return recipetool
+
+
+def test_find_recipe(tool_mod, tmp_path, monkeypatch):
+    """Test that find_recipe goes from requirements to the first recipe's card and prefetches it."""
+    recipetool = create_search_tool(tool_mod, tmp_path, monkeypatch, FakeSpoonacular())
+
+    assert recipetool.find_recipe("Find me a vegan pasta recipe") == "https://cards/100.png"
+    assert asyncio.run(recipetool.afind_recipe("Find me a vegan pasta recipe")) == "https://cards/100.png"
+    assert recipetool.prefetcher.keys == [("image", "https://cards/100.png")] * 2
+    assert tool_mod.spoonacular.searches[0] == {"number": 1, "query": "pasta", "diet": "vegan"}
+
+
+def test_find_recipes_caps_number(tool_mod, tmp_path, monkeypatch):
+    """Test that no more than MAX_RECIPES recipes are asked for."""
+    recipetool = create_search_tool(tool_mod, tmp_path, monkeypatch, FakeSpoonacular(results=50))
+
+    results = recipetool.find_recipes("Find me a vegan pasta recipe", number=25)
+    assert len(results) == tool_mod.MAX_RECIPES
+    assert asyncio.run(recipetool.afind_recipes("Find me a vegan pasta recipe", number=0))[0]["id"] == 100
+    assert [search["number"] for search in tool_mod.spoonacular.searches] == [tool_mod.MAX_RECIPES, 1]
+
+
+def test_find_recipes_bounds_card_concurrency(tool_mod, tmp_path, monkeypatch):
+    """Test that at most CARD_CONCURRENCY cards are fetched at once."""
+    monkeypatch.setattr(tool_mod, "CARD_CONCURRENCY", 2)
+    for find in ("sync", "async"):
+        client = FakeSpoonacular(seconds=0.02)
+        recipetool = create_search_tool(tool_mod, tmp_path, monkeypatch, client)
+        if find == "sync":
+            results = recipetool.find_recipes("Find me a vegan pasta recipe", number=8)
+        else:
+            results = asyncio.run(recipetool.afind_recipes("Find me a vegan pasta recipe", number=8))
+        assert [r["recipe_card_url"] for r in results] == [f"https://cards/{100 + i}.png" for i in range(8)]
+        assert client.peak == 2
+
+
+def test_find_recipes_survives_one_failed_card(tool_mod, tmp_path, monkeypatch):
+    """Test that a failed card leaves its recipe without a url, unless every card failed."""
+    recipetool = create_search_tool(tool_mod, tmp_path, monkeypatch, FakeSpoonacular(failing={101}))
+
+    for results in (
+        recipetool.find_recipes("Find me a vegan pasta recipe", number=3),
+        asyncio.run(recipetool.afind_recipes("Find me a vegan pasta recipe", number=3)),
+    ):
+        assert [r["recipe_card_url"] for r in results] == ["https://cards/100.png", None, "https://cards/102.png"]
+
+    recipetool = create_search_tool(tool_mod, tmp_path, monkeypatch, FakeSpoonacular(failing={100}))
+    with pytest.raises(SpoonacularError):
+        recipetool.find_recipes("Find me a vegan pasta recipe", number=1)
+    with pytest.raises(SpoonacularError):
+        asyncio.run(recipetool.afind_recipes("Find me a vegan pasta recipe", number=1))
+
+
+def test_display_recipe_details_shows_the_thumbnail(tool_mod, tmp_path, monkeypatch):
+    """Test that the card's thumbnail, not the full card, is opened for display."""
+    recipetool = create_search_tool(tool_mod, tmp_path, monkeypatch, FakeSpoonacular())
+    card_path = str(tmp_path / "card.png")
+    recipetool.prefetcher.run = lambda key, fn, *args: card_path
+    shown = []
+    monkeypatch.setattr(tool_mod, "show_image", shown.append)
+
+    assert recipetool.display_recipe_details("https://cards/100.png") == "Task Complete"
+    assert shown == [str(tmp_path / "card.thumb.jpg")]
+
+
+def test_local_answers_are_read_off_the_loop(tool_mod, tmp_path):
+    """Test that the async conversion and substitute actions read their local tables in worker threads."""
+    recipetool = create_tool(tool_mod, tmp_path)
+    threads = {}
+
+    def answer(*args):
+        threads["units"] = threading.current_thread()
+        return "2 eggs = 100 grams"
+
+    def lookup_many(names):
+        threads["substitutes"] = threading.current_thread()
+        return {name: ["applesauce"] for name in names}
+
+    recipetool.units = SimpleNamespace(answer=answer)
+    recipetool.substitutes = SimpleNamespace(lookup_many=lookup_many)
+    breakdown = {"ingredient_name": "eggs", "source_amount": "2", "source_unit": "", "target_unit": "grams"}
+
+    async def run():
+        converted = await recipetool.aconvert_ingredient_amounts(breakdown)
+        substituted = await recipetool.aget_many_ingredient_substitutes(["eggs"])
+        return threading.current_thread(), converted, substituted
+
+    loop_thread, converted, substituted = asyncio.run(run())
+    assert converted == "2 eggs = 100 grams"
+    assert substituted == "Substitutes for eggs: applesauce"
+    assert set(threads) == {"units", "substitutes"}
+    assert all(thread is not loop_thread for thread in threads.values())
+    recipetool.close()
@@ -0,0 +1,92 @@
+import pytest
+
+from surfrecipes.units import UnitConverter, normalize_unit, parse_amount, singularize
+
+
+def test_parse_amount():
+    """Test parsing of decimal, fractional and mixed amounts."""
+    assert parse_amount("2.5") == 2.5
+    assert parse_amount("1/2") == 0.5
+    assert parse_amount("1 1/2") == 1.5
+    assert parse_amount("1½") == 1.5
+    assert parse_amount(3) == 3.0
+    assert parse_amount("a pinch") is None
+
+
+def test_normalize_unit():
+    """Test unit aliases."""
+    assert normalize_unit("Cups") == "cup"
+    assert normalize_unit("tbsp.") == "tablespoon"
+    assert normalize_unit("fl oz") == "fluid ounce"
+    assert normalize_unit("handful") is None
+    assert normalize_unit("gr") is None
+    assert normalize_unit("") is None
+
+
+def test_singularize():
+    """Test that plurals are singularized and words ending in s are left alone."""
+    assert singularize("cherry tomatoes") == "cherry tomato"
+    assert singularize("berries") == "berry"
+    assert singularize("peaches") == "peach"
+    assert singularize("eggs") == "egg"
+    assert singularize("molasses") == "molasses"
+    assert singularize("hummus") == "hummus"
+    assert singularize("swiss") == "swiss"
+
+
+def test_convert_same_dimension():
+    """Test conversions that do not need an ingredient."""
+    converter = UnitConverter()
+    assert converter.convert("anything", "1", "cup", "tbsp") == pytest.approx(16, rel=1e-3)
+    assert converter.convert("anything", "1", "lb", "grams") == pytest.approx(453.592)
+
+
+def test_convert_between_volume_mass_and_count():
+    """Test conversions through the density and unit weight tables."""
+    converter = UnitConverter()
+    assert converter.convert("flour", "2", "cups", "grams") == pytest.approx(249.8, abs=0.1)
+    assert converter.convert("Unsalted Butter", "100", "g", "tbsp") == pytest.approx(7.05, abs=0.01)
+    assert converter.convert("eggs", "2", "pieces", "grams") == pytest.approx(100)
+    assert converter.convert("unobtainium", "2", "cups", "grams") is None
+    assert converter.convert("eggs", "2", "", "grams") is None
+
+
+def test_density_qualifiers_are_kept():
+    """Test that qualifiers which change the density are not stripped away."""
+    converter = UnitConverter()
+    assert converter.normalize_ingredient("Fresh large tomatoes") == "tomato"
+    assert converter.normalize_ingredient("packed brown sugar") == "packed brown sugar"
+    assert converter.convert("packed brown sugar", "1", "cup", "grams") is None
+    assert converter.convert("sifted flour", "1", "cup", "grams") is None
+
+
+def test_answer():
+    """Test the Spoonacular style answer."""
+    converter = UnitConverter()
+    assert converter.answer("flour", "2", "cups", "grams") == "2 cups flour translates to 249.84 grams."
+
+
+def test_learn_persists(tmp_path):
+    """Test that conversions answered by the API feed the local table."""
+    path = str(tmp_path / "units.json")
+    converter = UnitConverter(path)
+    assert converter.convert("tahini", 1, "cup", "g") is None
+    assert converter.learn("tahini", 1, "cups", 240, "grams")
+    assert not converter.learn("tahini", 1, "cups", 16, "tbsp")
+
+    assert UnitConverter(path).convert("tahini", 2, "cups", "grams") == pytest.approx(480)
+
+
+def test_learned_plural_and_singular_round_trip():
+    """Test that a conversion learned for a plural is found for its singular, and the other way around."""
+    converter = UnitConverter()
+    assert converter.learn("quail eggs", 1, "piece", 9, "grams")
+    assert converter.convert("quail egg", 2, "pieces", "grams") == pytest.approx(18)
+    assert converter.learn("duck egg", 1, "piece", 70, "grams")
+    assert converter.convert("duck eggs", 2, "pieces", "grams") == pytest.approx(140)
+    assert set(converter.unit_weights) >= {"quail egg", "duck egg"}
+
+    assert converter.learn("eggs", 1, "piece", 60, "grams")
+    assert converter.convert("egg", 1, "piece", "grams") == pytest.approx(60)
+    assert converter.learn("egg", 1, "piece", 55, "grams")
+    assert converter.convert("eggs", 1, "piece", "grams") == pytest.approx(55)